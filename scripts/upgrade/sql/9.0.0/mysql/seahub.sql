@@ -49,3 +49,14 @@ CREATE TABLE `onlyoffice_onlyofficedockey` (
   KEY `onlyoffice_onlyofficedockey_doc_key_edba1352` (`doc_key`),
   KEY `onlyoffice_onlyofficedockey_repo_id_file_path_md5_52002073` (`repo_id_file_path_md5`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+CREATE TABLE IF NOT EXISTS `thumbnail_task` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `repo_id` varchar(36) NOT NULL,
+  `path` longtext NOT NULL,
+  `file_id` varchar(40) NOT NULL,
+  `ctime` datetime(6) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `file_id` (`file_id`),
+  KEY `thumbnail_task_repo_id_36bc40ac` (`repo_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
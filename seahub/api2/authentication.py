@@ -1,19 +1,17 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
-import datetime
 import logging
 from rest_framework import status
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import APIException
 
-from seaserv import ccnet_api
-
 from seahub.auth.models import AnonymousUser
+from seahub.auth.utils import get_cached_user, cache_user, get_user_org
 from seahub.base.accounts import User
-from seahub.api2.models import Token, TokenV2
+from seahub.api2.models import TokenV2
+from seahub.api2.token_cache import get_api_token, record_token_access
 from seahub.api2.utils import get_client_ip
 from seahub.repo_api_tokens.models import RepoAPITokens
 from seahub.ocm.models import OCMShare
-from seahub.utils import within_time_range
 try:
     from seahub.settings import MULTI_TENANCY
 except ImportError:
@@ -63,79 +61,47 @@ class TokenAuthentication(BaseAuthentication):
             raise AuthenticationFailed(msg)
 
         key = auth[1]
-        ret = self.authenticate_v2(request, key)
-        if ret:
-            return ret
+        token = get_api_token(key)
+        if token is None:
+            raise AuthenticationFailed('Invalid token')
 
-        return self.authenticate_v1(request, key)
+        if isinstance(token, TokenV2):
+            return self.authenticate_v2(request, token)
 
-    def authenticate_v1(self, request, key):
-        try:
-            token = Token.objects.get(key=key)
-        except Token.DoesNotExist:
-            raise AuthenticationFailed('Invalid token')
+        return self.authenticate_v1(request, token)
 
-        try:
-            user = User.objects.get(email=token.user)
-        except User.DoesNotExist:
-            raise AuthenticationFailed('User inactive or deleted')
+    def get_token_user(self, token):
+        user = get_cached_user(token.user)
+        if user is None:
+            try:
+                user = User.objects.get(email=token.user)
+            except User.DoesNotExist:
+                raise AuthenticationFailed('User inactive or deleted')
+            cache_user(user)
 
         if MULTI_TENANCY:
-            orgs = ccnet_api.get_orgs_by_user(token.user)
-            if orgs:
-                user.org = orgs[0]
+            user.org = get_user_org(user)
 
+        return user
+
+    def authenticate_v1(self, request, token):
+        user = self.get_token_user(token)
         if user.is_active:
             return (user, token)
 
-    def authenticate_v2(self, request, key):
-        try:
-            token = TokenV2.objects.get(key=key)
-        except TokenV2.DoesNotExist:
-            # Continue authentication in token v1
-            return None
-
+    def authenticate_v2(self, request, token):
         if token.wiped_at:
             raise DeviceRemoteWipedException('Device set to be remote wiped')
 
-        try:
-            user = User.objects.get(email=token.user)
-        except User.DoesNotExist:
-            raise AuthenticationFailed('User inactive or deleted')
-
-        if MULTI_TENANCY:
-            orgs = ccnet_api.get_orgs_by_user(token.user)
-            if orgs:
-                user.org = orgs[0]
-
+        user = self.get_token_user(token)
         if user.is_active:
-            need_save = False
-
             # We update the device's last_login_ip, client_version, platform_version if changed
-            ip = get_client_ip(request)
-            if ip and ip != token.last_login_ip:
-                token.last_login_ip = ip
-                need_save = True
-
-            client_version = request.META.get(HEADER_CLIENT_VERSION, '')
-            if client_version and client_version != token.client_version:
-                token.client_version = client_version
-                need_save = True
-
-            platform_version = request.META.get(HEADER_PLATFORM_VERSION, '')
-            if platform_version and platform_version != token.platform_version:
-                token.platform_version = platform_version
-                need_save = True
-
-            if not within_time_range(token.last_accessed, datetime.datetime.now(), 10 * 60):
-                # We only need 10min precision for the last_accessed field
-                need_save = True
-
-            if need_save:
-                try:
-                    token.save()
-                except:
-                    logger.exception('error when save token v2:')
+            try:
+                record_token_access(token, get_client_ip(request),
+                                    request.META.get(HEADER_CLIENT_VERSION, ''),
+                                    request.META.get(HEADER_PLATFORM_VERSION, ''))
+            except Exception:
+                logger.exception('error when record access of token v2:')
 
             return (user, token)
 
@@ -12,9 +12,7 @@ from seaserv import seafile_api, ccnet_api
 from pysearpc import SearpcError
 
 from seahub.avatar.settings import AVATAR_DEFAULT_SIZE
-from seahub.avatar.templatetags.avatar_tags import api_avatar_url
-from seahub.base.templatetags.seahub_tags import email2nickname, \
-        email2contact_email
+from seahub.profile.utils import get_user_infos
 from seahub.utils import is_org_context
 from seahub.utils.timeutils import timestamp_to_isoformat_timestr
 from seahub.group.utils import validate_group_name, check_group_name_conflict
@@ -129,10 +127,13 @@ class AdminAddressBookGroup(APIView):
     throttle_classes = (UserRateThrottle,)
     permission_classes = (IsAdminUser, IsProVersion)
 
-    def _get_address_book_group_memeber_info(self, request, group_member_obj, avatar_size):
+    def _get_address_book_group_memeber_info(self, request, group_member_obj,
+                                             avatar_size, user_infos=None):
 
         email = group_member_obj.user_name
-        avatar_url, is_default, date_uploaded = api_avatar_url(email, avatar_size)
+        if user_infos is None:
+            user_infos = get_user_infos([email], avatar_size)
+        user_info = user_infos[email]
 
         group_id = group_member_obj.group_id
         group = ccnet_api.get_group(group_member_obj.group_id)
@@ -148,9 +149,9 @@ class AdminAddressBookGroup(APIView):
             'group_id': group_id,
             'group_name': group.group_name,
             'email': email,
-            "name": email2nickname(email),
-            "contact_email": email2contact_email(email),
-            "avatar_url": avatar_url,
+            "name": user_info['name'],
+            "contact_email": user_info['contact_email'],
+            "avatar_url": user_info['avatar_url'],
             "is_admin": is_admin,
             "role": role,
         }
@@ -193,8 +194,10 @@ class AdminAddressBookGroup(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
+        user_infos = get_user_infos([m.user_name for m in members], avatar_size)
         for m in members:
-            member_info = self._get_address_book_group_memeber_info(request, m, avatar_size)
+            member_info = self._get_address_book_group_memeber_info(
+                request, m, avatar_size, user_infos)
             if member_info['role'] == 'Owner':
                 continue
             ret_members.append(member_info)
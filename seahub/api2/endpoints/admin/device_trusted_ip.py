@@ -15,11 +15,19 @@ from seahub.api2.permissions import IsProVersion
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.utils import api_error
 from seahub.trusted_ip.models import TrustedIP
+from seahub.trusted_ip.utils import parse_trusted_ip
 
 
 def cmp_ip(big_ip, small_ip):
     big_ip = big_ip['ip'].split('.')
     small_ip = small_ip['ip'].split('.')
+    if len(big_ip) != 4 or len(small_ip) != 4 or \
+            '/' in big_ip[3] or '/' in small_ip[3]:
+        # networks and ipv6 addresses are listed after ipv4 addresses
+        big_key = (len(big_ip) != 4 or '/' in big_ip[3], '.'.join(big_ip))
+        small_key = (len(small_ip) != 4 or '/' in small_ip[3], '.'.join(small_ip))
+        return 1 if big_key >= small_key else -1
+
     new_big_ip = []
     for ip in big_ip:
         try:
@@ -66,11 +74,19 @@ def check_parameter(func):
                 error_msg = 'IP address can not be empty.'
                 return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
 
-            try:
-                validate_ipv4_address(ipaddress.replace('*', '1'))
-            except ValidationError:
-                error_msg = "IP address invalid."
-                return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+            # ipv4 with trailing wildcards, ipv6, or network in CIDR notation,
+            # only entries `parse_trusted_ip` can match are added
+            if parse_trusted_ip(ipaddress) is None:
+                if request.method == 'POST' or '*' not in ipaddress:
+                    error_msg = "IP address invalid."
+                    return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+                # wildcard entries saved by former versions can be deleted
+                try:
+                    validate_ipv4_address(ipaddress.replace('*', '1'))
+                except ValidationError:
+                    error_msg = "IP address invalid."
+                    return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
 
         return func(view, request, *args, **kwargs)
     return _decorated
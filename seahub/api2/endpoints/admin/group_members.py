@@ -9,7 +9,8 @@ from rest_framework import status
 
 from seaserv import seafile_api, ccnet_api
 
-from seahub.group.utils import get_group_member_info, is_group_member
+from seahub.group.utils import get_group_member_info, \
+    get_group_members_info, is_group_member
 from seahub.group.signals import add_user_to_group
 from seahub.avatar.settings import AVATAR_DEFAULT_SIZE
 from seahub.base.accounts import User
@@ -72,10 +73,8 @@ class AdminGroupMembers(APIView):
         else:
             has_next_page = False
 
-        group_members_info = []
-        for m in members:
-            member_info = get_group_member_info(request, group_id, m.user_name, avatar_size)
-            group_members_info.append(member_info)
+        group_members_info = get_group_members_info(group_id, members,
+                                                    avatar_size)
 
         group_members = {
             'group_id': group_id,
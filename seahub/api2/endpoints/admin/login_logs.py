@@ -19,7 +19,6 @@ from seahub.api2.endpoints.utils import check_time_period_valid, \
         generate_links_header_for_paginator, get_user_name_dict, \
         get_user_contact_email_dict
 
-from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.utils.timeutils import datetime_to_isoformat_timestr
 
 logger = logging.getLogger(__name__)
@@ -50,11 +49,12 @@ class LoginLogs(APIView):
         result = []
         from seahub.sysadmin_extra.models import UserLoginLog
         logs = UserLoginLog.objects.filter(login_date__range=(start, end))
+        user_name_dict = get_user_name_dict([log.username for log in logs])
         for log in logs:
             result.append({
                 'login_time': datetime_to_isoformat_timestr(log.login_date),
                 'login_ip': log.login_ip,
-                'name': email2nickname(log.username),
+                'name': user_name_dict[log.username],
                 'email':log.username
             })
 
@@ -14,7 +14,7 @@ from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.permissions import IsProVersion
 from seahub.api2.utils import api_error
 
-from seahub.base.templatetags.seahub_tags import email2nickname, email2contact_email
+from seahub.profile.utils import get_user_infos
 from seahub.utils import get_file_audit_events, generate_file_audit_event_type, \
     get_file_update_events, get_perm_audit_events, is_valid_email
 from seahub.utils.timeutils import datetime_to_isoformat_timestr, utc_datetime_to_isoformat_timestr
@@ -58,11 +58,9 @@ class AdminLogsLoginLogs(APIView):
         nickname_dict = {}
         contact_email_dict = {}
         user_email_set = set([log.username for log in logs])
-        for e in user_email_set:
-            if e not in nickname_dict:
-                nickname_dict[e] = email2nickname(e)
-            if e not in contact_email_dict:
-                contact_email_dict[e] = email2contact_email(e)
+        for e, info in get_user_infos(user_email_set).items():
+            nickname_dict[e] = info['name']
+            contact_email_dict[e] = info['contact_email']
 
         logs_info = []
         for log in logs:
@@ -150,11 +148,9 @@ class AdminLogsFileAccessLogs(APIView):
             user_email_set.add(event.user)
             repo_id_set.add(event.repo_id)
 
-        for e in user_email_set:
-            if e not in nickname_dict:
-                nickname_dict[e] = email2nickname(e)
-            if e not in contact_email_dict:
-                contact_email_dict[e] = email2contact_email(e)
+        for e, info in get_user_infos(user_email_set).items():
+            nickname_dict[e] = info['name']
+            contact_email_dict[e] = info['contact_email']
         for e in repo_id_set:
             if e not in repo_dict:
                 repo_dict[e] = seafile_api.get_repo(e)
@@ -242,11 +238,9 @@ class AdminLogsFileUpdateLogs(APIView):
             user_email_set.add(event.user)
             repo_id_set.add(event.repo_id)
 
-        for e in user_email_set:
-            if e not in nickname_dict:
-                nickname_dict[e] = email2nickname(e)
-            if e not in contact_email_dict:
-                contact_email_dict[e] = email2contact_email(e)
+        for e, info in get_user_infos(user_email_set).items():
+            nickname_dict[e] = info['name']
+            contact_email_dict[e] = info['contact_email']
         for e in repo_id_set:
             if e not in repo_dict:
                 repo_dict[e] = seafile_api.get_repo(e)
@@ -343,17 +337,13 @@ class AdminLogsSharePermissionLogs(APIView):
             if event.to.isdigit():
                 to_group_id_set.add(event.to)
 
-        for e in from_user_email_set:
-            if e not in from_nickname_dict:
-                from_nickname_dict[e] = email2nickname(e)
-            if e not in from_contact_email_dict:
-                from_contact_email_dict[e] = email2contact_email(e)
-
-        for e in to_user_email_set:
-            if e not in to_nickname_dict:
-                to_nickname_dict[e] = email2nickname(e)
-            if e not in to_contact_email_dict:
-                to_contact_email_dict[e] = email2contact_email(e)
+        for e, info in get_user_infos(from_user_email_set).items():
+            from_nickname_dict[e] = info['name']
+            from_contact_email_dict[e] = info['contact_email']
+
+        for e, info in get_user_infos(to_user_email_set).items():
+            to_nickname_dict[e] = info['name']
+            to_contact_email_dict[e] = info['contact_email']
 
         for e in repo_id_set:
             if e not in repo_dict:
@@ -15,16 +15,22 @@ from seahub.api2.permissions import IsProVersion
 from seahub.api2.utils import api_error
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.authentication import TokenAuthentication
-from seahub.api2.endpoints.utils import generate_links_header_for_paginator
+from seahub.api2.endpoints.utils import generate_links_header_for_paginator, \
+        get_user_name_dict
 from seahub.base.templatetags.seahub_tags import email2nickname
 
 logger = logging.getLogger(__name__)
 
-def get_log_info(log_obj):
+def get_log_info(log_obj, user_name_dict=None):
     isoformat_timestr = datetime_to_isoformat_timestr(log_obj.datetime)
+    if user_name_dict is not None:
+        name = user_name_dict[log_obj.email]
+    else:
+        name = email2nickname(log_obj.email)
+
     log_info = {
         "email": log_obj.email,
-        "name": email2nickname(log_obj.email),
+        "name": name,
         "operation": log_obj.operation,
         "detail": json.loads(log_obj.detail),
         "datetime": isoformat_timestr,
@@ -77,8 +83,9 @@ class AdminOperationLogs(APIView):
         total_count = AdminLog.objects.get_admin_logs(email=email, operation=operation).count()
         admin_logs = AdminLog.objects.get_admin_logs(email=email, operation=operation)[offset:offset+per_page]
 
+        user_name_dict = get_user_name_dict([log.email for log in admin_logs])
         for log in admin_logs:
-            log_info = get_log_info(log)
+            log_info = get_log_info(log, user_name_dict)
             data.append(log_info)
 
         result = {'data': data, 'total_count': total_count}
@@ -19,6 +19,7 @@ from seahub.utils import is_valid_email, is_valid_username, IS_EMAIL_CONFIGURED,
 from seahub.utils.licenseparse import user_number_over_limit
 from seahub.utils.file_size import get_file_size_unit
 from seahub.base.accounts import User
+from seahub.auth.utils import clear_user_cache
 from seahub.base.templatetags.seahub_tags import email2nickname, \
         email2contact_email
 from seahub.profile.models import Profile
@@ -216,6 +217,7 @@ class AdminOrgUsers(APIView):
         # set `is_staff` parameter as `0`
         try:
             ccnet_api.add_org_user(org_id, email, 0)
+            clear_user_cache(email)
         except Exception as e:
             logger.error(e)
             error_msg = 'Internal Server Error'
@@ -398,6 +400,7 @@ class AdminOrgUser(APIView):
 
         try:
             ccnet_api.remove_org_user(org_id, email)
+            clear_user_cache(email)
             User.objects.get(email=email).delete()
         except Exception as e:
             logger.error(e)
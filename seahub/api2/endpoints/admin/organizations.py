@@ -17,6 +17,7 @@ from seahub.utils.timeutils import timestamp_to_isoformat_timestr
 from seahub.base.templatetags.seahub_tags import email2nickname, \
         email2contact_email
 from seahub.base.accounts import User
+from seahub.auth.utils import clear_user_cache
 from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.utils import api_error
@@ -382,6 +383,7 @@ class AdminOrganization(APIView):
             users = ccnet_api.get_org_emailusers(org.url_prefix, -1, -1)
             for u in users:
                 ccnet_api.remove_org_user(org_id, u.email)
+                clear_user_cache(u.email)
                 User.objects.get(email=u.email).delete()
 
             # remove org groups
@@ -10,14 +10,12 @@ from rest_framework.permissions import IsAdminUser
 from rest_framework.authentication import SessionAuthentication
 
 from seahub.base.accounts import User
-from seahub.base.templatetags.seahub_tags import email2contact_email
 from seahub.utils import EVENTS_ENABLED, get_user_activities, is_valid_email
 from seahub.utils.timeutils import utc_datetime_to_isoformat_timestr
 from seahub.api2.utils import api_error
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.authentication import TokenAuthentication
-from seahub.base.templatetags.seahub_tags import email2nickname
-from seahub.avatar.templatetags.avatar_tags import api_avatar_url
+from seahub.profile.utils import get_user_infos, get_empty_user_info
 from seahub.drafts.models import Draft
 
 logger = logging.getLogger(__name__)
@@ -70,6 +68,14 @@ class UserActivitiesView(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
+        try:
+            avatar_size = int(request.GET.get('avatar_size', 72))
+        except ValueError:
+            avatar_size = 72
+
+        user_infos = get_user_infos([e.op_user for e in events], avatar_size)
+        empty_user_info = get_empty_user_info(avatar_size)
+
         events_list = []
         for e in events:
             d = dict(op_type=e.op_type)
@@ -80,16 +86,10 @@ class UserActivitiesView(APIView):
             d['path'] = e.path
             d['name'] = '' if e.path == '/' else os.path.basename(e.path)
             d['author_email'] = e.op_user
-            d['author_name'] = email2nickname(e.op_user)
-            d['author_contact_email'] = email2contact_email(e.op_user)
-
-            try:
-                avatar_size = int(request.GET.get('avatar_size', 72))
-            except ValueError as e:
-                avatar_size = 72
-
-            url, is_default, date_uploaded = api_avatar_url(e.op_user, avatar_size)
-            d['avatar_url'] = url
+            user_info = user_infos.get(e.op_user, empty_user_info)
+            d['author_name'] = user_info['name']
+            d['author_contact_email'] = user_info['contact_email']
+            d['avatar_url'] = user_info['avatar_url']
             d['time'] = utc_datetime_to_isoformat_timestr(e.timestamp)
 
             if e.op_type == 'clean-up-trash':
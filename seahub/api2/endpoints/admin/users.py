@@ -27,9 +27,11 @@ from seahub.settings import SEND_EMAIL_ON_ADDING_SYSTEM_MEMBER, INIT_PASSWD, \
     SEND_EMAIL_ON_RESETTING_USER_PASSWD
 from seahub.base.templatetags.seahub_tags import email2nickname, email2contact_email
 from seahub.base.accounts import User
+from seahub.auth.utils import clear_user_cache
 from seahub.base.models import UserLastLogin
 from seahub.two_factor.models import default_device
 from seahub.profile.models import Profile
+from seahub.profile.utils import get_user_infos
 from seahub.profile.settings import CONTACT_CACHE_TIMEOUT, CONTACT_CACHE_PREFIX, \
     NICKNAME_CACHE_PREFIX, NICKNAME_CACHE_TIMEOUT
 from seahub.utils import is_valid_username2, is_org_context, \
@@ -220,6 +222,7 @@ def update_user_info(request, user, password, is_active, is_staff, role,
         else:
             # remove reference id
             ccnet_api.set_reference_id(email, None)
+        clear_user_cache(email)
 
     if institution_name is not None:
         Profile.objects.add_or_update(email, institution=institution_name)
@@ -389,14 +392,19 @@ class AdminUsers(APIView):
 
         data = []
         MULTI_INSTITUTION = getattr(settings, 'MULTI_INSTITUTION', False)
-        for user in users[(page-1)*per_page: page*per_page]:
+        users = users[(page-1)*per_page: page*per_page]
+        emails = [user.email for user in users]
+        user_infos = get_user_infos(emails)
+        profiles = dict((p.user, p) for p in
+                        Profile.objects.filter(user__in=emails))
+        for user in users:
 
             info = {}
             info['email'] = user.email
-            info['name'] = email2nickname(user.email)
-            info['contact_email'] = email2contact_email(user.email)
+            info['name'] = user_infos[user.email]['name']
+            info['contact_email'] = user_infos[user.email]['contact_email']
 
-            profile = Profile.objects.get_profile_by_user(user.email)
+            profile = profiles.get(user.email)
             info['login_id'] = profile.login_id if profile and profile.login_id else ''
 
             info['is_staff'] = user.is_staff
@@ -515,13 +523,17 @@ class AdminUsers(APIView):
                 users = ccnet_api.get_emailusers('LDAPImport', start, per_page)
 
         data = []
+        emails = [user.email for user in users]
+        user_infos = get_user_infos(emails)
+        profiles = dict((p.user, p) for p in
+                        Profile.objects.filter(user__in=emails))
         for user in users:
-            profile = Profile.objects.get_profile_by_user(user.email)
+            profile = profiles.get(user.email)
 
             info = {}
             info['email'] = user.email
-            info['name'] = email2nickname(user.email)
-            info['contact_email'] = email2contact_email(user.email)
+            info['name'] = user_infos[user.email]['name']
+            info['contact_email'] = user_infos[user.email]['contact_email']
             info['login_id'] = profile.login_id if profile and profile.login_id else ''
 
             info['is_staff'] = user.is_staff
@@ -1461,6 +1473,7 @@ class AdminUpdateUserCcnetEmail(APIView):
         # update
         try:
             ccnet_api.update_emailuser_id(old_ccnet_email, new_ccnet_email)
+            clear_user_cache(old_ccnet_email)
             logger.debug('the ccnet database was successfully updated')
         except Exception as e:
             logger.error(e)
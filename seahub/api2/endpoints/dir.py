@@ -2,6 +2,7 @@
 import os
 import stat
 import json
+import hashlib
 import logging
 import posixpath
 
@@ -10,6 +11,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
 from django.utils.http import urlquote
 
 from seahub.api2.throttling import UserRateThrottle
@@ -17,109 +20,266 @@ from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.utils import api_error, to_python_boolean
 from seahub.api2.views import get_dir_file_recursively
 
-from seahub.thumbnail.utils import get_thumbnail_src
+from seahub.thumbnail.index import get_existing_thumbnails
+from seahub.thumbnail.utils import get_thumbnail_src, \
+    get_file_ids_with_thumbnail
 from seahub.views import check_folder_permission
 from seahub.utils import check_filename_with_rename, is_valid_dirent_name, \
-        normalize_dir_path, is_pro_version, FILEEXT_TYPE_MAP
+        normalize_dir_path, is_pro_version, normalize_cache_key, \
+        FILEEXT_TYPE_MAP
 from seahub.utils.timeutils import timestamp_to_isoformat_timestr
 from seahub.utils.file_tags import get_files_tags_in_dir
 from seahub.utils.file_types import IMAGE, VIDEO, XMIND
 from seahub.base.models import UserStarredFiles
-from seahub.base.templatetags.seahub_tags import email2nickname, \
-        email2contact_email
+from seahub.profile.utils import get_user_infos
 from seahub.utils.repo import parse_repo_perm
 
-from seahub.settings import ENABLE_VIDEO_THUMBNAIL, THUMBNAIL_ROOT
+from seahub.settings import ENABLE_VIDEO_THUMBNAIL, DIR_LISTING_CACHE_TIMEOUT
 
 from seaserv import seafile_api
 from pysearpc import SearpcError
 
 logger = logging.getLogger(__name__)
 
+DIR_LISTING_CACHE_PREFIX = 'dir_listing_'
 
-def get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
-        with_thumbnail, thumbnail_size):
 
-    repo_id = repo_obj.id
+def _get_dir_listing_cache_key(repo_id, dir_id, permission, thumbnail_size):
+    return normalize_cache_key('%s_%s_%s_%s' % (repo_id, dir_id, permission,
+                                                thumbnail_size),
+                               DIR_LISTING_CACHE_PREFIX)
+
+def _build_dir_listing(dir_file_list, thumbnail_size):
+    """What is the same for all users with same permission of a dir id:
+    dirents sorted by name, and ids of files with thumbnail if
+    `thumbnail_size` is given.
+
+    A copied folder has the same dir id at another path, so nothing
+    depending on the path is kept; parent dir and thumbnail src are added
+    when the listing is read. Thumbnailable files without thumbnail yet
+    are kept in ``no_thumbnail``, to be checked again then.
+    """
     dir_info_list = []
     file_info_list = []
+    thumbnail = []
+    no_thumbnail = []
+
+    file_list = []
+    for dirent in dir_file_list:
+        info = {}
+        info["id"] = dirent.obj_id
+        info["name"] = dirent.obj_name
+        info["mtime"] = dirent.mtime
+        info["permission"] = dirent.permission
+        if stat.S_ISDIR(dirent.mode):
+            info["type"] = "dir"
+            dir_info_list.append(info)
+        else:
+            info["type"] = "file"
+            info["size"] = dirent.size
+            info['modifier_email'] = dirent.modifier
+            file_info_list.append(info)
+            file_list.append(dirent)
+
+    if thumbnail_size:
+        thumbnail_file_ids = get_file_ids_with_thumbnail(file_list,
+                                                         thumbnail_size)
+        for file_info in file_info_list:
+            fileExt = os.path.splitext(file_info['name'])[1][1:].lower()
+            file_type = FILEEXT_TYPE_MAP.get(fileExt)
+            if file_type not in (IMAGE, XMIND) and \
+                    not (file_type == VIDEO and ENABLE_VIDEO_THUMBNAIL):
+                continue
+
+            if file_info['id'] in thumbnail_file_ids:
+                thumbnail.append(file_info['id'])
+            else:
+                no_thumbnail.append(file_info['id'])
 
-    # get dirent(folder and file) list
-    parent_dir_id = seafile_api.get_dir_id_by_path(repo_id, parent_dir)
-    dir_file_list = seafile_api.list_dir_with_perm(repo_id,
-            parent_dir, parent_dir_id, username, -1, -1)
+    dir_info_list.sort(key=lambda x: x['name'].lower())
+    file_info_list.sort(key=lambda x: x['name'].lower())
 
+    return {
+        'dir_info_list': dir_info_list,
+        'file_info_list': file_info_list,
+        'thumbnail': thumbnail,
+        'no_thumbnail': no_thumbnail,
+    }
+
+def get_dir_listing(username, repo_obj, parent_dir, parent_dir_id,
+                    thumbnail_size, dir_file_list=None):
+    """Return listing of a dir, cached by dir id and permission of user, as
+    the dirents of a dir id never change.
+    """
+    repo_id = repo_obj.id
+    permission = seafile_api.check_permission_by_path(repo_id, parent_dir,
+                                                      username)
+    cache_key = _get_dir_listing_cache_key(repo_id, parent_dir_id,
+                                           permission, thumbnail_size)
+    listing = cache.get(cache_key)
+    if listing is None:
+        if dir_file_list is None:
+            dir_file_list = seafile_api.list_dir_with_perm(repo_id,
+                    parent_dir, parent_dir_id, username, -1, -1) or []
+        listing = _build_dir_listing(dir_file_list, thumbnail_size)
+        cache.set(cache_key, listing, DIR_LISTING_CACHE_TIMEOUT)
+        return listing
+
+    if listing['no_thumbnail']:
+        created = get_existing_thumbnails(listing['no_thumbnail'],
+                                          thumbnail_size)
+        if created:
+            listing['thumbnail'] = listing['thumbnail'] + \
+                [i for i in listing['no_thumbnail'] if i in created]
+            listing['no_thumbnail'] = [i for i in listing['no_thumbnail']
+                                       if i not in created]
+            cache.set(cache_key, listing, DIR_LISTING_CACHE_TIMEOUT)
+
+    return listing
+
+def get_dir_listing_overlay(username, repo_id, parent_dir, parent_dir_id):
+    """What may change in a dir without changing its dir id: starred items
+    of user and file tags, and in pro edition locks and permissions of sub
+    folders, which come with dirents.
+
+    Locks and permissions are only returned by listing the dir, so pro
+    edition still lists the dir on every request, even one answered with
+    304; the cached listing only saves building it.
+    """
     try:
         starred_items = UserStarredFiles.objects.filter(email=username,
                 repo_id=repo_id, path__startswith=parent_dir, org_id=-1)
-        starred_item_path_list = [f.path.rstrip('/') for f in starred_items]
+        starred_item_path_list = set(f.path.rstrip('/') for f in starred_items)
     except Exception as e:
         logger.error(e)
-        starred_item_path_list = []
+        starred_item_path_list = set()
+
+    try:
+        files_tags_in_dir = get_files_tags_in_dir(repo_id, parent_dir)
+    except Exception as e:
+        logger.error(e)
+        files_tags_in_dir = {}
+
+    dir_file_list = None
+    if is_pro_version():
+        dir_file_list = seafile_api.list_dir_with_perm(repo_id,
+                parent_dir, parent_dir_id, username, -1, -1) or []
+
+    return {
+        'starred_item_path_list': starred_item_path_list,
+        'files_tags_in_dir': files_tags_in_dir,
+        'dir_file_list': dir_file_list,
+    }
+
+def get_dir_listing_user_infos(listing, overlay):
+    """Names and contact emails of modifiers and lock owners of a dir, read
+    on every request as they change without changing the dir id.
+    """
+    emails = {x['modifier_email'] for x in listing['file_info_list']}
+    emails |= {d.lock_owner for d in overlay['dir_file_list'] or []}
+    return get_user_infos(emails)
+
+def get_dir_listing_etag(username, dir_ids, overlays, listings, user_infos,
+                         *args):
+    """ETag of dir listing, changed when a dir id, an overlay or a name of
+    a modifier or lock owner changes, or when a thumbnail is created for a
+    file of the listing.
+    """
+    md5 = hashlib.md5()
+    md5.update(json.dumps([username, dir_ids, args]).encode('utf-8'))
+    for listing in listings:
+        md5.update(json.dumps(sorted(listing['thumbnail'])).encode('utf-8'))
+    for infos in user_infos:
+        md5.update(json.dumps(infos, sort_keys=True).encode('utf-8'))
+    for overlay in overlays:
+        md5.update(json.dumps(sorted(overlay['starred_item_path_list'])).encode('utf-8'))
+        md5.update(json.dumps(overlay['files_tags_in_dir'],
+                              sort_keys=True).encode('utf-8'))
+        for dirent in overlay['dir_file_list'] or []:
+            md5.update(json.dumps([dirent.obj_name, dirent.permission,
+                                   dirent.is_locked, dirent.lock_owner,
+                                   dirent.lock_time]).encode('utf-8'))
+    return '"%s"' % md5.hexdigest()
+
+def get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
+        with_thumbnail, thumbnail_size, parent_dir_id=None, overlay=None,
+        listing=None, user_infos=None):
+
+    repo_id = repo_obj.id
+    if parent_dir_id is None:
+        parent_dir_id = seafile_api.get_dir_id_by_path(repo_id, parent_dir)
+    if overlay is None:
+        overlay = get_dir_listing_overlay(username, repo_id, parent_dir,
+                                          parent_dir_id)
+
+    if not with_thumbnail or repo_obj.encrypted:
+        thumbnail_size = None
+
+    if listing is None:
+        listing = get_dir_listing(username, repo_obj, parent_dir,
+                                  parent_dir_id, thumbnail_size,
+                                  overlay['dir_file_list'])
+
+    starred_item_path_list = overlay['starred_item_path_list']
+    files_tags_in_dir = overlay['files_tags_in_dir']
+    thumbnail_file_ids = set(listing['thumbnail'])
+    dirents = {}
+    if overlay['dir_file_list'] is not None:
+        dirents = dict((d.obj_name, d) for d in overlay['dir_file_list'])
+
+    dir_info_list = []
+    file_info_list = []
 
     # only get dir info list
     if not request_type or request_type == 'd':
-        dir_list = [dirent for dirent in dir_file_list if stat.S_ISDIR(dirent.mode)]
-        for dirent in dir_list:
-            dir_info = {}
-            dir_info["type"] = "dir"
-            dir_info["id"] = dirent.obj_id
-            dir_info["name"] = dirent.obj_name
-            dir_info["mtime"] = dirent.mtime
-            dir_info["permission"] = dirent.permission
-            dir_info["parent_dir"] = parent_dir
-            dir_info_list.append(dir_info)
+        for info in listing['dir_info_list']:
+            dir_info = dict(info)
+            dir_info['parent_dir'] = parent_dir
+            dirent = dirents.get(dir_info['name'])
+            if dirent is not None:
+                dir_info["permission"] = dirent.permission
 
             # get star info
             dir_info['starred'] = False
-            dir_path = posixpath.join(parent_dir, dirent.obj_name)
+            dir_path = posixpath.join(parent_dir, dir_info['name'])
             if dir_path.rstrip('/') in starred_item_path_list:
                 dir_info['starred'] = True
 
+            dir_info_list.append(dir_info)
+
     # only get file info list
     if not request_type or request_type == 'f':
 
-        file_list = [dirent for dirent in dir_file_list if not stat.S_ISDIR(dirent.mode)]
-
         # Use dict to reduce memcache fetch cost in large for-loop.
         nickname_dict = {}
         contact_email_dict = {}
-        modifier_set = {x.modifier for x in file_list}
-        lock_owner_set = {x.lock_owner for x in file_list}
-        for e in modifier_set | lock_owner_set:
-            if e not in nickname_dict:
-                nickname_dict[e] = email2nickname(e)
-            if e not in contact_email_dict:
-                contact_email_dict[e] = email2contact_email(e)
-
-        try:
-            files_tags_in_dir = get_files_tags_in_dir(repo_id, parent_dir)
-        except Exception as e:
-            logger.error(e)
-            files_tags_in_dir = {}
+        if user_infos is None:
+            user_infos = get_dir_listing_user_infos(listing, overlay)
+        for e, info in user_infos.items():
+            nickname_dict[e] = info['name']
+            contact_email_dict[e] = info['contact_email']
+
+        for info in listing['file_info_list']:
+            file_info = dict(info)
+            file_info['parent_dir'] = parent_dir
+            file_name = file_info['name']
+            file_path = posixpath.join(parent_dir, file_name)
 
-        for dirent in file_list:
+            # if thumbnail has already been created, return its src.
+            # Then web browser will use this src to get thumbnail instead of
+            # recreating it.
+            if file_info['id'] in thumbnail_file_ids:
+                src = get_thumbnail_src(repo_id, thumbnail_size, file_path)
+                file_info['encoded_thumbnail_src'] = urlquote(src)
 
-            file_name = dirent.obj_name
-            file_path = posixpath.join(parent_dir, file_name)
-            file_obj_id = dirent.obj_id
-
-            file_info = {}
-            file_info["type"] = "file"
-            file_info["id"] = file_obj_id
-            file_info["name"] = file_name
-            file_info["mtime"] = dirent.mtime
-            file_info["permission"] = dirent.permission
-            file_info["parent_dir"] = parent_dir
-            file_info["size"] = dirent.size
-
-            modifier_email = dirent.modifier
-            file_info['modifier_email'] = modifier_email
+            modifier_email = file_info['modifier_email']
             file_info['modifier_name'] = nickname_dict.get(modifier_email, '')
             file_info['modifier_contact_email'] = contact_email_dict.get(modifier_email, '')
 
             # get lock info
-            if is_pro_version():
+            dirent = dirents.get(file_name)
+            if dirent is not None:
+                file_info["permission"] = dirent.permission
                 file_info["is_locked"] = dirent.is_locked
                 file_info["lock_time"] = dirent.lock_time
 
@@ -145,32 +305,8 @@ def get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
                 for file_tag in file_tags:
                     file_info['file_tags'].append(file_tag)
 
-            # get thumbnail info
-            if with_thumbnail and not repo_obj.encrypted:
-
-                # used for providing a way to determine
-                # if send a request to create thumbnail.
-
-                fileExt = os.path.splitext(file_name)[1][1:].lower()
-                file_type = FILEEXT_TYPE_MAP.get(fileExt)
-
-                if file_type in (IMAGE, XMIND) or \
-                        (file_type == VIDEO and ENABLE_VIDEO_THUMBNAIL):
-
-                    # if thumbnail has already been created, return its src.
-                    # Then web browser will use this src to get thumbnail instead of
-                    # recreating it.
-                    thumbnail_file_path = os.path.join(THUMBNAIL_ROOT,
-                            str(thumbnail_size), file_obj_id)
-                    if os.path.exists(thumbnail_file_path):
-                        src = get_thumbnail_src(repo_id, thumbnail_size, file_path)
-                        file_info['encoded_thumbnail_src'] = urlquote(src)
-
             file_info_list.append(file_info)
 
-    dir_info_list.sort(key=lambda x: x['name'].lower())
-    file_info_list.sort(key=lambda x: x['name'].lower())
-
     return dir_info_list, file_info_list
 
 
@@ -303,11 +439,56 @@ class DirView(APIView):
         all_dir_info_list = []
         all_file_info_list = []
 
+        listing_thumbnail_size = thumbnail_size
+        if not with_thumbnail or repo.encrypted:
+            listing_thumbnail_size = None
+
         try:
+            parent_dir_ids = []
+            overlays = []
+            listings = []
+            user_infos = []
             for parent_dir in parent_dir_list:
+                if parent_dir == parent_dir_list[-1]:
+                    parent_dir_id = dir_id
+                else:
+                    parent_dir_id = seafile_api.get_dir_id_by_path(repo_id,
+                                                                   parent_dir)
+                parent_dir_ids.append(parent_dir_id)
+                overlay = get_dir_listing_overlay(username, repo_id,
+                                                  parent_dir, parent_dir_id)
+                overlays.append(overlay)
+                listing = get_dir_listing(username, repo, parent_dir,
+                                          parent_dir_id,
+                                          listing_thumbnail_size,
+                                          overlay['dir_file_list'])
+                listings.append(listing)
+                if request_type == 'd':
+                    user_infos.append({})
+                else:
+                    user_infos.append(get_dir_listing_user_infos(listing,
+                                                                 overlay))
+
+            # dirents of a dir id never change, the listing is unchanged
+            # unless an overlay or a name of a user changes, or a thumbnail
+            # is created
+            etag = get_dir_listing_etag(username, parent_dir_ids, overlays,
+                                        listings, user_infos, permission,
+                                        request_type, with_thumbnail,
+                                        thumbnail_size)
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                response['ETag'] = etag
+                return response
+
+            for parent_dir, parent_dir_id, overlay, listing, infos in zip(
+                    parent_dir_list, parent_dir_ids, overlays, listings,
+                    user_infos):
                 # get dir file info list
                 dir_info_list, file_info_list = get_dir_file_info_list(username,
-                        request_type, repo, parent_dir, with_thumbnail, thumbnail_size)
+                        request_type, repo, parent_dir, with_thumbnail,
+                        thumbnail_size, parent_dir_id, overlay, listing,
+                        infos)
                 all_dir_info_list.extend(dir_info_list)
                 all_file_info_list.extend(file_info_list)
         except Exception as e:
@@ -326,7 +507,9 @@ class DirView(APIView):
         else:
             response_dict['dirent_list'] = all_dir_info_list + all_file_info_list
 
-        return Response(response_dict)
+        response = Response(response_dict)
+        response['ETag'] = etag
+        return response
 
     def post(self, request, repo_id, format=None):
         """ Create, rename, revert dir.
@@ -37,6 +37,7 @@ from seahub.constants import PERMISSION_READ, PERMISSION_READ_WRITE, \
         PERMISSION_ADMIN
 from seahub.utils.repo import get_available_repo_perms
 from seahub.avatar.templatetags.avatar_tags import api_avatar_url
+from seahub.profile.utils import get_user_infos
 from seahub.settings import ENABLE_SHARE_TO_DEPARTMENT
 
 
@@ -74,16 +75,17 @@ class DirSharedItemsEndpoint(APIView):
 
         # change is_admin to True if user is repo admin.
         admin_users = ExtraSharePermission.objects.get_admin_users_by_repo(repo_id)
+        user_infos = get_user_infos([item.user for item in share_items], 72)
         ret = []
         for item in share_items:
-            avatar_url, is_default, date_uploaded = api_avatar_url(item.user, 72)
+            user_info = user_infos[item.user]
             ret.append({
                 "share_type": "user",
                 "user_info": {
                     "name": item.user,
-                    "nickname": email2nickname(item.user),
-                    "contact_email": email2contact_email(item.user),
-                    "avatar_url": avatar_url,
+                    "nickname": user_info['name'],
+                    "contact_email": user_info['contact_email'],
+                    "avatar_url": user_info['avatar_url'],
                 },
                 "permission": item.perm,
                 "is_admin": item.user in admin_users
@@ -17,23 +17,24 @@ from seahub.utils import get_file_history
 from seahub.utils.timeutils import utc_datetime_to_isoformat_timestr, timestamp_to_isoformat_timestr
 from seahub.utils.file_revisions import get_file_revisions_within_limit
 from seahub.views import check_folder_permission
-from seahub.avatar.templatetags.avatar_tags import api_avatar_url
-from seahub.base.templatetags.seahub_tags import email2nickname, \
-        email2contact_email
+from seahub.profile.utils import get_user_infos, get_empty_user_info
 
 logger = logging.getLogger(__name__)
 
-def get_new_file_history_info(ent, avatar_size):
+def get_new_file_history_info(ent, avatar_size, user_infos=None):
 
     info = {}
 
     creator_name = ent.op_user
-    url, is_default, date_uploaded = api_avatar_url(creator_name, avatar_size)
+    if user_infos is None:
+        user_infos = get_user_infos([creator_name], avatar_size)
+    user_info = user_infos.get(creator_name) or \
+        get_empty_user_info(avatar_size)
 
-    info['creator_avatar_url'] = url
+    info['creator_avatar_url'] = user_info['avatar_url']
     info['creator_email'] = creator_name
-    info['creator_name'] = email2nickname(creator_name)
-    info['creator_contact_email'] = email2contact_email(creator_name)
+    info['creator_name'] = user_info['name']
+    info['creator_contact_email'] = user_info['contact_email']
     info['op_type'] = ent.op_type
     info['ctime'] = utc_datetime_to_isoformat_timestr(ent.timestamp)
     info['commit_id'] = ent.commit_id
@@ -44,17 +45,20 @@ def get_new_file_history_info(ent, avatar_size):
 
     return info
 
-def get_file_history_info(commit, avatar_size):
+def get_file_history_info(commit, avatar_size, user_infos=None):
 
     info = {}
 
     creator_name = commit.creator_name
-    url, is_default, date_uploaded = api_avatar_url(creator_name, avatar_size)
+    if user_infos is None:
+        user_infos = get_user_infos([creator_name], avatar_size)
+    user_info = user_infos.get(creator_name) or \
+        get_empty_user_info(avatar_size)
 
-    info['creator_avatar_url'] = url
+    info['creator_avatar_url'] = user_info['avatar_url']
     info['creator_email'] = creator_name
-    info['creator_name'] = email2nickname(creator_name)
-    info['creator_contact_email'] = email2contact_email(creator_name)
+    info['creator_name'] = user_info['name']
+    info['creator_contact_email'] = user_info['contact_email']
     info['ctime'] = timestamp_to_isoformat_timestr(commit.ctime)
     info['description'] = commit.desc
     info['commit_id'] = commit.id
@@ -134,12 +138,14 @@ class FileHistoryView(APIView):
 
         result = []
         present_time = datetime.utcnow()
+        user_infos = get_user_infos([c.creator_name for c in file_revisions],
+                                    avatar_size)
         for commit in file_revisions:
             history_time = datetime.utcfromtimestamp(commit.ctime)
             if (keep_days != -1) and ((present_time - history_time).days > keep_days):
                 next_start_commit = False
                 break
-            info = get_file_history_info(commit, avatar_size)
+            info = get_file_history_info(commit, avatar_size, user_infos)
             info['path'] = path
             result.append(info)
 
@@ -214,7 +220,10 @@ class NewFileHistoryView(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
-        data = [get_new_file_history_info(ent, avatar_size) for ent in file_revisions]
+        user_infos = get_user_infos([e.op_user for e in file_revisions],
+                                    avatar_size)
+        data = [get_new_file_history_info(ent, avatar_size, user_infos)
+                for ent in file_revisions]
         result = {
             "data": data,
             "page": page,
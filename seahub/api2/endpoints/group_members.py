@@ -27,7 +27,8 @@ from seahub.utils.error_msg import file_type_error_msg
 from seahub.base.accounts import User
 from seahub.group.signals import add_user_to_group
 from seahub.group.utils import is_group_member, is_group_admin, \
-    is_group_owner, is_group_admin_or_owner, get_group_member_info
+    is_group_owner, is_group_admin_or_owner, get_group_member_info, \
+    get_group_members_info
 from seahub.profile.models import Profile
 
 from .utils import api_check_group
@@ -74,16 +75,12 @@ class GroupMembers(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
-        group_members = []
         is_admin = request.GET.get('is_admin', 'false')
-        for m in members:
+        if is_admin == 'true':
             # only return group admins
-            if is_admin == 'true' and not m.is_staff:
-                continue
-
-            member_info = get_group_member_info(request, group_id, m.user_name, avatar_size)
-            group_members.append(member_info)
+            members = [m for m in members if m.is_staff]
 
+        group_members = get_group_members_info(group_id, members, avatar_size)
         return Response(group_members)
 
     @api_check_group
@@ -7,13 +7,9 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
-from django.core.cache import cache
-
 from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.throttling import UserRateThrottle
 from seahub.notifications.models import UserNotification
-
-from seahub.notifications.models import get_cache_key_of_unseen_notifications
 from seahub.notifications.views import add_notice_from_info
 from seahub.notifications.utils import update_notice_detail
 from seahub.api2.utils import api_error, to_python_boolean
@@ -64,16 +60,8 @@ class NotificationsView(APIView):
 
                 notification_list.append(notice)
 
-        cache_key = get_cache_key_of_unseen_notifications(username)
-        unseen_count_from_cache = cache.get(cache_key, None)
-
-        # for case of count value is `0`
-        if unseen_count_from_cache is not None:
-            result['unseen_count'] = unseen_count_from_cache
-        else:
-            unseen_count = UserNotification.objects.filter(to_user=username, seen=False).count()
-            result['unseen_count'] = unseen_count
-            cache.set(cache_key, unseen_count)
+        result['unseen_count'] = \
+            UserNotification.objects.count_unseen_user_notifications(username)
 
         total_count = UserNotification.objects.filter(to_user=username).count()
 
@@ -90,14 +78,7 @@ class NotificationsView(APIView):
         """
 
         username = request.user.username
-        unseen_notices = UserNotification.objects.get_user_notifications(username,
-                                                                         seen=False)
-        for notice in unseen_notices:
-            notice.seen = True
-            notice.save()
-
-        cache_key = get_cache_key_of_unseen_notifications(username)
-        cache.delete(cache_key)
+        UserNotification.objects.mark_user_notifications_seen(username)
 
         return Response({'success': True})
 
@@ -111,9 +92,6 @@ class NotificationsView(APIView):
 
         UserNotification.objects.remove_user_notifications(username)
 
-        cache_key = get_cache_key_of_unseen_notifications(username)
-        cache.delete(cache_key)
-
         return Response({'success': True})
 
 
@@ -156,10 +134,7 @@ class NotificationView(APIView):
             return api_error(status.HTTP_403_FORBIDDEN, error_msg)
 
         if not notice.seen:
-            notice.seen = True
-            notice.save()
-
-        cache_key = get_cache_key_of_unseen_notifications(username)
-        cache.delete(cache_key)
+            UserNotification.objects.mark_notifications_seen(username,
+                                                             [notice.id])
 
         return Response({'success': True})
@@ -17,6 +17,7 @@ from seahub.api2.endpoints.group_owned_libraries import get_group_id_by_repo_own
 from seahub.base.models import UserStarredFiles
 from seahub.base.templatetags.seahub_tags import email2nickname, \
         email2contact_email
+from seahub.profile.utils import get_user_infos
 from seahub.signals import repo_deleted
 from seahub.views import check_folder_permission, list_inner_pub_repos
 from seahub.share.models import ExtraSharePermission
@@ -92,11 +93,9 @@ class ReposView(APIView):
 
             # Reduce memcache fetch ops.
             modifiers_set = {x.last_modifier for x in owned_repos}
-            for e in modifiers_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
+            for e, info in get_user_infos(modifiers_set | {email}).items():
+                nickname_dict[e] = info['name']
+                contact_email_dict[e] = info['contact_email']
 
             owned_repos.sort(key=lambda x: x.last_modify, reverse=True)
             for r in owned_repos:
@@ -110,8 +109,8 @@ class ReposView(APIView):
                     "repo_id": r.id,
                     "repo_name": r.name,
                     "owner_email": email,
-                    "owner_name": email2nickname(email),
-                    "owner_contact_email": email2contact_email(email),
+                    "owner_name": nickname_dict.get(email, ''),
+                    "owner_contact_email": contact_email_dict.get(email, ''),
                     "last_modified": timestamp_to_isoformat_timestr(r.last_modify),
                     "modifier_email": r.last_modifier,
                     "modifier_name": nickname_dict.get(r.last_modifier, ''),
@@ -143,11 +142,9 @@ class ReposView(APIView):
             # Reduce memcache fetch ops.
             owners_set = {x.user for x in shared_repos}
             modifiers_set = {x.last_modifier for x in shared_repos}
-            for e in owners_set | modifiers_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
+            for e, info in get_user_infos(owners_set | modifiers_set).items():
+                nickname_dict[e] = info['name']
+                contact_email_dict[e] = info['contact_email']
 
             shared_repos.sort(key=lambda x: x.last_modify, reverse=True)
             for r in shared_repos:
@@ -202,11 +199,9 @@ class ReposView(APIView):
             # Reduce memcache fetch ops.
             share_from_set = {x.user for x in group_repos}
             modifiers_set = {x.last_modifier for x in group_repos}
-            for e in modifiers_set | share_from_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
+            for e, info in get_user_infos(modifiers_set | share_from_set).items():
+                nickname_dict[e] = info['name']
+                contact_email_dict[e] = info['contact_email']
 
             for r in group_repos:
                 repo_info = {
@@ -245,11 +240,9 @@ class ReposView(APIView):
             owner_set = set(all_repo_owner)
             share_from_set = {x.user for x in public_repos}
             modifiers_set = {x.last_modifier for x in public_repos}
-            for e in modifiers_set | share_from_set | owner_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
+            for e, info in get_user_infos(modifiers_set | share_from_set | owner_set).items():
+                nickname_dict[e] = info['name']
+                contact_email_dict[e] = info['contact_email']
 
             for r in public_repos:
                 repo_owner = repo_id_owner_dict[r.repo_id]
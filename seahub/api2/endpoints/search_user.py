@@ -20,11 +20,9 @@ from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.utils import api_error
 from seahub.utils import is_valid_email, is_org_context
 from seahub.base.accounts import User
-from seahub.base.templatetags.seahub_tags import email2nickname, \
-        email2contact_email
 from seahub.profile.models import Profile
+from seahub.profile.utils import get_user_infos
 from seahub.contacts.models import Contact
-from seahub.avatar.templatetags.avatar_tags import api_avatar_url
 
 from seahub.settings import ENABLE_GLOBAL_ADDRESSBOOK, \
     ENABLE_SEARCH_FROM_LDAP_DIRECTLY
@@ -176,13 +174,14 @@ class SearchUser(APIView):
 def format_searched_user_result(request, users, size):
     results = []
 
+    user_infos = get_user_infos(users, size)
     for email in users:
-        url, is_default, date_uploaded = api_avatar_url(email, size)
+        info = user_infos[email]
         results.append({
             "email": email,
-            "avatar_url": url,
-            "name": email2nickname(email),
-            "contact_email": email2contact_email(email),
+            "avatar_url": info['avatar_url'],
+            "name": info['name'],
+            "contact_email": info['contact_email'],
         })
 
     return results
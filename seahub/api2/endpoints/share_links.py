@@ -40,12 +40,13 @@ from seahub.utils.file_tags import get_tagged_files, get_files_tags_in_dir
 from seahub.utils.timeutils import datetime_to_isoformat_timestr, \
         timestamp_to_isoformat_timestr
 from seahub.utils.repo import parse_repo_perm
-from seahub.thumbnail.utils import get_share_link_thumbnail_src
+from seahub.thumbnail.utils import get_share_link_thumbnail_src, \
+    get_file_ids_with_thumbnail
 from seahub.settings import SHARE_LINK_EXPIRE_DAYS_MAX, \
         SHARE_LINK_EXPIRE_DAYS_MIN, SHARE_LINK_LOGIN_REQUIRED, \
         SHARE_LINK_EXPIRE_DAYS_DEFAULT, \
         ENABLE_SHARE_LINK_AUDIT, ENABLE_VIDEO_THUMBNAIL, \
-        THUMBNAIL_ROOT, ENABLE_UPLOAD_LINK_VIRUS_CHECK
+        ENABLE_UPLOAD_LINK_VIRUS_CHECK
 from seahub.wiki.models import Wiki
 from seahub.views.file import can_edit_file
 from seahub.views import check_folder_permission
@@ -798,6 +799,9 @@ class ShareLinkDirents(APIView):
             logger.error(e)
             files_tags_in_dir = {}
 
+        thumbnail_file_ids = get_file_ids_with_thumbnail(
+            [d for d in dirent_list if not stat.S_ISDIR(d.mode)], thumbnail_size)
+
         result = []
         for dirent in dirent_list:
 
@@ -822,7 +826,7 @@ class ShareLinkDirents(APIView):
                 if file_type in (IMAGE, XMIND) or \
                         (file_type == VIDEO and ENABLE_VIDEO_THUMBNAIL):
 
-                    if os.path.exists(os.path.join(THUMBNAIL_ROOT, str(thumbnail_size), dirent.obj_id)):
+                    if dirent.obj_id in thumbnail_file_ids:
                         req_image_path = posixpath.join(request_path, dirent.obj_name)
                         src = get_share_link_thumbnail_src(token, thumbnail_size, req_image_path)
                         dirent_info['encoded_thumbnail_src'] = urlquote(src)
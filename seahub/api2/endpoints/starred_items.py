@@ -19,12 +19,13 @@ from seahub.utils import normalize_file_path, normalize_dir_path, is_org_context
     get_file_type_and_ext
 from seahub.views import check_folder_permission
 from seahub.thumbnail.utils import get_thumbnail_src
+from seahub.thumbnail.store import thumbnail_exists
 
 from seahub.base.models import UserStarredFiles
 from seahub.base.templatetags.seahub_tags import email2nickname, \
         email2contact_email
 from seahub.settings import ENABLE_VIDEO_THUMBNAIL, \
-    THUMBNAIL_ROOT, THUMBNAIL_DEFAULT_SIZE
+    THUMBNAIL_DEFAULT_SIZE
 from seahub.utils.file_types import IMAGE, VIDEO, XMIND
 
 logger = logging.getLogger(__name__)
@@ -63,9 +64,7 @@ class StarredItems(APIView):
                 if file_type in (IMAGE, XMIND) or \
                         (file_type == VIDEO and ENABLE_VIDEO_THUMBNAIL):
                     thumbnail_size = THUMBNAIL_DEFAULT_SIZE
-                    thumbnail_file_path = os.path.join(THUMBNAIL_ROOT,
-                            str(thumbnail_size), dirent.obj_id)
-                    if os.path.exists(thumbnail_file_path):
+                    if thumbnail_exists(dirent.obj_id, thumbnail_size):
                         src = get_thumbnail_src(repo_id, thumbnail_size, path)
                         item_info['encoded_thumbnail_src'] = urlquote(src)
 
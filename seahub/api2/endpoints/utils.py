@@ -11,8 +11,7 @@ from seaserv import ccnet_api, seafile_api
 from pysearpc import SearpcError
 
 from seahub.api2.utils import api_error
-from seahub.base.templatetags.seahub_tags import email2nickname, \
-        email2contact_email
+from seahub.profile.utils import get_user_infos
 from seahub.utils import get_log_events_by_time, is_pro_version, is_org_context
 
 try:
@@ -77,19 +76,21 @@ def is_org_user(username, org_id=None):
 
 def get_user_contact_email_dict(email_list):
     email_list = set(email_list)
+    user_infos = get_user_infos(email_list)
     user_contact_email_dict = {}
     for email in email_list:
-        if email not in user_contact_email_dict:
-            user_contact_email_dict[email] = email2contact_email(email)
+        info = user_infos.get(email)
+        user_contact_email_dict[email] = info['contact_email'] if info else ''
 
     return user_contact_email_dict
 
 def get_user_name_dict(email_list):
     email_list = set(email_list)
+    user_infos = get_user_infos(email_list)
     user_name_dict = {}
     for email in email_list:
-        if email not in user_name_dict:
-            user_name_dict[email] = email2nickname(email)
+        info = user_infos.get(email)
+        user_name_dict[email] = info['name'] if info else ''
 
     return user_name_dict
 
@@ -217,3 +217,16 @@ class TokenV2(models.Model):
                     last_accessed=self.last_accessed,
                     last_login_ip=self.last_login_ip,
                     wiped_at=self.wiped_at)
+
+
+########## signal handlers
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+@receiver(post_save, sender=TokenV2)
+@receiver(post_delete, sender=TokenV2)
+def clear_token_cache(sender, instance, **kwargs):
+    from seahub.api2.token_cache import clear_api_token_cache
+    clear_api_token_cache(instance.key)
@@ -11,6 +11,21 @@ import time
 
 from seahub.utils.ip import get_remote_ip
 
+# allowed and throttled requests per scope in this process
+_throttle_stats = {}
+
+
+def _count_throttle(scope, allowed):
+    stats = _throttle_stats.setdefault(scope, {'allowed': 0, 'throttled': 0})
+    stats['allowed' if allowed else 'throttled'] += 1
+
+def get_throttle_stats():
+    """
+    Return numbers of allowed and throttled requests per scope in this
+    process.
+    """
+    return dict((scope, dict(stats)) for scope, stats in
+                _throttle_stats.items())
 
 class BaseThrottle(object):
     """
@@ -59,7 +74,18 @@ class SimpleRateThrottle(BaseThrottle):
 
     Period should be one of: ('s', 'sec', 'm', 'min', 'h', 'hour', 'd', 'day')
 
-    Previous request information used for throttling is stored in the cache.
+    Requests are limited with the generic cell rate algorithm (GCRA): every
+    request moves a "theoretical arrival time" (TAT) one emission interval
+    (period / number_of_requests) forward, and a request is allowed as long
+    as the TAT stays within one period from now. So a client may send up to
+    `number_of_requests` at once, then one per emission interval.
+
+    The TAT is stored in the cache as an integer of milliseconds and moved
+    with `cache.incr`, which is atomic in memcached, redis and the default
+    cache backend, so concurrent workers do not lose requests. Keys start
+    with ``throttle_``, which the default tiered cache keeps in its shared
+    tier only, so they neither fill nor invalidate the in-memory tier of
+    any process.
     """
 
     cache = default_cache
@@ -126,46 +152,69 @@ class SimpleRateThrottle(BaseThrottle):
         if self.key is None:
             return True
 
-        self.history = self.cache.get(self.key, [])
-        self.now = self.timer()
+        self.now = int(self.timer() * 1000)
+        self.interval = max(self.duration * 1000 // self.num_requests, 1)
+        self.tat = self._increase_tat()
 
-        # Drop any requests from the history which have now passed the
-        # throttle duration
-        while self.history and self.history[-1] <= self.now - self.duration:
-            self.history.pop()
-        if len(self.history) >= self.num_requests:
+        if self.tat - self.now > self.duration * 1000:
+            # give back the interval taken by this request
+            try:
+                self.cache.incr(self.key, -self.interval)
+            except ValueError:
+                pass
             return self.throttle_failure()
         return self.throttle_success()
 
+    def _increase_tat(self):
+        """
+        Move TAT of the client one interval forward, return the new TAT.
+        """
+        tat = self.now + self.interval
+        if self.cache.add(self.key, tat, self.duration):
+            return tat
+
+        try:
+            tat = self.cache.incr(self.key, self.interval)
+        except ValueError:
+            # expired right after `add`
+            self.cache.set(self.key, tat, self.duration)
+            return tat
+
+        if tat - self.interval < self.now:
+            # the client was idle, unused intervals are not saved up for a
+            # later burst. An interval taken by a concurrent request in
+            # between may be lost, which only happens to an idle client.
+            tat = self.now + self.interval
+            self.cache.set(self.key, tat, self.duration)
+        elif tat - self.now > self.duration * 1000 // 2:
+            # keep a busy client from starting over when the key expires
+            self.cache.touch(self.key, self.duration)
+
+        return tat
+
     def throttle_success(self):
         """
-        Inserts the current request's timestamp along with the key
-        into the cache.
+        Called when a request to the API is allowed.
         """
-        self.history.insert(0, self.now)
-        self.cache.set(self.key, self.history, self.duration)
+        _count_throttle(self.scope, True)
         return True
 
     def throttle_failure(self):
         """
         Called when a request to the API has failed due to throttling.
         """
+        _count_throttle(self.scope, False)
         return False
 
     def wait(self):
         """
         Returns the recommended next request time in seconds.
         """
-        if self.history:
-            remaining_duration = self.duration - (self.now - self.history[-1])
-        else:
-            remaining_duration = self.duration
-
-        available_requests = self.num_requests - len(self.history) + 1
-        if available_requests <= 0:
+        remaining = self.tat - self.now - self.duration * 1000
+        if remaining <= 0:
             return None
 
-        return remaining_duration / float(available_requests)
+        return remaining / 1000.0
 
 
 class AnonRateThrottle(SimpleRateThrottle):
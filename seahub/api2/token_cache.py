@@ -0,0 +1,145 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Cache of api tokens, so authenticating a client request does not need a
+database query.
+
+Tokens are cached by key and dropped from cache whenever they are saved or
+deleted. Changes of ``last_accessed``, ``last_login_ip``, ``client_version``
+and ``platform_version`` of device tokens are kept in memory and written to
+database in one query every ``API_TOKEN_FLUSH_INTERVAL`` seconds, instead of
+saving the token in the request. Until then they are shared with other
+processes in a separate cache key, the cached token itself is only written
+from database, so a token deleted meanwhile is never put back.
+"""
+import atexit
+import logging
+import datetime
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from seahub.api2.models import Token, TokenV2
+from seahub.utils import normalize_cache_key
+from seahub.utils.background import run_later
+
+logger = logging.getLogger(__name__)
+
+API_TOKEN_CACHE_PREFIX = 'ApiToken_'
+API_TOKEN_ACCESS_CACHE_PREFIX = 'ApiTokenAccess_'
+
+ACCESS_FIELDS = ('last_accessed', 'last_login_ip', 'client_version',
+                 'platform_version')
+
+# only refresh `last_accessed` if it is older than this, in seconds
+LAST_ACCESSED_PRECISION = 10 * 60
+
+# device tokens with changes not written to database yet, by key
+_pending_tokens = {}
+_pending_lock = threading.Lock()
+
+
+def _get_token_cache_key(key):
+    return normalize_cache_key(key, prefix=API_TOKEN_CACHE_PREFIX)
+
+def _get_token_access_cache_key(key):
+    return normalize_cache_key(key, prefix=API_TOKEN_ACCESS_CACHE_PREFIX)
+
+def get_api_token(key):
+    """Return `TokenV2` or `Token` of `key`, or None if there is no such token.
+    """
+    cache_key = _get_token_cache_key(key)
+    access_cache_key = _get_token_access_cache_key(key)
+    cached = cache.get_many([cache_key, access_cache_key])
+
+    token = cached.get(cache_key)
+    if token is None:
+        token = TokenV2.objects.filter(key=key).first() or \
+            Token.objects.filter(key=key).first()
+        if token is None:
+            return None
+
+        cache.set(cache_key, token, settings.API_TOKEN_CACHE_TIMEOUT)
+
+    # access info recorded by any process and not written to database yet
+    access = cached.get(access_cache_key)
+    if access and isinstance(token, TokenV2):
+        for field, value in access.items():
+            setattr(token, field, value)
+
+    return token
+
+def clear_api_token_cache(key):
+    # the token is saved or deleted, recorded access info is outdated
+    with _pending_lock:
+        _pending_tokens.pop(key, None)
+    cache.delete_many([_get_token_cache_key(key),
+                       _get_token_access_cache_key(key)])
+
+def record_token_access(token, ip, client_version, platform_version):
+    """Update access info of a device token, it is written to database
+    later by `flush_token_access`.
+    """
+    changed = False
+    if ip and ip != token.last_login_ip:
+        token.last_login_ip = ip
+        changed = True
+
+    if client_version and client_version != token.client_version:
+        token.client_version = client_version
+        changed = True
+
+    if platform_version and platform_version != token.platform_version:
+        token.platform_version = platform_version
+        changed = True
+
+    now = datetime.datetime.now()
+    if not token.last_accessed or (now - token.last_accessed).total_seconds() \
+            > LAST_ACCESSED_PRECISION:
+        changed = True
+
+    if not changed:
+        return
+
+    token.last_accessed = now
+
+    # other processes compare with the new values from now on
+    cache.set(_get_token_access_cache_key(token.key),
+              dict((field, getattr(token, field)) for field in ACCESS_FIELDS),
+              settings.API_TOKEN_CACHE_TIMEOUT)
+
+    with _pending_lock:
+        start_timer = not _pending_tokens
+        _pending_tokens[token.key] = token
+
+    if start_timer:
+        run_later(settings.API_TOKEN_FLUSH_INTERVAL, _flush_in_thread)
+
+def flush_token_access():
+    """Write recorded access info of device tokens to database.
+
+    Return number of tokens written.
+    """
+    global _pending_tokens
+    with _pending_lock:
+        tokens, _pending_tokens = list(_pending_tokens.values()), {}
+
+    if not tokens:
+        return 0
+
+    # bulk update does not send `post_save`, so cached tokens are kept
+    TokenV2.objects.bulk_update(tokens, ACCESS_FIELDS, batch_size=500)
+    return len(tokens)
+
+def _flush_in_thread():
+    try:
+        flush_token_access()
+    except Exception as e:
+        logger.error('Failed to update access info of api tokens: %s' % e)
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush_token_access()
+    except Exception as e:
+        logger.error('Failed to update access info of api tokens: %s' % e)
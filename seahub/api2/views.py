@@ -8,6 +8,7 @@ import json
 import datetime
 import posixpath
 import re
+from collections import deque
 from dateutil.relativedelta import relativedelta
 from urllib.parse import quote
 
@@ -24,7 +25,7 @@ from django.contrib.auth.hashers import check_password
 from django.contrib.sites.shortcuts import get_current_site
 from django.db import IntegrityError
 from django.db.models import F
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.template.defaultfilters import filesizeformat
 from django.utils import timezone
 from django.utils.translation import ugettext as _
@@ -55,9 +56,11 @@ from seahub.group.views import remove_group_common, \
 from seahub.group.utils import BadGroupNameError, ConflictGroupNameError, \
     validate_group_name, is_group_member, group_id_to_name, is_group_admin
 from seahub.thumbnail.utils import generate_thumbnail
+from seahub.thumbnail.store import read_thumbnail
 from seahub.notifications.models import UserNotification
 from seahub.options.models import UserOptions
 from seahub.profile.models import Profile, DetailedProfile
+from seahub.profile.utils import get_user_infos
 from seahub.drafts.models import Draft
 from seahub.drafts.utils import get_file_draft, \
     is_draft_file, has_draft_file
@@ -97,7 +100,7 @@ from seahub.utils import HAS_OFFICE_CONVERTER
 if HAS_OFFICE_CONVERTER:
     from seahub.utils import query_office_convert_status, prepare_converted_html
 import seahub.settings as settings
-from seahub.settings import THUMBNAIL_EXTENSION, THUMBNAIL_ROOT, \
+from seahub.settings import THUMBNAIL_EXTENSION, \
     FILE_LOCK_EXPIRATION_DAYS, ENABLE_STORAGE_CLASSES, \
     STORAGE_CLASS_MAPPING_POLICY, \
     ENABLE_RESET_ENCRYPTED_REPO_PASSWORD, SHARE_LINK_EXPIRE_DAYS_MAX, \
@@ -147,6 +150,9 @@ HTTP_441_REPO_PASSWD_MAGIC_REQUIRED = 441
 HTTP_443_ABOVE_QUOTA = 443
 HTTP_520_OPERATION_FAILED = 520
 
+# dirents listed from seafile at a time when a dir listing is streamed
+DIR_LIST_PAGE_SIZE = 1000
+
 ########## Test
 class Ping(APIView):
     """
@@ -2042,61 +2048,146 @@ class UpdateBlksLinkView(APIView):
         url = gen_file_upload_url(token, 'update-blks-api')
         return Response(url)
 
-def get_dir_file_recursively(username, repo_id, path, all_dirs):
+def iter_dir_file_recursively(username, repo_id, path, dir_id=None):
+    """Yield entries of every dir and file under `path`, level by level.
+
+    Names of modifiers and lock owners are not set, see
+    `add_dir_file_user_names`.
+    """
     is_pro = is_pro_version()
-    path_id = seafile_api.get_dir_id_by_path(repo_id, path)
-    dirs = seafile_api.list_dir_with_perm(repo_id, path,
-            path_id, username, -1, -1)
+    dirs = deque([(path, dir_id or seafile_api.get_dir_id_by_path(repo_id, path))])
+    while dirs:
+        parent_dir, parent_dir_id = dirs.popleft()
+        dirents = seafile_api.list_dir_with_perm(repo_id, parent_dir,
+                parent_dir_id, username, -1, -1) or []
 
-    for dirent in dirs:
-        entry = {}
-        if stat.S_ISDIR(dirent.mode):
-            entry["type"] = 'dir'
-        else:
-            entry["type"] = 'file'
-            entry['modifier_email'] = dirent.modifier
-            entry["size"] = dirent.size
+        for dirent in dirents:
+            entry = {}
+            if stat.S_ISDIR(dirent.mode):
+                entry["type"] = 'dir'
+                # id of a dir is its dir id, no need to look it up by path
+                dirs.append((posixpath.join(parent_dir, dirent.obj_name),
+                             dirent.obj_id))
+            else:
+                entry["type"] = 'file'
+                entry['modifier_email'] = dirent.modifier
+                entry["size"] = dirent.size
 
-            if is_pro:
-                entry["is_locked"] = dirent.is_locked
-                entry["lock_owner"] = dirent.lock_owner
-                if dirent.lock_owner:
-                    entry["lock_owner_name"] = email2nickname(dirent.lock_owner)
-                entry["lock_time"] = dirent.lock_time
-                if username == dirent.lock_owner:
-                    entry["locked_by_me"] = True
-                else:
-                    entry["locked_by_me"] = False
+                if is_pro:
+                    entry["is_locked"] = dirent.is_locked
+                    entry["lock_owner"] = dirent.lock_owner
+                    entry["lock_time"] = dirent.lock_time
+                    if username == dirent.lock_owner:
+                        entry["locked_by_me"] = True
+                    else:
+                        entry["locked_by_me"] = False
 
-        entry["parent_dir"] = path
-        entry["id"] = dirent.obj_id
-        entry["name"] = dirent.obj_name
-        entry["mtime"] = dirent.mtime
-        entry["permission"] = dirent.permission
+            entry["parent_dir"] = parent_dir
+            entry["id"] = dirent.obj_id
+            entry["name"] = dirent.obj_name
+            entry["mtime"] = dirent.mtime
+            entry["permission"] = dirent.permission
 
-        all_dirs.append(entry)
+            yield entry
 
-        # Use dict to reduce memcache fetch cost in large for-loop.
-        file_list =  [item for item in all_dirs if item['type'] == 'file']
-        contact_email_dict = {}
-        nickname_dict = {}
-        modifiers_set = {x['modifier_email'] for x in file_list}
-        for e in modifiers_set:
-            if e not in contact_email_dict:
-                contact_email_dict[e] = email2contact_email(e)
-            if e not in nickname_dict:
-                nickname_dict[e] = email2nickname(e)
+def add_dir_file_user_names(entries):
+    """Set names of modifiers and lock owners of file entries, with users
+    looked up at once.
+    """
+    emails = set()
+    for e in entries:
+        if e['type'] == 'file':
+            emails.add(e['modifier_email'])
+            if e.get('lock_owner'):
+                emails.add(e['lock_owner'])
+
+    user_infos = get_user_infos(emails)
+    for e in entries:
+        if e['type'] != 'file':
+            continue
+
+        info = user_infos.get(e['modifier_email'], {})
+        e['modifier_contact_email'] = info.get('contact_email', '')
+        e['modifier_name'] = info.get('name', '')
+        if e.get('lock_owner'):
+            e['lock_owner_name'] = user_infos[e['lock_owner']]['name']
+
+def get_dir_file_recursively(username, repo_id, path, all_dirs, dir_id=None):
+    all_dirs.extend(iter_dir_file_recursively(username, repo_id, path, dir_id))
+    add_dir_file_user_names(all_dirs)
+    return all_dirs
 
-        for e in file_list:
-            e['modifier_contact_email'] = contact_email_dict.get(e['modifier_email'], '')
-            e['modifier_name'] = nickname_dict.get(e['modifier_email'], '')
+def stream_dir_file_recursively(username, repo_id, path, dir_id=None,
+                                request_type=None, batch_size=DIR_LIST_PAGE_SIZE):
+    """Yield entries under `path` as json lines, like
+    `stream_dir_entrys_by_id`, so the entries need not be kept in memory.
+    """
+    batch = []
+    entries = iter_dir_file_recursively(username, repo_id, path, dir_id)
+    while True:
+        entry = next(entries, None)
+        if entry is not None:
+            if request_type == 'f' and entry['type'] != 'file' or \
+                    request_type == 'd' and entry['type'] != 'dir':
+                continue
+            batch.append(entry)
+            if len(batch) < batch_size:
+                continue
 
+        add_dir_file_user_names(batch)
+        for e in batch:
+            yield json.dumps(e) + '\n'
+        batch = []
 
-        if stat.S_ISDIR(dirent.mode):
-            sub_path = posixpath.join(path, dirent.obj_name)
-            get_dir_file_recursively(username, repo_id, sub_path, all_dirs)
+        if entry is None:
+            break
 
-    return all_dirs
+def get_dirent_entry(repo, dirent, username, is_pro):
+    """Entry of a dirent in dir listing, without names of modifier and lock
+    owner, see `add_dir_file_user_names`.
+    """
+    entry = {}
+    if stat.S_ISDIR(dirent.mode):
+        dtype = "dir"
+    else:
+        dtype = "file"
+        entry['modifier_email'] = dirent.modifier
+        if repo.version == 0:
+            entry["size"] = get_file_size(repo.store_id, repo.version,
+                                          dirent.obj_id)
+        else:
+            entry["size"] = dirent.size
+        if is_pro:
+            entry["is_locked"] = dirent.is_locked
+            entry["lock_owner"] = dirent.lock_owner
+            entry["lock_time"] = dirent.lock_time
+            if username == dirent.lock_owner:
+                entry["locked_by_me"] = True
+            else:
+                entry["locked_by_me"] = False
+
+    entry["type"] = dtype
+    entry["name"] = dirent.obj_name
+    entry["id"] = dirent.obj_id
+    entry["mtime"] = dirent.mtime
+    entry["permission"] = dirent.permission
+    return entry
+
+def add_dir_file_tags_and_starred(entries, path, files_tags_in_dir,
+                                  starred_files):
+    for e in entries:
+        if e['type'] != 'file':
+            continue
+
+        file_tags = files_tags_in_dir.get(e['name'])
+        if file_tags:
+            e['file_tags'] = []
+            for file_tag in file_tags:
+                e['file_tags'].append(file_tag)
+        file_path = posixpath.join(path, e['name'])
+        e['starred'] = False
+        if normalize_file_path(file_path) in starred_files:
+            e['starred'] = True
 
 def get_dir_entrys_by_id(request, repo, path, dir_id, request_type=None):
     """ Get dirents in a dir
@@ -2115,66 +2206,21 @@ def get_dir_entrys_by_id(request, repo, path, dir_id, request_type=None):
         return api_error(HTTP_520_OPERATION_FAILED,
                          "Failed to list dir.")
 
+    is_pro = is_pro_version()
     dir_list, file_list = [], []
     for dirent in dirs:
-        entry = {}
-        if stat.S_ISDIR(dirent.mode):
-            dtype = "dir"
-        else:
-            dtype = "file"
-            entry['modifier_email'] = dirent.modifier
-            if repo.version == 0:
-                entry["size"] = get_file_size(repo.store_id, repo.version,
-                                              dirent.obj_id)
-            else:
-                entry["size"] = dirent.size
-            if is_pro_version():
-                entry["is_locked"] = dirent.is_locked
-                entry["lock_owner"] = dirent.lock_owner
-                if dirent.lock_owner:
-                    entry["lock_owner_name"] = email2nickname(dirent.lock_owner)
-                entry["lock_time"] = dirent.lock_time
-                if username == dirent.lock_owner:
-                    entry["locked_by_me"] = True
-                else:
-                    entry["locked_by_me"] = False
-
-        entry["type"] = dtype
-        entry["name"] = dirent.obj_name
-        entry["id"] = dirent.obj_id
-        entry["mtime"] = dirent.mtime
-        entry["permission"] = dirent.permission
-        if dtype == 'dir':
+        entry = get_dirent_entry(repo, dirent, username, is_pro)
+        if entry['type'] == 'dir':
             dir_list.append(entry)
         else:
             file_list.append(entry)
 
-    # Use dict to reduce memcache fetch cost in large for-loop.
-    contact_email_dict = {}
-    nickname_dict = {}
-    modifiers_set = {x['modifier_email'] for x in file_list}
-    for e in modifiers_set:
-        if e not in contact_email_dict:
-            contact_email_dict[e] = email2contact_email(e)
-        if e not in nickname_dict:
-            nickname_dict[e] = email2nickname(e)
-
-    starred_files = get_dir_starred_files(username, repo.id, path)
+    starred_files = set(get_dir_starred_files(username, repo.id, path))
     files_tags_in_dir = get_files_tags_in_dir(repo.id, path)
 
-    for e in file_list:
-        e['modifier_contact_email'] = contact_email_dict.get(e['modifier_email'], '')
-        e['modifier_name'] = nickname_dict.get(e['modifier_email'], '')
-
-        file_tags = files_tags_in_dir.get(e['name'])
-        if file_tags:
-            e['file_tags'] = []
-            for file_tag in file_tags:
-                e['file_tags'].append(file_tag)
-        file_path = posixpath.join(path, e['name'])
-        e['starred'] = False
-        if normalize_file_path(file_path) in starred_files:
-            e['starred'] = True
+    add_dir_file_user_names(file_list)
+    add_dir_file_tags_and_starred(file_list, path, files_tags_in_dir,
+                                  starred_files)
 
     dir_list.sort(key=lambda x: x['name'].lower())
     file_list.sort(key=lambda x: x['name'].lower())
@@ -2192,6 +2238,74 @@ def get_dir_entrys_by_id(request, repo, path, dir_id, request_type=None):
     response["dir_perm"] = seafile_api.check_permission_by_path(repo.id, path, username)
     return response
 
+def iter_dirents(repo_id, path, dir_id, username, offset=0, limit=-1):
+    """Yield dirents of a dir from `offset`, at most `limit` of them or all
+    if `limit` is -1, listed from seafile page by page.
+    """
+    while limit != 0:
+        if limit < 0:
+            page_size = DIR_LIST_PAGE_SIZE
+        else:
+            page_size = min(limit, DIR_LIST_PAGE_SIZE)
+
+        dirents = seafile_api.list_dir_with_perm(repo_id, path, dir_id,
+                username, offset, page_size) or []
+        for dirent in dirents:
+            yield dirent
+
+        if len(dirents) < page_size:
+            return
+        offset += len(dirents)
+        if limit > 0:
+            limit -= len(dirents)
+
+def stream_dir_entrys_by_id(repo, path, dir_id, username, request_type=None,
+                            offset=0, limit=-1):
+    """Yield entries of a dir as lines of json, in the order of dirents in
+    seafile instead of dirs first and sorted by name.
+
+    If `limit` entries are sent and there are more, the last line is
+    ``{"next_cursor": ..}``, to be passed as `cursor` for the next page.
+    """
+    is_pro = is_pro_version()
+    starred_files = set(get_dir_starred_files(username, repo.id, path))
+    files_tags_in_dir = get_files_tags_in_dir(repo.id, path)
+
+    # one more dirent tells whether there is a next page
+    dirents = iter_dirents(repo.id, path, dir_id, username, offset,
+                           limit + 1 if limit > 0 else -1)
+    count = 0
+    next_cursor = None
+    batch = []
+    while True:
+        dirent = next(dirents, None)
+        if dirent is not None:
+            if count == limit:
+                next_cursor = offset + count
+                dirent = None
+            else:
+                count += 1
+                entry = get_dirent_entry(repo, dirent, username, is_pro)
+                if request_type == 'f' and entry['type'] != 'file' or \
+                        request_type == 'd' and entry['type'] != 'dir':
+                    continue
+                batch.append(entry)
+                if len(batch) < DIR_LIST_PAGE_SIZE:
+                    continue
+
+        add_dir_file_user_names(batch)
+        add_dir_file_tags_and_starred(batch, path, files_tags_in_dir,
+                                      starred_files)
+        for e in batch:
+            yield json.dumps(e) + '\n'
+        batch = []
+
+        if dirent is None:
+            break
+
+    if next_cursor is not None:
+        yield json.dumps({'next_cursor': next_cursor}) + '\n'
+
 def get_shared_link(request, repo_id, path):
     l = FileShare.objects.filter(repo_id=repo_id).filter(
         username=request.user.username).filter(path=path)
@@ -3584,9 +3698,19 @@ class DirView(APIView):
             return response
 
         if recursive == '1':
-            result = []
             username = request.user.username
-            dir_file_list = get_dir_file_recursively(username, repo_id, path, [])
+            if request.GET.get('stream', '0') == '1':
+                # entries are sent as json lines while the tree is walked
+                response = StreamingHttpResponse(stream_dir_file_recursively(
+                    username, repo_id, path, dir_id, request_type),
+                    status=200, content_type='application/x-ndjson')
+                response["oid"] = dir_id
+                response["dir_perm"] = permission
+                return response
+
+            result = []
+            dir_file_list = get_dir_file_recursively(username, repo_id, path,
+                                                     [], dir_id)
             if request_type == 'f':
                 for item in dir_file_list:
                     if item['type'] == 'file':
@@ -3604,6 +3728,26 @@ class DirView(APIView):
             response["dir_perm"] = permission
             return response
 
+        if request.GET.get('stream', '0') == '1':
+            try:
+                offset = int(request.GET.get('cursor', '0'))
+                limit = int(request.GET.get('limit', '-1'))
+            except ValueError:
+                error_msg = 'cursor or limit invalid.'
+                return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+            if offset < 0 or limit == 0 or limit < -1:
+                error_msg = 'cursor or limit invalid.'
+                return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+            response = StreamingHttpResponse(stream_dir_entrys_by_id(
+                repo, path, dir_id, request.user.username, request_type,
+                offset, limit), status=200,
+                content_type='application/x-ndjson')
+            response["oid"] = dir_id
+            response["dir_perm"] = permission
+            return response
+
         return get_dir_entrys_by_id(request, repo, path, dir_id, request_type)
 
     def post(self, request, repo_id, format=None):
@@ -5106,11 +5250,8 @@ class ThumbnailView(APIView):
 
         success, status_code = generate_thumbnail(request, repo_id, size, path)
         if success:
-            thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
-            thumbnail_file = os.path.join(thumbnail_dir, obj_id)
             try:
-                with open(thumbnail_file, 'rb') as f:
-                    thumbnail = f.read()
+                thumbnail = read_thumbnail(obj_id, size)
                 return HttpResponse(thumbnail, 'image/' + THUMBNAIL_EXTENSION)
             except IOError as e:
                 logger.error(e)
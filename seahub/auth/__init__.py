@@ -113,11 +113,21 @@ def logout(request):
 
 def get_user(request):
     from seahub.auth.models import AnonymousUser
+    from seahub.auth.utils import get_cached_user, cache_user
     try:
         username = request.session[SESSION_KEY]
         backend_path = request.session[BACKEND_SESSION_KEY]
-        backend = load_backend(backend_path)
-        user = backend.get_user(username) or AnonymousUser()
     except KeyError:
-        user = AnonymousUser()
+        return AnonymousUser()
+
+    user = get_cached_user(username)
+    if user is not None:
+        return user
+
+    backend = load_backend(backend_path)
+    user = backend.get_user(username)
+    if user is None:
+        return AnonymousUser()
+
+    cache_user(user)
     return user
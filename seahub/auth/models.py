@@ -188,14 +188,26 @@ class ExternalDepartment(models.Model):
 
 # # handle signals
 from django.dispatch import receiver
-from registration.signals import user_deleted
+from registration.signals import user_deleted, user_activated
+from seahub.auth.signals import user_logged_in
 
 
 @receiver(user_deleted)
 def user_deleted_cb(sender, **kwargs):
+    from seahub.auth.utils import clear_user_cache
+
     username = kwargs['username']
+    clear_user_cache(username)
     SocialAuthUser.objects.filter(username=username).delete()
     # if user is institution admin, delete recored in InstitutionAdmin
     if getattr(settings, 'MULTI_INSTITUTION', False):
         from seahub.institutions.models import InstitutionAdmin
         InstitutionAdmin.objects.filter(user=username).delete()
+
+
+@receiver(user_activated)
+@receiver(user_logged_in)
+def clear_user_cache_cb(sender, user, **kwargs):
+    # load user again on login, role may be updated by sso backends
+    from seahub.auth.utils import clear_user_cache
+    clear_user_cache(user.username)
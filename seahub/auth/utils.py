@@ -1,12 +1,18 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
+import logging
+
 from django.core.cache import cache
 from django.conf import settings
 from django.utils.http import urlquote
 
+from seaserv import ccnet_api
+
 from seahub.profile.models import Profile
 from seahub.utils import normalize_cache_key
 from seahub.utils.ip import get_remote_ip
 
+logger = logging.getLogger(__name__)
+
 LOGIN_ATTEMPT_PREFIX = 'UserLoginAttempt_'
 
 def get_login_failed_attempts(username=None, ip=None):
@@ -74,3 +80,120 @@ def clear_login_failed_attempts(request, username):
     p = Profile.objects.get_profile_by_user(username)
     if p and p.login_id:
         cache.delete(normalize_cache_key(p.login_id, prefix=LOGIN_ATTEMPT_PREFIX))
+
+
+########## cache of session users
+USER_CACHE_PREFIX = 'UserSnapshot_'
+
+# attributes of `User` kept in cache, besides email, the password hash is
+# never cached
+USER_CACHE_FIELDS = ('id', 'is_staff', 'is_active', 'ctime',
+                     'source', 'role', 'reference_id', 'admin_role')
+ORG_CACHE_FIELDS = ('org_id', 'org_name', 'url_prefix', 'creator', 'ctime',
+                    'is_staff')
+
+# log hit ratio of user cache every so many lookups
+USER_CACHE_STATS_INTERVAL = 1000
+
+_user_cache_stats = {'hits': 0, 'misses': 0}
+
+
+class CachedOrg(object):
+    """Org of a cached user, with the attributes of ccnet org object.
+    """
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def _get_user_cache_key(username):
+    return normalize_cache_key(username, prefix=USER_CACHE_PREFIX)
+
+def _count_user_cache_lookup(hit):
+    _user_cache_stats['hits' if hit else 'misses'] += 1
+
+    total = _user_cache_stats['hits'] + _user_cache_stats['misses']
+    if total % USER_CACHE_STATS_INTERVAL == 0:
+        logger.info('User cache: %(hits)d hits, %(misses)d misses, '
+                    'hit ratio %(hit_ratio).2f' % get_user_cache_stats())
+
+def get_user_cache_stats():
+    """Return hits, misses and hit ratio of user cache in this process.
+    """
+    hits = _user_cache_stats['hits']
+    misses = _user_cache_stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': float(hits) / total if total else 0.0,
+    }
+
+def get_cached_user(username):
+    """Return `User` built from cache, or None if it is not cached.
+    """
+    if not settings.USER_CACHE_TIMEOUT:
+        return None
+
+    snapshot = cache.get(_get_user_cache_key(username))
+    _count_user_cache_lookup(snapshot is not None)
+    if snapshot is None:
+        return None
+
+    from seahub.base.accounts import User
+    user = User(username)
+    for field in USER_CACHE_FIELDS:
+        setattr(user, field, snapshot.get(field))
+
+    # what the password session check of every request needs
+    user._cached_password_usable = snapshot.get('password_usable')
+    user._cached_password_session_hash = snapshot.get('password_session_hash')
+
+    if 'org' in snapshot:
+        org = snapshot['org']
+        user._cached_org = CachedOrg(**org) if org else None
+        user._cached_orgs = [user._cached_org] if org else []
+
+    return user
+
+def cache_user(user):
+    """Put a snapshot of `user` into cache, the org of user is resolved
+    here as well in multi-tenancy mode, since every request needs it.
+    """
+    if not settings.USER_CACHE_TIMEOUT:
+        return
+
+    from seahub.base.accounts import UNUSABLE_PASSWORD
+    from seahub.password_session.handlers import get_password_hash
+
+    snapshot = {}
+    for field in USER_CACHE_FIELDS:
+        snapshot[field] = getattr(user, field, None)
+
+    # a digest salted with SECRET_KEY, not the password hash itself
+    snapshot['password_usable'] = user.enc_password != UNUSABLE_PASSWORD
+    snapshot['password_session_hash'] = get_password_hash(user)
+
+    if getattr(settings, 'MULTI_TENANCY', False):
+        org = get_user_org(user)
+        if org:
+            snapshot['org'] = dict((field, getattr(org, field, None))
+                                   for field in ORG_CACHE_FIELDS)
+        else:
+            snapshot['org'] = None
+
+    cache.set(_get_user_cache_key(user.username), snapshot,
+              settings.USER_CACHE_TIMEOUT)
+
+def clear_user_cache(username):
+    cache.delete(_get_user_cache_key(username))
+
+def get_user_org(user):
+    """Return the org `user` belongs to, or None.
+    """
+    if hasattr(user, '_cached_org'):
+        return user._cached_org
+
+    orgs = ccnet_api.get_orgs_by_user(user.username)
+    user._cached_orgs = orgs
+    user._cached_org = orgs[0] if orgs else None
+    return user._cached_org
@@ -1,15 +1,134 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
+import os
+import time
+import logging
+import multiprocessing
+from datetime import datetime
+
 from django.core.management.base import BaseCommand
+from django.db import connection
 
+from seahub.avatar.manifest import set_avatar_manifest
 from seahub.avatar.models import Avatar
 from seahub.avatar.settings import AUTO_GENERATE_AVATAR_SIZES
 
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _get_modified_time(storage, name):
+    """Return modified time of `name` as naive datetime, or None if it does
+    not exist.
+    """
+    try:
+        if hasattr(storage, 'modified_time'):
+            # `DatabaseStorage`
+            return storage.modified_time(name)
+        return storage.get_modified_time(name).replace(tzinfo=None)
+    except Exception:
+        return None
+
+def _get_stale_sizes(avatar, sizes):
+    """Sizes of thumbnails missing or older than the original.
+    """
+    storage = avatar.avatar.storage
+    orig_mtime = _get_modified_time(storage, avatar.avatar.name)
+    stale = []
+    for size in sizes:
+        mtime = _get_modified_time(storage, avatar.avatar_name(size))
+        if mtime is None or orig_mtime is None or mtime < orig_mtime:
+            stale.append(size)
+    return stale
+
+def _rebuild_avatar(args):
+    avatar_id, sizes, force = args
+    try:
+        avatar = Avatar.objects.filter(id=avatar_id).first()
+        if avatar is None:
+            return avatar_id, 0, 0, 0
+
+        stale = list(sizes) if force else _get_stale_sizes(avatar, sizes)
+        created = avatar.create_thumbnails(stale) if stale else []
+        if avatar.primary:
+            failed = set(stale) - set(created)
+            set_avatar_manifest(avatar, [s for s in sizes if s not in failed])
+
+        return avatar_id, len(created), len(sizes) - len(stale), \
+            len(stale) - len(created)
+    except Exception as e:
+        logger.error('Failed to rebuild avatar %s: %s' % (avatar_id, e))
+        return avatar_id, 0, 0, len(sizes)
+
 class Command(BaseCommand):
     help = "Regenerates avatar thumbnails for the sizes specified in " + \
         "settings.AUTO_GENERATE_AVATAR_SIZES."
-    
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='number of worker processes, default number '
+                            'of cpus')
+        parser.add_argument('--checkpoint',
+                            help='file to record the last rebuilt avatar id '
+                            'in, a rebuild started again resumes after it')
+        parser.add_argument('--force', action='store_true',
+                            help='rebuild thumbnails even if they are newer '
+                            'than the original, e.g. after changing resize '
+                            'settings')
+
+    def _read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            content = f.read().strip()
+        return int(content) if content else 0
+
+    def _write_checkpoint(self, path, avatar_id):
+        if not path:
+            return
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(avatar_id))
+        os.replace(tmp_path, path)
+
     def handle(self, **options):
-        for avatar in Avatar.objects.all():
-            for size in AUTO_GENERATE_AVATAR_SIZES:
-                print("Rebuilding Avatar id=%s at size %s." % (avatar.id, size))
-                avatar.create_thumbnail(size)
+        sizes = sorted(set(AUTO_GENERATE_AVATAR_SIZES))
+        checkpoint = options['checkpoint']
+        last_id = self._read_checkpoint(checkpoint)
+        if last_id:
+            self.stdout.write('Resume after avatar id=%s.' % last_id)
+
+        created = skipped = failed = count = 0
+        start = time.time()
+
+        # workers are forked with their own database connections
+        connection.close()
+        with multiprocessing.Pool(max(1, options['workers'])) as pool:
+            while True:
+                avatar_ids = list(Avatar.objects.filter(id__gt=last_id).
+                                  order_by('id').
+                                  values_list('id', flat=True)[:BATCH_SIZE])
+                if not avatar_ids:
+                    break
+
+                jobs = [(i, sizes, options['force']) for i in avatar_ids]
+                for avatar_id, c, s, f in pool.imap_unordered(_rebuild_avatar,
+                                                              jobs):
+                    created += c
+                    skipped += s
+                    failed += f
+                    if f:
+                        self.stderr.write('Failed to rebuild %d thumbnails of '
+                                          'avatar id=%s.' % (f, avatar_id))
+
+                # the whole batch is done
+                count += len(avatar_ids)
+                last_id = avatar_ids[-1]
+                self._write_checkpoint(checkpoint, last_id)
+                self.stdout.write('[%s] Rebuilt %d avatars, last id=%s.' %
+                                  (datetime.now(), count, last_id))
+
+        self.stdout.write('[%s] Rebuilt %d avatars: %d thumbnails created, '
+                          '%d up to date, %d failed, takes %.1fs' % (
+                              datetime.now(), count, created, skipped, failed,
+                              time.time() - start))
@@ -0,0 +1,219 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Avatar manifest, what is known about the primary avatar of a user without
+touching avatar storage.
+
+A manifest is kept in cache per user as a dict of ``date_uploaded``, the
+``sizes`` of thumbnails created and their ``urls``, and ``original_url``.
+An empty dict means the user has no avatar. It is written when an avatar is
+uploaded, its thumbnails are created or it is deleted, and built from
+database on a cache miss, for many users in one query, and one more to
+check their thumbnails in database storage.
+
+A url asked for a size without thumbnail falls back to the closest larger
+thumbnail, and the thumbnail is created by a background thread.
+"""
+import logging
+import threading
+
+from django.core.cache import cache
+
+from seahub.avatar.settings import AUTO_GENERATE_AVATAR_SIZES, \
+    AVATAR_FILE_STORAGE, AVATAR_DEFAULT_SIZE
+from seahub.avatar.util import invalidate_cache
+from seahub.utils import normalize_cache_key
+from seahub.utils.background import run_in_background
+
+logger = logging.getLogger(__name__)
+
+AVATAR_MANIFEST_CACHE_PREFIX = 'AvatarManifest_'
+
+# threads creating missing thumbnails in a process
+AVATAR_THUMBNAIL_WORKERS = 2
+
+# thumbnails being created in this process, as (email, size)
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _get_manifest_cache_key(email):
+    return normalize_cache_key(email, AVATAR_MANIFEST_CACHE_PREFIX)
+
+def _get_thumbnail_url(avatar, size):
+    url = avatar.avatar_url(size)
+    if AVATAR_FILE_STORAGE:
+        # served by `image_view`, the version of content makes it cached as
+        # immutable, a thumbnail created again gets a new url. The version
+        # is only known when the thumbnail is written, a manifest built
+        # from database has urls without it, served with ``no-cache``.
+        version = avatar.thumbnail_version(size)
+        if version:
+            url += '?v=%s' % version
+    return url
+
+def _build_manifest(avatar, sizes):
+    if avatar is None:
+        return {}
+
+    sizes = sorted(set(sizes))
+    return {
+        'id': avatar.id,
+        'date_uploaded': avatar.date_uploaded,
+        'sizes': sizes,
+        'urls': dict((size, _get_thumbnail_url(avatar, size)) for size in sizes),
+        'original_url': avatar.avatar.url if avatar.avatar else None,
+        'failed': [],
+    }
+
+def _get_primary_avatars(emails):
+    from seahub.avatar.models import Avatar
+    return Avatar.objects.filter(emailuser__in=emails, primary=1)
+
+def _get_existing_thumbnails(avatars, sizes):
+    """Return ``(avatar id, size)`` of thumbnails of `sizes` which exist,
+    checked with one query in database storage.
+    """
+    names = dict(((a.id, s), a.avatar_name(s)) for a in avatars for s in sizes)
+    if not names:
+        return set()
+
+    storage = avatars[0].avatar.storage
+    if hasattr(storage, 'filter_existing'):
+        # `DatabaseStorage`
+        existing = storage.filter_existing(list(names.values()))
+        return set(k for k, name in names.items() if name in existing)
+    return set(k for k, name in names.items() if storage.exists(name))
+
+def get_avatar_manifests(emails):
+    """Return manifests of primary avatars of `emails` as ``{email:
+    manifest}``, with one cache round trip, and at most two queries on a
+    miss.
+    """
+    keys = dict((e, _get_manifest_cache_key(e)) for e in set(emails))
+    cached = cache.get_many(list(keys.values()))
+
+    manifests = {}
+    missed = []
+    for email, key in keys.items():
+        if key in cached:
+            manifests[email] = cached[key]
+        else:
+            missed.append(email)
+
+    if not missed:
+        return manifests
+
+    # thumbnails of configured sizes are created on upload, check them here
+    # since a size may be added to settings later or fail to be created,
+    # missing ones are created in background when asked for
+    avatars = dict((a.emailuser, a) for a in _get_primary_avatars(missed))
+    existing = _get_existing_thumbnails(list(avatars.values()),
+                                        AUTO_GENERATE_AVATAR_SIZES)
+    to_cache = {}
+    for email in missed:
+        avatar = avatars.get(email)
+        sizes = []
+        if avatar is not None:
+            sizes = [s for s in AUTO_GENERATE_AVATAR_SIZES
+                     if (avatar.id, s) in existing]
+
+        manifest = _build_manifest(avatar, sizes)
+        manifests[email] = manifest
+        to_cache[keys[email]] = manifest
+    cache.set_many(to_cache, None)
+
+    return manifests
+
+def get_avatar_manifest(email):
+    """Return manifest of primary avatar of `email`, an empty dict if there
+    is no avatar.
+    """
+    return get_avatar_manifests([email])[email]
+
+def set_avatar_manifest(avatar, sizes):
+    """Write manifest of `avatar` with thumbnails of `sizes`. Urls of
+    thumbnails not written by `avatar` are kept from the cached manifest,
+    with their versions.
+    """
+    key = _get_manifest_cache_key(avatar.emailuser)
+    manifest = _build_manifest(avatar, sizes)
+    cached = cache.get(key)
+    if cached and cached['id'] == avatar.id:
+        for size in manifest['sizes']:
+            if avatar.thumbnail_version(size) is None and \
+                    size in cached['urls']:
+                manifest['urls'][size] = cached['urls'][size]
+    cache.set(key, manifest, None)
+
+def clear_avatar_manifest(email):
+    cache.delete(_get_manifest_cache_key(email))
+
+def _update_manifest_size(avatar, size, created):
+    key = _get_manifest_cache_key(avatar.emailuser)
+    manifest = cache.get(key)
+    if not manifest or manifest['id'] != avatar.id:
+        return
+
+    if created:
+        manifest['sizes'] = sorted(set(manifest['sizes']) | {size})
+        manifest['urls'][size] = _get_thumbnail_url(avatar, size)
+    else:
+        manifest['failed'] = sorted(set(manifest['failed']) | {size})
+    cache.set(key, manifest, None)
+
+    # urls cached with the fallback thumbnail
+    invalidate_cache(avatar.emailuser, size)
+
+def _create_thumbnail(email, avatar_id, size):
+    from seahub.avatar.models import Avatar
+    try:
+        avatar = Avatar.objects.filter(id=avatar_id).first()
+        if avatar is not None:
+            created = avatar.create_thumbnail(size)
+            _update_manifest_size(avatar, size, created)
+    except Exception as e:
+        logger.error('Failed to create avatar thumbnail of %s at size %s: %s' %
+                     (email, size, e))
+    finally:
+        with _pending_lock:
+            _pending.discard((email, size))
+
+def _schedule_thumbnail(email, avatar_id, size):
+    with _pending_lock:
+        if (email, size) in _pending:
+            return
+        _pending.add((email, size))
+
+    run_in_background('avatar-thumbnail', _create_thumbnail, email,
+                      avatar_id, size, max_workers=AVATAR_THUMBNAIL_WORKERS)
+
+def resolve_avatar_url(email, manifest, size):
+    """Return url of avatar in `manifest` for `size`, or None if there is no
+    avatar.
+
+    If there is no thumbnail of `size`, the closest larger one is returned
+    and the thumbnail is created in background. `size` may be given as a
+    string, as taken from a query string by some callers.
+    """
+    if not manifest:
+        return None
+
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        size = AVATAR_DEFAULT_SIZE
+
+    url = manifest['urls'].get(size)
+    if url:
+        return url
+
+    if size not in manifest['failed']:
+        _schedule_thumbnail(email, manifest['id'], size)
+
+    sizes = manifest['sizes']
+    larger = [s for s in sizes if s > size]
+    if larger:
+        return manifest['urls'][larger[0]]
+    if sizes:
+        return manifest['urls'][sizes[-1]]
+    return manifest['original_url']
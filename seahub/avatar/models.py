@@ -26,6 +26,8 @@ except ImportError:
     import Image
 
 from seahub.avatar.util import invalidate_cache, get_avatar_file_storage
+from seahub.base.database_storage.serve import get_content_version
+from seahub.avatar.manifest import clear_avatar_manifest, set_avatar_manifest
 from seahub.avatar.settings import (AVATAR_STORAGE_DIR, AVATAR_RESIZE_METHOD,
                              AVATAR_MAX_AVATARS_PER_USER, AVATAR_THUMB_FORMAT,
                              AVATAR_HASH_USERDIRNAMES, AVATAR_HASH_FILENAMES,
@@ -86,35 +88,71 @@ class AvatarBase(object):
         return self.avatar.storage.exists(self.avatar_name(size))
 
     def create_thumbnail(self, size, quality=None):
-        # invalidate the cache of the thumbnail with the given size first
+        """Create thumbnail of `size`, return whether it is created.
+        """
+        return size in self.create_thumbnails([size], quality)
+
+    def thumbnail_version(self, size):
+        """Return version of content of thumbnail of `size` created by this
+        instance, or None.
+        """
+        return getattr(self, '_thumbnail_versions', {}).get(size)
+
+    def create_thumbnails(self, sizes, quality=None):
+        """Create thumbnails of `sizes` from one decoded original, return
+        the sizes created.
+        """
+        # invalidate the cache of the thumbnails with the given sizes first
         if isinstance(self, Avatar):
-            invalidate_cache(self.emailuser, size)
+            for size in sizes:
+                invalidate_cache(self.emailuser, size)
 
         try:
             orig = self.avatar.storage.open(self.avatar.name, 'rb').read()
             image = Image.open(BytesIO(orig))
 
-            quality = quality or AVATAR_THUMB_QUALITY
             (w, h) = image.size
-            if w != size or h != size:
+            if w != h:
                 if w > h:
                     diff = (w - h) / 2
                     image = image.crop((diff, 0, w - diff, h))
                 else:
                     diff = (h - w) / 2
                     image = image.crop((0, diff, w, h - diff))
-                if image.mode != "RGBA":
-                    image = image.convert("RGBA")
-                image = image.resize((size, size), AVATAR_RESIZE_METHOD)
-                thumb = BytesIO()
-                image.save(thumb, AVATAR_THUMB_FORMAT, quality=quality)
-                thumb_file = ContentFile(thumb.getvalue())
-            else:
-                thumb_file = ContentFile(orig)
-            thumb = self.avatar.storage.save(self.avatar_name(size), thumb_file)
+            if image.mode != "RGBA":
+                image = image.convert("RGBA")
         except Exception as e:
             logger.error(e)
-            return # What should we do here?  Render a "sorry, didn't work" img?
+            return [] # What should we do here?  Render a "sorry, didn't work" img?
+
+        quality = quality or AVATAR_THUMB_QUALITY
+        if not hasattr(self, '_thumbnail_versions'):
+            self._thumbnail_versions = {}
+        created = []
+        for size in sizes:
+            try:
+                if w != size or h != size:
+                    thumb = BytesIO()
+                    image.resize((size, size), AVATAR_RESIZE_METHOD).save(
+                        thumb, AVATAR_THUMB_FORMAT, quality=quality)
+                    content = thumb.getvalue()
+                else:
+                    content = orig
+                thumb_file = ContentFile(content)
+
+                # file system storage would save to another name
+                thumb_name = self.avatar_name(size)
+                if self.avatar.storage.exists(thumb_name):
+                    self.avatar.storage.delete(thumb_name)
+                self.avatar.storage.save(thumb_name, thumb_file)
+            except Exception as e:
+                logger.error(e)
+                continue
+
+            self._thumbnail_versions[size] = get_content_version(content)
+            created.append(size)
+
+        return created
 
     def avatar_url(self, size):
         return self.avatar.storage.url(self.avatar_name(size))
@@ -154,10 +192,12 @@ class Avatar(models.Model, AvatarBase):
         else:
             avatars.delete()
         invalidate_cache(self.emailuser)
+        clear_avatar_manifest(self.emailuser)
         super(Avatar, self).save(*args, **kwargs)
     
     def delete(self, *args, **kwargs):
         invalidate_cache(self.emailuser)
+        clear_avatar_manifest(self.emailuser)
         super(Avatar, self).delete(*args, **kwargs)
 
 class GroupAvatar(models.Model, AvatarBase):
@@ -176,8 +216,9 @@ class GroupAvatar(models.Model, AvatarBase):
 
 def create_default_thumbnails(instance=None, created=False, **kwargs):
     if created:
-        for size in AUTO_GENERATE_AVATAR_SIZES:
-            instance.create_thumbnail(size)
+        sizes = instance.create_thumbnails(AUTO_GENERATE_AVATAR_SIZES)
+        if instance.primary:
+            set_avatar_manifest(instance, sizes)
 
 signals.post_save.connect(create_default_thumbnails, sender=Avatar, dispatch_uid="create_default_thumbnails")
 
@@ -22,6 +22,7 @@ AUTO_GENERATE_GROUP_AVATAR_SIZES = getattr(settings, 'AUTO_GENERATE_GROUP_AVATAR
 
 ### Common settings ###
 AVATAR_FILE_STORAGE = getattr(settings, 'AVATAR_FILE_STORAGE', '')
+AVATAR_FILE_STORAGE_BINARY = getattr(settings, 'AVATAR_FILE_STORAGE_BINARY', False)
 AVATAR_RESIZE_METHOD = getattr(settings, 'AVATAR_RESIZE_METHOD', Image.ANTIALIAS)
 AVATAR_GRAVATAR_BACKUP = getattr(settings, 'AVATAR_GRAVATAR_BACKUP', True)
 AVATAR_GRAVATAR_DEFAULT = getattr(settings, 'AVATAR_GRAVATAR_DEFAULT', None)
@@ -12,8 +12,10 @@ from seahub.base.accounts import User
 
 from seahub.avatar.settings import (AVATAR_GRAVATAR_BACKUP, AVATAR_GRAVATAR_DEFAULT,
                              AVATAR_DEFAULT_SIZE)
-from seahub.avatar.util import get_primary_avatar, get_default_avatar_url, \
-    cache_result, get_default_avatar_non_registered_url
+from seahub.avatar.util import get_default_avatar_url, cache_result, \
+    get_default_avatar_non_registered_url
+from seahub.avatar.manifest import get_avatar_manifest, \
+    get_avatar_manifests, resolve_avatar_url
 from seahub.utils import get_service_url
 from seahub.settings import SITE_ROOT, AVATAR_FILE_STORAGE
 
@@ -25,16 +27,15 @@ register = template.Library()
 @cache_result
 @register.simple_tag
 def avatar_url(user, size=AVATAR_DEFAULT_SIZE):
-    avatar = get_primary_avatar(user, size=size)
-    if avatar:
-        url = avatar.avatar_url(size)
-    else:
+    email = user.email if isinstance(user, User) else user
+    url = resolve_avatar_url(email, get_avatar_manifest(email), size)
+    if not url:
         if AVATAR_GRAVATAR_BACKUP:
             params = {'s': str(size)}
             if AVATAR_GRAVATAR_DEFAULT:
                 params['d'] = AVATAR_GRAVATAR_DEFAULT
             return "http://www.gravatar.com/avatar/%s/?%s" % (
-                hashlib.md5(user.email.encode('utf-8')).hexdigest(),
+                hashlib.md5(email.encode('utf-8')).hexdigest(),
                 urllib.parse.urlencode(params))
         else:
             url = get_default_avatar_url()
@@ -48,9 +49,7 @@ def avatar_url(user, size=AVATAR_DEFAULT_SIZE):
     else:
         return url
 
-@cache_result
-def api_avatar_url(user, size=AVATAR_DEFAULT_SIZE):
-
+def _api_avatar_url(email, manifest, size):
     service_url = get_service_url()
     service_url = service_url.rstrip('/')
 
@@ -59,14 +58,13 @@ def api_avatar_url(user, size=AVATAR_DEFAULT_SIZE):
     parse_result = urlparse(service_url)
     service_url_without_sub_path = '%s://%s' % (parse_result[0], parse_result[1])
 
-    avatar = get_primary_avatar(user, size=size)
+    url = resolve_avatar_url(email, manifest, size)
 
-    if not avatar:
+    if not url:
         # /media/avatars/default.png
         return service_url_without_sub_path + get_default_avatar_url(), True, None
 
-    url = avatar.avatar_url(size)
-    date_uploaded = avatar.date_uploaded
+    date_uploaded = manifest['date_uploaded']
 
     if not AVATAR_FILE_STORAGE:
         # /media/avatars/6/9/5011f01afac2a506b9544c5ce21a0a/resized/32/109af9901c0fd38ab39d018f5cd4baf6.png
@@ -74,6 +72,18 @@ def api_avatar_url(user, size=AVATAR_DEFAULT_SIZE):
     else:
         return service_url + url, False, date_uploaded
 
+@cache_result
+def api_avatar_url(user, size=AVATAR_DEFAULT_SIZE):
+    email = user.email if isinstance(user, User) else user
+    return _api_avatar_url(email, get_avatar_manifest(email), size)
+
+def api_avatar_urls(emails, size=AVATAR_DEFAULT_SIZE):
+    """Same as `api_avatar_url` for many users, return ``{email: (url,
+    is_default, date_uploaded)}``.
+    """
+    manifests = get_avatar_manifests(emails)
+    return dict((e, _api_avatar_url(e, m, size)) for e, m in manifests.items())
+
 @cache_result
 @register.simple_tag
 def avatar(user, size=AVATAR_DEFAULT_SIZE):
@@ -8,7 +8,7 @@ from seahub.base.accounts import User
 from seahub.avatar.settings import AVATAR_DEFAULT_URL, AVATAR_CACHE_TIMEOUT,\
     AUTO_GENERATE_AVATAR_SIZES, AVATAR_DEFAULT_SIZE, \
     AVATAR_DEFAULT_NON_REGISTERED_URL, AUTO_GENERATE_GROUP_AVATAR_SIZES, \
-    AVATAR_FILE_STORAGE
+    AVATAR_FILE_STORAGE, AVATAR_FILE_STORAGE_BINARY
 
 cached_funcs = set()
 
@@ -125,5 +125,6 @@ def get_avatar_file_storage():
             'name_column': 'filename',
             'data_column': 'data',
             'size_column': 'size',
+            'binary': AVATAR_FILE_STORAGE_BINARY,
             }
         return get_storage_class(AVATAR_FILE_STORAGE)(options=dbs_options)
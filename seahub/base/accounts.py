@@ -16,6 +16,7 @@ from constance import config
 from registration import signals
 
 from seahub.auth import login
+from seahub.auth.utils import clear_user_cache
 from seahub.constants import DEFAULT_USER, DEFAULT_ORG, DEFAULT_ADMIN
 from seahub.profile.models import Profile, DetailedProfile
 from seahub.role_permissions.models import AdminRole
@@ -65,6 +66,7 @@ class UserManager(object):
         If user has a role, update it; or create a role for user.
         """
         ccnet_api.update_role_emailuser(email, role)
+        clear_user_cache(email)
         return self.get(email=email)
 
     def create_superuser(self, email, password):
@@ -284,6 +286,20 @@ class User(object):
 
         return self._cached_org_role
 
+    @property
+    def enc_password(self):
+        # users built from user cache do not carry the password hash, it is
+        # read when a password check needs it
+        if not hasattr(self, '_cached_enc_password'):
+            emailuser = ccnet_api.get_emailuser(self.username)
+            self._cached_enc_password = emailuser.password if emailuser else None
+
+        return self._cached_enc_password
+
+    @enc_password.setter
+    def enc_password(self, value):
+        self._cached_enc_password = value
+
     @property
     def contact_email(self):
         if not hasattr(self, '_cached_contact_email'):
@@ -356,6 +372,11 @@ class User(object):
                                                            self.password,
                                                            int(self.is_staff),
                                                            int(self.is_active))
+        clear_user_cache(self.username)
+        # password may be changed, read it again when needed
+        for attr in ('_cached_enc_password', '_cached_password_usable',
+                     '_cached_password_session_hash'):
+            self.__dict__.pop(attr, None)
         # -1 stands for failed; 0 stands for success
         return result_code
 
@@ -0,0 +1,543 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Cache backends.
+
+`SQLiteCache` keeps entries in one sqlite database file, shared by all
+processes on the host, with an index on expiry time so culling does not
+scan a directory like the file based cache does.
+
+`TieredCache` keeps recently used entries of a shared cache in a bounded
+in-memory LRU of each process for at most ``LOCAL_TIMEOUT`` seconds. Keys
+written or deleted are broadcast through the shared cache as a numbered
+log, one entry per write call however many keys it writes, which every
+process polls once per ``INVALIDATION_POLL_INTERVAL`` seconds to drop its
+own copies.
+
+Keys starting with one of ``SHARED_ONLY_KEY_PREFIXES`` are never kept in
+the local tier, so their writes go to the shared cache only and are not
+broadcast. They should be keys written far more often than read by another
+process, like throttle buckets and counters. e.g.::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'seahub.base.cache.TieredCache',
+            'OPTIONS': {
+                # alias of another cache, or settings of the shared cache
+                'SHARED': {
+                    'BACKEND': 'seahub.base.cache.SQLiteCache',
+                    'LOCATION': '/tmp/seahub_cache.db',
+                },
+                'LOCAL_MAX_ENTRIES': 10000,
+                'LOCAL_TIMEOUT': 30,
+                'SHARED_ONLY_KEY_PREFIXES': ['throttle_', 'counter_'],
+            },
+        },
+    }
+"""
+import os
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class SQLiteCache(BaseCache):
+    """Cache in a sqlite database file.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    # check number of entries once per so many writes
+    cull_check_interval = 1000
+
+    def __init__(self, location, params):
+        super(SQLiteCache, self).__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self):
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            # connections are not shared by threads, nor by forked processes
+            dirname = os.path.dirname(self._path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY '
+                         'KEY, value BLOB NOT NULL, expires REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expires '
+                         'ON cache (expires)')
+            self._local.conn = conn
+            self._local.pid = pid
+        return self._local.conn
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _after_write(self, count=1):
+        self._writes += count
+        if self._writes >= self.cull_check_interval:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        conn = self._conn()
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(), ))
+        num = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if num < self._max_entries:
+            return
+
+        if self._cull_frequency == 0:
+            conn.execute('DELETE FROM cache')
+            return
+
+        # entries expiring first are dropped first, the never expiring last
+        conn.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                     'ORDER BY expires IS NULL, expires LIMIT ?)',
+                     (num // self._cull_frequency, ))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._conn().execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires WHERE cache.expires <= ?',
+            (key, self._dumps(value), self.get_backend_timeout(timeout),
+             time.time()))
+        self._after_write()
+        return cursor.rowcount > 0
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._conn().execute(
+            'SELECT value FROM cache WHERE key = ? AND '
+            '(expires IS NULL OR expires > ?)', (key, time.time())).fetchone()
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {}
+        for k in keys:
+            made_key = self.make_key(k, version=version)
+            self.validate_key(made_key)
+            key_map[made_key] = k
+
+        ret = {}
+        made_keys = list(key_map)
+        now = time.time()
+        conn = self._conn()
+        # stay below the limit of sqlite variables
+        for i in range(0, len(made_keys), 500):
+            chunk = made_keys[i:i + 500]
+            rows = conn.execute(
+                'SELECT key, value FROM cache WHERE key IN (%s) AND '
+                '(expires IS NULL OR expires > ?)' % ','.join('?' * len(chunk)),
+                chunk + [now])
+            for made_key, value in rows:
+                ret[key_map[made_key]] = pickle.loads(value)
+        return ret
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._conn().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (key, self._dumps(value), self.get_backend_timeout(timeout)))
+        self._after_write()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key, self._dumps(value), expires))
+
+        conn = self._conn()
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('INSERT OR REPLACE INTO cache (key, value, '
+                             'expires) VALUES (?, ?, ?)', rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._after_write(len(rows))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._conn().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND '
+            '(expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._conn().execute('DELETE FROM cache WHERE key = ?',
+                                      (key, ))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        made_keys = []
+        for key in keys:
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            made_keys.append((key, ))
+        self._conn().executemany('DELETE FROM cache WHERE key = ?', made_keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._conn().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND '
+            '(expires IS NULL OR expires > ?)', (key, time.time())).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        conn = self._conn()
+        # write lock is taken at once, so concurrent incr do not lose updates
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM cache WHERE key = ? AND '
+                '(expires IS NULL OR expires > ?)',
+                (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(row[0]) + delta
+            conn.execute('UPDATE cache SET value = ? WHERE key = ?',
+                         (self._dumps(new_value), key))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return new_value
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache')
+
+
+class TieredCache(BaseCache):
+    """In-memory LRU of each process in front of a shared cache.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    invalidation_seq_key = 'tiered_cache_invalidation_seq'
+    invalidation_log_prefix = 'tiered_cache_invalidation_'
+
+    # log entries only need to live until every process has polled them,
+    # a process missing some drops all of its entries
+    invalidation_log_timeout = 60
+
+    # a process further behind than this many write calls drops all of its
+    # entries, as it does when more keys are written than it can hold
+    max_invalidation_gap = 1000
+
+    def __init__(self, location, params):
+        super(TieredCache, self).__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_config = options.get('SHARED', 'shared')
+        self._shared_cache = None
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 10000))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 30))
+        self._poll_interval = float(options.get('INVALIDATION_POLL_INTERVAL', 1))
+        self._shared_only_key_prefixes = tuple(options.get(
+            'SHARED_ONLY_KEY_PREFIXES', ()))
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._seen_seq = None
+        self._polled_at = 0
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @property
+    def _shared(self):
+        if self._shared_cache is None:
+            config = self._shared_config
+            if isinstance(config, dict):
+                backend_cls = import_string(config['BACKEND'])
+                self._shared_cache = backend_cls(config.get('LOCATION', ''),
+                                                 config)
+            else:
+                self._shared_cache = caches[config]
+        return self._shared_cache
+
+    def _is_shared_only(self, key):
+        return key.startswith(self._shared_only_key_prefixes)
+
+    def _split_keys(self, keys):
+        """Return keys of the local tier and shared only keys.
+        """
+        tiered, shared_only = [], []
+        for key in keys:
+            (shared_only if self._is_shared_only(key) else tiered).append(key)
+        return tiered, shared_only
+
+    def get_stats(self):
+        """Return hits of both tiers and misses in this process.
+        """
+        stats = dict(self._stats)
+        total = sum(stats.values())
+        stats['local_entries'] = len(self._entries)
+        stats['hit_ratio'] = float(stats['local_hits'] + stats['shared_hits']) \
+            / total if total else 0.0
+        return stats
+
+    # local tier
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            pickled = entry[1]
+        return pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        local_timeout = self._local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            local_timeout = min(local_timeout, timeout)
+        if local_timeout <= 0:
+            self._local_delete([key])
+            return
+
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + local_timeout, pickled)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._local_max_entries:
+                self._entries.popitem(last=False)
+
+    def _local_delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def _local_clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # invalidation broadcast
+
+    def _broadcast(self, keys):
+        if not keys:
+            return
+
+        shared = self._shared
+        try:
+            try:
+                seq = shared.incr(self.invalidation_seq_key)
+            except ValueError:
+                shared.add(self.invalidation_seq_key, 0, None)
+                seq = shared.incr(self.invalidation_seq_key)
+
+            shared.set(self.invalidation_log_prefix + str(seq), keys,
+                       self.invalidation_log_timeout)
+        except Exception as e:
+            logger.error('Failed to broadcast cache invalidation: %s' % e)
+
+    def _poll_invalidations(self):
+        now = time.monotonic()
+        if now - self._polled_at < self._poll_interval:
+            return
+        self._polled_at = now
+
+        try:
+            seq = self._shared.get(self.invalidation_seq_key)
+        except Exception as e:
+            logger.error('Failed to poll cache invalidation: %s' % e)
+            return
+
+        seen_seq, self._seen_seq = self._seen_seq, seq or 0
+        if seen_seq is None or seq == seen_seq:
+            return
+
+        if not seq or seq < seen_seq or seq - seen_seq > self.max_invalidation_gap:
+            # shared cache is cleared, or too much has changed
+            self._local_clear()
+            return
+
+        log_keys = [self.invalidation_log_prefix + str(i)
+                    for i in range(seen_seq + 1, seq + 1)]
+        try:
+            log = self._shared.get_many(log_keys)
+        except Exception as e:
+            logger.error('Failed to poll cache invalidation: %s' % e)
+            self._local_clear()
+            return
+
+        if len(log) < len(log_keys):
+            # some log entries are gone before this process saw them
+            self._local_clear()
+            return
+
+        keys = [key for logged in log.values() for key in logged]
+        if len(keys) > self._local_max_entries:
+            self._local_clear()
+        else:
+            self._local_delete(keys)
+
+    # cache api
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        if self._is_shared_only(key):
+            return self._shared.add(key, value, timeout, version=version)
+
+        if not self._shared.add(key, value, timeout, version=version):
+            return False
+        self._local_set(made_key, value, timeout)
+        return True
+
+    def get(self, key, default=None, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        if self._is_shared_only(key):
+            return self._shared.get(key, default, version=version)
+
+        self._poll_invalidations()
+
+        value = self._local_get(made_key)
+        if value is not _MISSING:
+            self._stats['local_hits'] += 1
+            return value
+
+        value = self._shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._stats['misses'] += 1
+            return default
+
+        self._stats['shared_hits'] += 1
+        self._local_set(made_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys, missed = self._split_keys(keys)
+        if keys:
+            self._poll_invalidations()
+
+        ret = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            value = self._local_get(made_key)
+            if value is _MISSING:
+                missed.append(key)
+            else:
+                ret[key] = value
+        self._stats['local_hits'] += len(ret)
+
+        if missed:
+            found = self._shared.get_many(missed, version=version)
+            self._stats['shared_hits'] += len(found)
+            self._stats['misses'] += len(missed) - len(found)
+            for key, value in found.items():
+                if not self._is_shared_only(key):
+                    self._local_set(self.make_key(key, version=version), value)
+            ret.update(found)
+
+        return ret
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        self._shared.set(key, value, timeout, version=version)
+        if self._is_shared_only(key):
+            return
+
+        self._local_set(made_key, value, timeout)
+        self._broadcast([made_key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed_keys = self._shared.set_many(data, timeout, version=version)
+        made_keys = []
+        for key, value in data.items():
+            if self._is_shared_only(key):
+                continue
+            made_key = self.make_key(key, version=version)
+            made_keys.append(made_key)
+            if key in failed_keys:
+                self._local_delete([made_key])
+            else:
+                self._local_set(made_key, value, timeout)
+        self._broadcast(made_keys)
+        return failed_keys
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        if not self._is_shared_only(key):
+            # expiry of the local copy is not known, it is loaded again
+            self._local_delete([made_key])
+        return self._shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        if self._is_shared_only(key):
+            return self._shared.delete(key, version=version)
+
+        self._local_delete([made_key])
+        ret = self._shared.delete(key, version=version)
+        self._broadcast([made_key])
+        return ret
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        made_keys = [self.make_key(key, version=version) for key in
+                     self._split_keys(keys)[0]]
+        self._local_delete(made_keys)
+        self._shared.delete_many(keys, version=version)
+        self._broadcast(made_keys)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        if self._is_shared_only(key):
+            return self._shared.incr(key, delta, version=version)
+
+        self._local_delete([made_key])
+        value = self._shared.incr(key, delta, version=version)
+        self._broadcast([made_key])
+        return value
+
+    def clear(self):
+        # the invalidation sequence is cleared too, which makes every
+        # process drop its entries
+        self._shared.clear()
+        self._local_clear()
+
+    def close(self, **kwargs):
+        self._shared.close(**kwargs)
@@ -11,10 +11,30 @@ from django.db import connection, transaction
 import base64
 import hashlib
 import io
+import re
 import urllib.parse
 from datetime import datetime
 
 from seahub.utils.timeutils import value_to_db_datetime
+from seahub.base.database_storage.serve import clear_served_file_cache
+
+_BASE64_RE = re.compile(rb'^[A-Za-z0-9+/=\s]*$')
+
+
+def decode_data(data):
+    """Return content of a file from the data column, which is base64 or
+    binary.
+    """
+    if isinstance(data, str):
+        data = data.encode('ascii')
+    else:
+        data = bytes(data)
+
+    # header of a binary image has bytes out of base64 characters, e.g. png
+    # starts with b'\x89PNG' and jpeg with b'\xff\xd8'
+    if _BASE64_RE.match(data[:64]):
+        return base64.b64decode(data)
+    return data
 
 class DatabaseStorage(Storage):
     """
@@ -53,8 +73,10 @@ class DatabaseStorage(Storage):
     On SQL Server, you should probably use nvarchar to support unicode.
 
     Remember, this is not designed for huge objects.  It is probably best used
-    on files under 1MB in size.  All files are base64-encoded before being
-    stored, so they will use 1.33x the storage of the original file.
+    on files under 1MB in size.  Files are base64-encoded before being stored,
+    so they will use 1.33x the storage of the original file, unless the
+    'binary' option is set and the data column is a blob. Files stored in
+    either way can be read.
 
     Here's an example view to serve files stored in the database.
 
@@ -92,6 +114,7 @@ class DatabaseStorage(Storage):
             'name_column': Name of the filename column (default: 'filename')
             'data_column': Name of the data column (default: 'data')
             'size_column': Name of the size column (default: 'size')
+            'binary': Store data as binary instead of base64 (default: False)
 
                       'data_column', 'size_column', 'base_url' keys.
         """
@@ -106,6 +129,7 @@ class DatabaseStorage(Storage):
             'data_column',
             'size_column',
             'mtime_column',
+            'binary',
         ]
         for key in required_keys:
             if key not in options:
@@ -126,6 +150,7 @@ class DatabaseStorage(Storage):
         self.data_column = options.get('data_column', 'data')
         self.size_column = options.get('size_column', 'size')
         self.mtime_column = options.get('mtime_column', 'mtime')
+        self.binary = options.get('binary', False)
 
     def _open(self, name, mode='rb'):
         """
@@ -148,7 +173,7 @@ class DatabaseStorage(Storage):
         if row is None:
             return None
 
-        inMemFile = io.BytesIO(base64.b64decode(row[0]))
+        inMemFile = io.BytesIO(decode_data(row[0]))
         inMemFile.name = name
         inMemFile.mode = mode
 
@@ -164,7 +189,7 @@ class DatabaseStorage(Storage):
         binary = content.read()
 
         size = len(binary)
-        encoded = base64.b64encode(binary)
+        encoded = binary if self.binary else base64.b64encode(binary)
         mtime = value_to_db_datetime(datetime.today())
 
         with transaction.atomic(using='default'):
@@ -174,7 +199,7 @@ class DatabaseStorage(Storage):
                         '%(size_column)s = %%s, %(mtime_column)s = %%s ' + \
                         'WHERE %(name_md5_column)s = %%s'
                 query %= self.__dict__
-                cursor.execute(query, [encoded, size, mtime, name])
+                cursor.execute(query, [encoded, size, mtime, name_md5])
             else:
                 query = 'INSERT INTO %(table)s (%(name_column)s, ' + \
                     '%(name_md5_column)s, %(data_column)s, %(size_column)s, '+ \
@@ -182,6 +207,7 @@ class DatabaseStorage(Storage):
                 query %= self.__dict__
                 cursor.execute(query, (name, name_md5, encoded, size, mtime))
 
+        clear_served_file_cache(name)
         return name
 
     def exists(self, name):
@@ -193,6 +219,22 @@ class DatabaseStorage(Storage):
         row = cursor.fetchone()
         return int(row[0]) > 0
 
+    def filter_existing(self, names):
+        """Return the subset of `names` which exist, with one query.
+        """
+        names_by_md5 = dict((hashlib.md5(n.encode('utf-8')).hexdigest(), n)
+                            for n in names)
+        if not names_by_md5:
+            return set()
+
+        query = 'SELECT %(name_md5_column)s FROM %(table)s ' + \
+                'WHERE %(name_md5_column)s IN (' + \
+                ', '.join(['%%s'] * len(names_by_md5)) + ')'
+        query %= self.__dict__
+        cursor = connection.cursor()
+        cursor.execute(query, list(names_by_md5))
+        return set(names_by_md5[row[0]] for row in cursor.fetchall())
+
     def delete(self, name):
         if self.exists(name):
             with transaction.atomic(using='default'):
@@ -200,6 +242,7 @@ class DatabaseStorage(Storage):
                 query = 'DELETE FROM %(table)s WHERE %(name_md5_column)s = %%s'
                 query %= self.__dict__
                 connection.cursor().execute(query, [name_md5])
+            clear_served_file_cache(name)
 
     def path(self, name):
         raise NotImplementedError('DatabaseStorage does not support path().')
@@ -0,0 +1,199 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Serve files of `DatabaseStorage`, mainly avatars.
+
+A file is kept with the md5 of its content, used as ETag, in the default
+cache and in a small LRU of each process bounded by
+``IMAGE_VIEW_MEMORY_CACHE_BYTES``. Entries of the LRU are trusted for
+``IMAGE_VIEW_MEMORY_CACHE_TIMEOUT`` seconds, after that they are checked
+against the default cache, which is updated when a file is saved or
+deleted. So a conditional request is answered with 304 and a hot image is
+served without a database query.
+
+Urls with the current version of a file, the start of its ETag like
+``/image-view/avatars/a.png?v=1b2c3d4e5f6a``, are served as immutable. Any
+other version is served with ``no-cache``, so a file rewritten under the
+same name is never stuck in browsers. The version is taken by the writer
+of a file from its content, see `get_content_version`, files are not read
+to build urls.
+"""
+import re
+import time
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified, Http404
+
+from seahub.settings import IMAGE_VIEW_MEMORY_CACHE_BYTES, \
+    IMAGE_VIEW_MEMORY_CACHE_TIMEOUT
+
+SERVED_FILE_CACHE_PREFIX = 'image_view__'
+SERVED_FILE_CACHE_TIMEOUT = 365 * 24 * 60 * 60
+
+# hex digits of md5 of content used as version in urls
+SERVED_FILE_VERSION_LENGTH = 12
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _FileLRU(object):
+    """Files by name, as ``(etag, content, checked_at)``, bounded by total
+    bytes of content.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None:
+                self.entries.move_to_end(name)
+            return entry
+
+    def set(self, name, etag, content):
+        if len(content) > self.max_bytes:
+            return
+
+        with self.lock:
+            self._pop(name)
+            self.entries[name] = (etag, content, time.monotonic())
+            self.bytes += len(content)
+            while self.bytes > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+
+    def delete(self, name):
+        with self.lock:
+            self._pop(name)
+
+    def _pop(self, name):
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+
+_lru = _FileLRU(IMAGE_VIEW_MEMORY_CACHE_BYTES)
+
+
+def _get_cache_key(name):
+    return SERVED_FILE_CACHE_PREFIX + hashlib.md5(name.encode('utf-8')).hexdigest()
+
+def clear_served_file_cache(name):
+    """Drop cached content of `name`, called when it is saved or deleted.
+    """
+    _lru.delete(name)
+    cache.delete(_get_cache_key(name))
+
+def get_served_file(storage, name):
+    """Return ``(etag, content)`` of `name` in `storage`, or None if there
+    is no such file.
+    """
+    entry = _lru.get(name)
+    if entry is not None and \
+            time.monotonic() - entry[2] < IMAGE_VIEW_MEMORY_CACHE_TIMEOUT:
+        return entry[0], entry[1]
+
+    cache_key = _get_cache_key(name)
+    cached = cache.get(cache_key)
+    if isinstance(cached, dict):
+        if entry is not None and cached['etag'] == entry[0]:
+            # unchanged, keep the bytes of this process
+            _lru.set(name, entry[0], entry[1])
+            return entry[0], entry[1]
+
+        _lru.set(name, cached['etag'], cached['content'])
+        return cached['etag'], cached['content']
+
+    f = storage.open(name, 'rb')
+    if not f:
+        _lru.delete(name)
+        return None
+
+    content = f.read()
+    etag = '"%s"' % hashlib.md5(content).hexdigest()
+    cache.set(cache_key, {'etag': etag, 'content': content},
+              SERVED_FILE_CACHE_TIMEOUT)
+    _lru.set(name, etag, content)
+    return etag, content
+
+def _get_version(etag):
+    return etag.strip('"')[:SERVED_FILE_VERSION_LENGTH]
+
+def get_content_version(content):
+    """Return version of a file of `content` to put in its url as ``v``.
+    """
+    return hashlib.md5(content).hexdigest()[:SERVED_FILE_VERSION_LENGTH]
+
+def _etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+
+    etags = [e.strip() for e in if_none_match.split(',')]
+    return '*' in etags or etag in etags or ('W/' + etag) in etags
+
+def _parse_range(request, size):
+    """Return ``(start, end)`` of a single byte range in the request, or
+    None if it is absent or not satisfiable, multiple ranges are not
+    supported.
+    """
+    match = _RANGE_RE.match(request.META.get('HTTP_RANGE', '').strip())
+    if not match or size == 0:
+        return None
+
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        # the last bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+
+    if start > end:
+        return None
+    return start, end
+
+def serve_database_file(request, storage, name):
+    served = get_served_file(storage, name)
+    if served is None:
+        raise Http404
+
+    etag, content = served
+    if request.GET.get('v') == _get_version(etag):
+        cache_control = 'public, max-age=%d, immutable' % \
+            SERVED_FILE_CACHE_TIMEOUT
+    else:
+        cache_control = 'no-cache'
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    content_type, content_encoding = mimetypes.guess_type(name)
+    byte_range = _parse_range(request, len(content))
+    if byte_range is not None:
+        start, end = byte_range
+        response = HttpResponse(content=content[start:end + 1],
+                                content_type=content_type, status=206)
+        response['Content-Range'] = 'bytes %d-%d/%d' % (start, end,
+                                                        len(content))
+    else:
+        response = HttpResponse(content=content, content_type=content_type)
+
+    response['Content-Disposition'] = 'inline; filename=%s' % name
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    if content_encoding:
+        response['Content-Encoding'] = content_encoding
+    return response
@@ -0,0 +1,142 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+import os
+import random
+import shutil
+import tempfile
+import timeit
+import multiprocessing
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management.base import BaseCommand
+
+from seahub.base.cache import SQLiteCache, TieredCache
+from seahub.utils import normalize_cache_key
+
+# prefixes of keys read in most requests
+HOT_KEY_PREFIXES = ('NICKNAME_', 'CONTACT_', 'api_avatar_url_',
+                    'UserSnapshot_', 'ApiToken_')
+
+# throttle bucket of api requests, moved in every request
+THROTTLE_INTERVAL_MS = 20
+
+def _get_keys(num_keys):
+    keys = []
+    for i in range(num_keys):
+        prefix = HOT_KEY_PREFIXES[i % len(HOT_KEY_PREFIXES)]
+        keys.append(normalize_cache_key('user%d@example.com' % i, prefix))
+    return keys
+
+def _zipf_sequence(keys, length, seed=0):
+    """Keys picked with zipf distribution, a few keys are read most often
+    like the current user of every request.
+    """
+    rand = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(len(keys))]
+    return rand.choices(keys, weights=weights, k=length)
+
+def _throttle(backend, key):
+    # what `SimpleRateThrottle` does in every api request
+    if not backend.add(key, 0, 60):
+        backend.incr(key, THROTTLE_INTERVAL_MS)
+
+def _run(backend, keys, sequence, write_ratio, throttle=False):
+    value = {'name': 'x' * 32, 'history': list(range(10))}
+    for key in keys:
+        backend.set(key, value, 300)
+
+    t1 = timeit.default_timer()
+    for i, key in enumerate(sequence):
+        if throttle:
+            _throttle(backend, 'throttle_user_%d' % (i % 100))
+
+        if write_ratio and i % write_ratio == 0:
+            backend.set(key, value, 300)
+        elif backend.get(key) is None:
+            backend.set(key, value, 300)
+    return timeit.default_timer() - t1
+
+def _get_backend(name, tmp_dir, params):
+    if name == 'file':
+        return FileBasedCache(os.path.join(tmp_dir, 'file'), params)
+    if name == 'sqlite':
+        return SQLiteCache(os.path.join(tmp_dir, 'sqlite.db'), params)
+    return TieredCache('', {'OPTIONS': {
+        'SHARED': {
+            'BACKEND': 'seahub.base.cache.SQLiteCache',
+            'LOCATION': os.path.join(tmp_dir, 'shared.db'),
+            'OPTIONS': params['OPTIONS'],
+        },
+        'SHARED_ONLY_KEY_PREFIXES': ['throttle_'],
+    }})
+
+def _run_in_process(args):
+    name, tmp_dir, params, keys, seed, ops, write_ratio, throttle = args
+    # backends are created in the worker, each process with its own
+    # connections and local tier, like seahub workers
+    backend = _get_backend(name, tmp_dir, params)
+    sequence = _zipf_sequence(keys, ops, seed)
+    seconds = _run(backend, keys, sequence, write_ratio, throttle)
+    stats = backend.get_stats() if isinstance(backend, TieredCache) else None
+    return seconds, stats
+
+class Command(BaseCommand):
+    help = "Compare time of reading and writing hot keys in the file based " \
+        "cache, the sqlite cache and the tiered cache, by one or by several " \
+        "concurrent processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=10000,
+                            help='number of distinct keys, default 10000')
+        parser.add_argument('--ops', type=int, default=100000,
+                            help='number of operations per process, default '
+                            '100000')
+        parser.add_argument('--write-ratio', type=int, default=20,
+                            help='one write per so many operations, 0 for '
+                            'none, default 20')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='number of concurrent processes, default 1')
+        parser.add_argument('--throttle', action='store_true',
+                            help='also move a throttle bucket in every '
+                            'operation, like api requests do')
+
+    def handle(self, *args, **options):
+        keys = _get_keys(options['keys'])
+        processes = max(1, options['processes'])
+        ops = options['ops']
+
+        tmp_dir = tempfile.mkdtemp()
+        params = {'OPTIONS': {'MAX_ENTRIES': 1000000}}
+
+        self.stdout.write('%-10s %12s %12s %12s' % ('backend', 'total(s)',
+                                                     'us/op', 'ops/s'))
+        try:
+            for name in ('file', 'sqlite', 'tiered'):
+                jobs = [(name, tmp_dir, params, keys, seed, ops,
+                         options['write_ratio'], options['throttle'])
+                        for seed in range(processes)]
+
+                t1 = timeit.default_timer()
+                if processes == 1:
+                    results = [_run_in_process(jobs[0])]
+                else:
+                    ctx = multiprocessing.get_context('fork')
+                    with ctx.Pool(processes) as pool:
+                        results = pool.map(_run_in_process, jobs)
+                wall = timeit.default_timer() - t1
+
+                seconds = max(r[0] for r in results)
+                self.stdout.write('%-10s %12.3f %12.1f %12.0f' % (
+                    name, seconds, seconds * 1000000 / ops,
+                    ops * processes / wall))
+
+                stats = [r[1] for r in results if r[1]]
+                if stats:
+                    local_hits = sum(s['local_hits'] for s in stats)
+                    total = sum(s['local_hits'] + s['shared_hits'] +
+                                s['misses'] for s in stats)
+                    self.stdout.write('tiered cache local hit ratio: %.2f' %
+                                      (float(local_hits) / total if total
+                                       else 0.0))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -6,8 +6,7 @@ from django.core.cache import cache
 from django.urls import reverse
 from django.http import HttpResponseRedirect
 
-from seaserv import ccnet_api
-
+from seahub.auth.utils import get_user_org
 from seahub.notifications.models import Notification
 from seahub.notifications.utils import refresh_cache
 from seahub.constants import DEFAULT_ADMIN
@@ -28,16 +27,13 @@ class BaseMiddleware(MiddlewareMixin):
     """
 
     def process_request(self, request):
-        username = request.user.username
         request.user.org = None
 
         if CLOUD_MODE:
             request.cloud_mode = True
 
-            if MULTI_TENANCY:
-                orgs = ccnet_api.get_orgs_by_user(username)
-                if orgs:
-                    request.user.org = orgs[0]
+            if MULTI_TENANCY and request.user.is_authenticated:
+                request.user.org = get_user_org(request.user)
         else:
             request.cloud_mode = False
 
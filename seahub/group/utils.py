@@ -9,6 +9,7 @@ from seaserv import ccnet_api
 
 from seahub.utils import is_org_context, normalize_cache_key
 from seahub.profile.models import Profile
+from seahub.profile.utils import get_user_infos, get_empty_user_info
 from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.avatar.settings import AVATAR_DEFAULT_SIZE
 from seahub.avatar.templatetags.avatar_tags import api_avatar_url, \
@@ -118,6 +119,42 @@ def get_group_member_info(request, group_id, email, avatar_size=AVATAR_DEFAULT_S
 
     return member_info
 
+def get_group_members_info(group_id, members, avatar_size=AVATAR_DEFAULT_SIZE):
+    """Same as `get_group_member_info` for every member in `members`, which
+    are returned by `ccnet_api.get_group_members`, with user info and
+    avatars of all members looked up at once.
+    """
+    emails = [m.user_name for m in members]
+    user_infos = get_user_infos(emails, avatar_size)
+    login_ids = dict(Profile.objects.filter(user__in=emails).
+                     values_list('user', 'login_id'))
+    group = ccnet_api.get_group(int(group_id))
+
+    members_info = []
+    for m in members:
+        email = m.user_name
+        is_admin = bool(m.is_staff)
+        if email == group.creator_name:
+            role = 'Owner'
+        elif is_admin:
+            role = 'Admin'
+        else:
+            role = 'Member'
+
+        info = user_infos.get(email) or get_empty_user_info(avatar_size)
+        members_info.append({
+            'group_id': group_id,
+            "name": info['name'],
+            'email': email,
+            "contact_email": info['contact_email'],
+            "login_id": login_ids.get(email) or '',
+            "avatar_url": info['avatar_url'],
+            "is_admin": is_admin,
+            "role": role,
+        })
+
+    return members_info
+
 GROUP_ID_CACHE_PREFIX = "GROUP_ID_"
 GROUP_ID_CACHE_TIMEOUT = 24 * 60 * 60
 
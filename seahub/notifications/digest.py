@@ -0,0 +1,128 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Sending of collaboration and file updates emails to many users, used by
+``send_notices`` and ``send_file_updates``.
+
+Users are grouped by language so each language is activated once while
+their emails are rendered. Rendered emails are sent in batches by a pool of
+threads, each keeping one connection to the mail server open, so only one
+batch is held in memory and users of a sent batch can be marked as emailed
+before the next one is rendered.
+"""
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.utils import translation
+
+from seahub.notifications.settings import DIGEST_EMAIL_WORKERS, \
+    DIGEST_EMAIL_BATCH_SIZE
+from seahub.profile.models import Profile
+
+logger = logging.getLogger(__name__)
+
+
+def get_users_by_language(usernames):
+    """Return ``{lang_code: [username]}``, with languages of all users read
+    in one query.
+    """
+    lang_codes = dict(Profile.objects.filter(user__in=usernames).
+                      values_list('user', 'lang_code'))
+
+    users_by_language = OrderedDict()
+    for username in usernames:
+        lang_code = lang_codes.get(username) or settings.LANGUAGE_CODE
+        users_by_language.setdefault(lang_code, []).append(username)
+    return users_by_language
+
+def iter_users_by_language(usernames):
+    """Yield ``(lang_code, usernames)`` with the language activated, the
+    current language is restored at the end.
+    """
+    cur_language = translation.get_language()
+    try:
+        for lang_code, users in get_users_by_language(usernames).items():
+            translation.activate(lang_code)
+            yield lang_code, users
+    finally:
+        translation.activate(cur_language)
+
+def _send_emails(messages):
+    results = []
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        return [(key, e) for key, msg in messages]
+
+    try:
+        for key, msg in messages:
+            try:
+                connection.send_messages([msg])
+                results.append((key, None))
+            except Exception as e:
+                results.append((key, e))
+                # the connection may be broken, a new one is opened by the
+                # next send if this fails
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass
+    finally:
+        connection.close()
+
+    return results
+
+def send_emails(messages, workers=DIGEST_EMAIL_WORKERS):
+    """Send `messages` of ``[(key, EmailMessage)]`` with `workers` threads.
+
+    Returns ``[(key, error)]``, error is None if the email is sent.
+    """
+    if not messages:
+        return []
+
+    workers = max(1, min(workers, len(messages)))
+    chunks = [messages[i::workers] for i in range(workers)]
+    results = []
+    with ThreadPoolExecutor(max_workers=workers,
+                            thread_name_prefix='digest-email') as executor:
+        for chunk_results in executor.map(_send_emails, chunks):
+            results.extend(chunk_results)
+    return results
+
+def send_emails_in_batches(messages, workers=DIGEST_EMAIL_WORKERS,
+                           batch_size=DIGEST_EMAIL_BATCH_SIZE):
+    """Send `messages`, an iterable of ``(key, EmailMessage)``, `batch_size`
+    at a time with `send_emails`.
+
+    Yields ``(key, error)`` of each batch once it is sent, before the next
+    batch is read from `messages`.
+    """
+    batch = []
+    for message in messages:
+        batch.append(message)
+        if len(batch) >= batch_size:
+            yield from send_emails(batch, workers)
+            batch = []
+    yield from send_emails(batch, workers)
+
+
+class DigestStats(object):
+    """Counts of a run, reported with throughput at the end.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.users = 0
+        self.sent = 0
+        self.failed = 0
+
+    def report(self):
+        seconds = max(time.time() - self.start, 0.001)
+        return 'Sent %d emails to %d users, %d failed, takes %.1fs, ' \
+            '%.1f emails/s' % (self.sent, self.users, self.failed, seconds,
+                               self.sent / seconds)
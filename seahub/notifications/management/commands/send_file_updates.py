@@ -8,20 +8,22 @@ import re
 from django.core.management.base import BaseCommand
 from django.urls import reverse
 from django.utils.html import escape as e
-from django.utils import translation
 from django.utils.translation import ugettext as _
 
 from seahub.avatar.templatetags.avatar_tags import avatar
 from seahub.avatar.util import get_default_avatar_url
 from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.constants import HASH_URLS
+from seahub.notifications.digest import iter_users_by_language, \
+    send_emails_in_batches, DigestStats
+from seahub.notifications.settings import DIGEST_EMAIL_WORKERS
 from seahub.options.models import (
     UserOptions, KEY_FILE_UPDATES_EMAIL_INTERVAL,
     KEY_FILE_UPDATES_LAST_EMAILED_TIME
 )
-from seahub.profile.models import Profile
+from seahub.profile.utils import get_user_infos
 from seahub.utils import (get_site_name, seafevents_api,
-                          send_html_email, get_site_scheme_and_netloc)
+                          get_html_email, get_site_scheme_and_netloc)
 from seahub.utils.timeutils import utc_to_local
 
 # Get an instance of a logger
@@ -61,10 +63,20 @@ class Command(BaseCommand):
     'file updates notices every period of seconds .'
     label = "notifications_send_file_updates"
 
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        self.avatar_srcs = {}
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=DIGEST_EMAIL_WORKERS,
+                            help='number of threads sending emails, default '
+                            'settings.DIGEST_EMAIL_WORKERS')
+
     def handle(self, *args, **options):
         logger.debug('Start sending file updates emails...')
         self.stdout.write('[%s] Start sending file updates emails...' % str(datetime.now()))
-        self.do_action()
+        self.do_action(options.get('workers', DIGEST_EMAIL_WORKERS))
         logger.debug('Finish sending file updates emails.\n')
         self.stdout.write('[%s] Finish sending file updates emails.\n\n' % str(datetime.now()))
 
@@ -75,12 +87,18 @@ class Command(BaseCommand):
         return re.sub(pattern, repl, img_tag)
 
     def get_avatar_src(self, username, default_size=32):
+        key = (username, default_size)
+        if key in self.avatar_srcs:
+            return self.avatar_srcs[key]
+
         avatar_img = self.get_avatar(username, default_size)
         m = re.search('<img src="(.*?)".*', avatar_img)
         if m:
-            return m.group(1)
+            src = m.group(1)
         else:
-            return ''
+            src = ''
+        self.avatar_srcs[key] = src
+        return src
 
     def get_default_avatar(self, default_size=32):
         # user default avatar
@@ -98,9 +116,6 @@ class Command(BaseCommand):
         else:
             return ''
 
-    def get_user_language(self, username):
-        return Profile.objects.get_user_language(username)
-
     def format_file_operation(self, ev):
         lib_link = a_tag(ev.repo_name, repo_url(ev.repo_id, ev.repo_name))
         small_lib_link = a_tag(ev.repo_name, repo_url(ev.repo_id, ev.repo_name), 'color:#868e96;font-size:87.5%;')
@@ -177,7 +192,52 @@ class Command(BaseCommand):
 
         return (op, details)
 
-    def do_action(self):
+    def get_messages(self, user_updates, user_infos):
+        """Yield ``(username, msg)``, mail content of users of a language is
+        formatted at a time.
+        """
+        for user_language, usernames in iter_users_by_language(list(user_updates)):
+            logger.debug('Set language code to %s for %d users' % (
+                user_language, len(usernames)))
+            self.stdout.write('[%s] Set language code to %s for %d users' % (
+                str(datetime.now()), user_language, len(usernames)))
+
+            for username in usernames:
+                res = user_updates[username]
+                try:
+                    for ele in res:
+                        ele.user_avatar = self.get_avatar_src(ele.op_user)
+                        ele.local_timestamp = utc_to_local(ele.timestamp)
+                        op_user_name = user_infos[ele.op_user]['name'] \
+                            if ele.op_user in user_infos else email2nickname(ele.op_user)
+                        ele.op_user_link = a_tag(op_user_name,
+                                                 user_info_url(ele.op_user))
+                        ele.operation, ele.op_details = self.format_file_operation(ele)
+
+                    nickname = user_infos[username]['name']
+                    contact_email = user_infos[username]['contact_email']
+
+                    c = {
+                        'name': nickname,
+                        'updates_count': len(res),
+                        'updates': res,
+                    }
+
+                    msg = get_html_email(_('New file updates on %s') % get_site_name(),
+                                         'notifications/file_updates_email.html', c,
+                                         None, [contact_email])
+                except Exception as e:
+                    logger.error('Failed to format mail content for user: %s' %
+                                 username)
+                    logger.error(e, exc_info=True)
+                    self.stderr.write('[%s] Failed to format mail content for user: %s' %
+                                      (str(datetime.now()), username))
+                    self.stderr.write('[%s]: %s' % (str(datetime.now()), e))
+                    continue
+
+                yield username, msg
+
+    def do_action(self, workers=DIGEST_EMAIL_WORKERS):
         emails = []
         user_file_updates_email_intervals = []
         for ele in UserOptions.objects.filter(
@@ -204,30 +264,20 @@ class Command(BaseCommand):
                 self.stderr.write('[%s]: %s' % (str(datetime.now()), e))
                 continue
 
+        # get file updates(from: last_emailed_time, to: now) for repos
+        # user can access
+        now = datetime.utcnow().replace(microsecond=0)
+        user_updates = {}
         for (username, interval_val) in user_file_updates_email_intervals:
-            # save current language
-            cur_language = translation.get_language()
-
-            # get and active user language
-            user_language = self.get_user_language(username)
-            translation.activate(user_language)
-            logger.debug('Set language code to %s for user: %s' % (
-                user_language, username))
-            self.stdout.write('[%s] Set language code to %s for user: %s' % (
-                str(datetime.now()), user_language, username))
-
             # get last_emailed_time if any, defaults to today 00:00:00.0
             last_emailed_time = user_last_emailed_time_dict.get(username, None)
-            now = datetime.utcnow().replace(microsecond=0)
             if not last_emailed_time:
-                last_emailed_time = datetime.utcnow().replace(hour=0).replace(
-                                    minute=0).replace(second=0).replace(microsecond=0)
+                last_emailed_time = now.replace(hour=0).replace(
+                                    minute=0).replace(second=0)
             else:
                 if (now - last_emailed_time).total_seconds() < interval_val:
                     continue
 
-            # get file updates(from: last_emailed_time, to: now) for repos
-            # user can access
             res = seafevents_api.get_user_activities_by_timestamp(
                 username, last_emailed_time, now)
             if not res:
@@ -238,46 +288,34 @@ class Command(BaseCommand):
             if not res:
                 continue
 
-            # format mail content & send file updates email to user
-            try:
-                for ele in res:
-                    ele.user_avatar = self.get_avatar_src(ele.op_user)
-                    ele.local_timestamp = utc_to_local(ele.timestamp)
-                    ele.op_user_link = a_tag(email2nickname(ele.op_user),
-                                             user_info_url(ele.op_user))
-                    ele.operation, ele.op_details = self.format_file_operation(ele)
-            except Exception as e:
-                logger.error('Failed to format mail content for user: %s' %
-                             username)
-                logger.error(e, exc_info=True)
-                self.stderr.write('[%s] Failed to format mail content for user: %s' %
-                                  (str(datetime.now()), username))
-                self.stderr.write('[%s]: %s' % (str(datetime.now()), e))
-                continue
+            user_updates[username] = res
 
-            nickname = email2nickname(username)
-            contact_email = Profile.objects.get_contact_email_by_user(username)
+        if not user_updates:
+            return
 
-            c = {
-                'name': nickname,
-                'updates_count': len(res),
-                'updates': res,
-            }
+        stats = DigestStats()
+        users = set(user_updates)
+        for res in user_updates.values():
+            users.update(x.op_user for x in res)
+        user_infos = get_user_infos(users)
 
-            try:
-                send_html_email(_('New file updates on %s') % get_site_name(),
-                                'notifications/file_updates_email.html', c,
-                                None, [contact_email])
+        for username, error in send_emails_in_batches(
+                self.get_messages(user_updates, user_infos), workers):
+            stats.users += 1
+            contact_email = user_infos[username]['contact_email']
+            if error is None:
+                stats.sent += 1
                 # set new last_emailed_time
                 UserOptions.objects.set_file_updates_last_emailed_time(
                     username, now)
                 self.stdout.write('[%s] Successful to send email to %s' %
                                   (str(datetime.now()), contact_email))
-            except Exception as e:
+            else:
+                stats.failed += 1
                 logger.error('Failed to send email to %s, error detail: %s' %
-                             (contact_email, e))
+                             (contact_email, error))
                 self.stderr.write('[%s] Failed to send email to %s, error '
-                                  'detail: %s' % (str(datetime.now()), contact_email, e))
-            finally:
-                # reset lang
-                translation.activate(cur_language)
+                                  'detail: %s' % (str(datetime.now()), contact_email, error))
+
+        logger.info(stats.report())
+        self.stdout.write('[%s] %s' % (str(datetime.now()), stats.report()))
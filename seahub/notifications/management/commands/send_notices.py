@@ -9,18 +9,19 @@ import re
 from django.core.management.base import BaseCommand
 from django.urls import reverse
 from django.utils.html import escape
-from django.utils import translation
 from django.utils.translation import ugettext as _
 
-from seaserv import seafile_api, ccnet_api
-from seahub.base.models import CommandsLastCheck
+from seahub.notifications.digest import iter_users_by_language, \
+    send_emails_in_batches, DigestStats
 from seahub.notifications.models import UserNotification
-from seahub.utils import send_html_email, get_site_scheme_and_netloc
+from seahub.notifications.settings import DIGEST_EMAIL_WORKERS
+from seahub.notifications.utils import NoticeDetailResolver
+from seahub.utils import get_html_email, get_site_scheme_and_netloc
 from seahub.avatar.templatetags.avatar_tags import avatar
 from seahub.avatar.util import get_default_avatar_url
 from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.invitations.models import Invitation
-from seahub.profile.models import Profile
+from seahub.profile.utils import get_user_infos
 from seahub.constants import HASH_URLS
 from seahub.utils import get_site_name
 from seahub.options.models import UserOptions, KEY_COLLABORATE_EMAIL_INTERVAL, \
@@ -34,11 +35,31 @@ class Command(BaseCommand):
     help = 'Send Email notifications to user if he/she has an unread notices every period of seconds .'
     label = "notifications_send_notices"
 
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+
+        # repos, groups and users referred by notices, looked up once a run
+        self.resolver = NoticeDetailResolver()
+        self.user_infos = {}
+        self.avatar_srcs = {}
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=DIGEST_EMAIL_WORKERS,
+                            help='number of threads sending emails, default '
+                            'settings.DIGEST_EMAIL_WORKERS')
+
     def handle(self, *args, **options):
         logger.debug('Start sending user notices...')
-        self.do_action()
+        self.do_action(options.get('workers', DIGEST_EMAIL_WORKERS))
         logger.debug('Finish sending user notices.\n')
 
+    def get_nickname(self, username):
+        info = self.user_infos.get(username)
+        if info is None:
+            return email2nickname(username)
+        return info['name']
+
     def get_avatar(self, username, default_size=32):
         img_tag = avatar(username, default_size)
         pattern = r'src="(.*)"'
@@ -46,12 +67,18 @@ class Command(BaseCommand):
         return re.sub(pattern, repl, img_tag)
 
     def get_avatar_src(self, username, default_size=32):
+        key = (username, default_size)
+        if key in self.avatar_srcs:
+            return self.avatar_srcs[key]
+
         avatar_img = self.get_avatar(username, default_size)
         m = re.search('<img src="(.*?)".*', avatar_img)
         if m:
-            return m.group(1)
+            src = m.group(1)
         else:
-            return ''
+            src = ''
+        self.avatar_srcs[key] = src
+        return src
 
     def get_default_avatar(self, default_size=32):
         # user default avatar
@@ -72,24 +99,18 @@ class Command(BaseCommand):
     def format_repo_share_msg(self, notice):
         d = json.loads(notice.detail)
         repo_id = d['repo_id']
-        repo = seafile_api.get_repo(repo_id)
         path = d['path']
         org_id = d.get('org_id', None)
         if path == '/':
             shared_type = 'library'
+            repo = self.resolver.get_repo(repo_id)
         else:
             shared_type = 'folder'
-            if org_id:
-                owner = seafile_api.get_org_repo_owner(repo_id)
-                repo = seafile_api.get_org_virtual_repo(
-                    org_id, repo_id, path, owner)
-            else:
-                owner = seafile_api.get_repo_owner(repo_id)
-                repo = seafile_api.get_virtual_repo(repo_id, path, owner)
+            repo = self.resolver.get_repo(repo_id, path, org_id)
 
         repo_url = reverse('lib_view', args=[repo.id, repo.name, ''])
         notice.repo_url = repo_url
-        notice.notice_from = escape(email2nickname(d['share_from']))
+        notice.notice_from = escape(self.get_nickname(d['share_from']))
         notice.repo_name = repo.name
         notice.avatar_src = self.get_avatar_src(d['share_from'])
         notice.shared_type = shared_type
@@ -100,27 +121,21 @@ class Command(BaseCommand):
         d = json.loads(notice.detail)
 
         repo_id = d['repo_id']
-        repo = seafile_api.get_repo(repo_id)
         group_id = d['group_id']
-        group = ccnet_api.get_group(group_id)
+        group = self.resolver.get_group(group_id)
         org_id = d.get('org_id', None)
 
         path = d['path']
         if path == '/':
             shared_type = 'library'
+            repo = self.resolver.get_repo(repo_id)
         else:
             shared_type = 'folder'
-            if org_id:
-                owner = seafile_api.get_org_repo_owner(repo_id)
-                repo = seafile_api.get_org_virtual_repo(
-                    org_id, repo_id, path, owner)
-            else:
-                owner = seafile_api.get_repo_owner(repo_id)
-                repo = seafile_api.get_virtual_repo(repo_id, path, owner)
+            repo = self.resolver.get_repo(repo_id, path, org_id)
 
         repo_url = reverse('lib_view', args=[repo.id, repo.name, ''])
         notice.repo_url = repo_url
-        notice.notice_from = escape(email2nickname(d['share_from']))
+        notice.notice_from = escape(self.get_nickname(d['share_from']))
         notice.repo_name = repo.name
         notice.avatar_src = self.get_avatar_src(d['share_from'])
         notice.group_url = reverse('group', args=[group.id])
@@ -134,7 +149,7 @@ class Command(BaseCommand):
 
         file_name = d['file_name']
         repo_id = d['repo_id']
-        repo = seafile_api.get_repo(repo_id)
+        repo = self.resolver.get_repo(repo_id)
         uploaded_to = d['uploaded_to'].rstrip('/')
         file_path = uploaded_to + '/' + file_name
         file_link = reverse('view_lib_file', args=[repo_id, file_path])
@@ -155,12 +170,12 @@ class Command(BaseCommand):
         group_id = d['group_id']
         join_request_msg = d['join_request_msg']
 
-        group = ccnet_api.get_group(group_id)
+        group = self.resolver.get_group(group_id)
 
         notice.grpjoin_user_profile_url = reverse('user_profile',
                                                   args=[username])
         notice.grpjoin_group_url = HASH_URLS['GROUP_MEMBERS'] % {'group_id': group_id}
-        notice.notice_from = escape(email2nickname(username))
+        notice.notice_from = escape(self.get_nickname(username))
         notice.grpjoin_group_name = group.group_name
         notice.grpjoin_request_msg = join_request_msg
         notice.avatar_src = self.get_avatar_src(username)
@@ -171,9 +186,9 @@ class Command(BaseCommand):
         group_staff = d['group_staff']
         group_id = d['group_id']
 
-        group = ccnet_api.get_group(group_id)
+        group = self.resolver.get_group(group_id)
 
-        notice.notice_from = escape(email2nickname(group_staff))
+        notice.notice_from = escape(self.get_nickname(group_staff))
         notice.avatar_src = self.get_avatar_src(group_staff)
         notice.group_staff_profile_url = reverse('user_profile',
                                                   args=[group_staff])
@@ -206,9 +221,6 @@ class Command(BaseCommand):
         notice.inv_accept_at = inv.accept_time.strftime("%Y-%m-%d %H:%M:%S")
         return notice
 
-    def get_user_language(self, username):
-        return Profile.objects.get_user_language(username)
-
     def get_user_intervals_and_notices(self):
         """
         filter users who have collaborate-notices in last longest interval
@@ -244,20 +256,117 @@ class Command(BaseCommand):
         return [(key, value['interval'], value['notices']) for key, value in results.items()]
 
 
-    def do_action(self):
+    def format_notices(self, to_user, user_notices):
+        notices = []
+        for notice in user_notices:
+            d = json.loads(notice.detail)
+            repo_id = d.get('repo_id')
+            group_id = d.get('group_id')
+            try:
+                if repo_id and not self.resolver.get_repo(repo_id):
+                    notice.delete()
+                    continue
+                if group_id and not self.resolver.get_group(group_id):
+                    notice.delete()
+                    continue
+            except Exception as e:
+                logger.error(e)
+                continue
+            if notice.to_user != to_user:
+                continue
+
+            elif notice.is_repo_share_msg():
+                notice = self.format_repo_share_msg(notice)
+
+            elif notice.is_repo_share_to_group_msg():
+                notice = self.format_repo_share_to_group_msg(notice)
+
+            elif notice.is_file_uploaded_msg():
+                notice = self.format_file_uploaded_msg(notice)
+
+            elif notice.is_group_join_request():
+                notice = self.format_group_join_request(notice)
+
+            elif notice.is_add_user_to_group():
+                notice = self.format_add_user_to_group(notice)
+
+            elif notice.is_file_comment_msg():
+                notice = self.format_file_comment_msg(notice)
+
+            elif notice.is_guest_invitation_accepted_msg():
+                notice = self.format_guest_invitation_accepted_msg(notice)
+
+            if notice is None:
+                continue
+
+            notices.append(notice)
+
+        return notices
+
+    def get_notice_users(self, notices):
+        """Users who send notices, to have their names read at once.
+        """
+        users = set()
+        for notice in notices:
+            try:
+                d = json.loads(notice.detail)
+            except ValueError:
+                continue
+            if isinstance(d, dict):
+                for key in ('share_from', 'username', 'group_staff'):
+                    if d.get(key):
+                        users.add(d[key])
+        return users
+
+    def get_messages(self, user_notices_dict):
+        """Yield ``(to_user, msg)``, mail content of users of a language is
+        formatted at a time.
+        """
+        for user_language, users in iter_users_by_language(list(user_notices_dict)):
+            logger.debug('Set language code to %s for %d users' % (
+                user_language, len(users)))
+            self.stdout.write('[%s] Set language code to %s for %d users' % (
+                str(datetime.datetime.now()), user_language, len(users)))
+
+            for to_user in users:
+                notices = self.format_notices(to_user, user_notices_dict[to_user])
+                if not notices:
+                    continue
+
+                user_name = self.get_nickname(to_user)
+                contact_email = self.user_infos[to_user]['contact_email']
+                c = {
+                    'to_user': contact_email,
+                    'notice_count': len(notices),
+                    'notices': notices,
+                    'user_name': user_name,
+                    }
+
+                try:
+                    msg = get_html_email(_('New notice on %s') % get_site_name(),
+                                         'notifications/notice_email.html', c,
+                                         None, [contact_email])
+                except Exception as e:
+                    logger.error('Failed to format mail content for user: %s, error detail: %s' % (to_user, e))
+                    self.stderr.write('[%s] Failed to format mail content for user: %s, error detail: %s' % (str(datetime.datetime.now()), to_user, e))
+                    continue
+
+                yield to_user, msg
+
+    def do_action(self, workers=DIGEST_EMAIL_WORKERS):
+        stats = DigestStats()
         user_interval_notices = self.get_user_intervals_and_notices()
         last_emailed_list = UserOptions.objects.filter(option_key=KEY_COLLABORATE_LAST_EMAILED_TIME).values_list('email', 'option_val')
         user_last_emailed_time_dict = {le[0]: datetime.datetime.strptime(le[1], "%Y-%m-%d %H:%M:%S") for le in last_emailed_list}
 
-        # save current language
-        cur_language = translation.get_language()
+        now = datetime.datetime.now().replace(microsecond=0)
+        user_notices_dict = {}
         for (to_user, interval_val, notices) in user_interval_notices:
             # get last_emailed_time if any, defaults to today 00:00:00.0
             last_emailed_time = user_last_emailed_time_dict.get(to_user, None)
-            now = datetime.datetime.now().replace(microsecond=0)
             if not last_emailed_time:
-                last_emailed_time = datetime.datetime.now().replace(hour=0).replace(
-                                    minute=0).replace(second=0).replace(microsecond=0)
+                last_emailed_time = now.replace(hour=0).replace(
+                                    minute=0).replace(second=0)
             else:
                 if (now - last_emailed_time).total_seconds() < interval_val:
                     continue
@@ -266,82 +375,31 @@ class Command(BaseCommand):
             if not user_notices:
                 continue
 
-            # get and active user language
-            user_language = self.get_user_language(to_user)
-            translation.activate(user_language)
-            logger.debug('Set language code to %s for user: %s' % (
-                user_language, to_user))
-            self.stdout.write('[%s] Set language code to %s for user: %s' % (
-                str(datetime.datetime.now()), user_language, to_user))
-
-            # format mail content and send
-            notices = []
-            for notice in user_notices:
-                d = json.loads(notice.detail)
-                repo_id = d.get('repo_id')
-                group_id = d.get('group_id')
-                try:
-                    if repo_id and not seafile_api.get_repo(repo_id):
-                        notice.delete()
-                        continue
-                    if group_id and not ccnet_api.get_group(group_id):
-                        notice.delete()
-                        continue
-                except Exception as e:
-                    logger.error(e)
-                    continue
-                if notice.to_user != to_user:
-                    continue
-
-                elif notice.is_repo_share_msg():
-                    notice = self.format_repo_share_msg(notice)
-
-                elif notice.is_repo_share_to_group_msg():
-                    notice = self.format_repo_share_to_group_msg(notice)
+            user_notices_dict[to_user] = user_notices
 
-                elif notice.is_file_uploaded_msg():
-                    notice = self.format_file_uploaded_msg(notice)
+        if not user_notices_dict:
+            return
 
-                elif notice.is_group_join_request():
-                    notice = self.format_group_join_request(notice)
+        notice_users = set(user_notices_dict)
+        for user_notices in user_notices_dict.values():
+            notice_users |= self.get_notice_users(user_notices)
+        self.user_infos = get_user_infos(notice_users)
 
-                elif notice.is_add_user_to_group():
-                    notice = self.format_add_user_to_group(notice)
-
-                elif notice.is_file_comment_msg():
-                    notice = self.format_file_comment_msg(notice)
-
-                elif notice.is_guest_invitation_accepted_msg():
-                    notice = self.format_guest_invitation_accepted_msg(notice)
-
-                if notice is None:
-                    continue
-
-                notices.append(notice)
-
-            if not notices:
-                continue
-            user_name = email2nickname(to_user)
-            contact_email = Profile.objects.get_contact_email_by_user(to_user)
-            c = {
-                'to_user': contact_email,
-                'notice_count': len(notices),
-                'notices': notices,
-                'user_name': user_name,
-                }
-
-            try:
-                send_html_email(_('New notice on %s') % get_site_name(),
-                                'notifications/notice_email.html', c,
-                                None, [contact_email])
+        for to_user, error in send_emails_in_batches(
+                self.get_messages(user_notices_dict), workers):
+            stats.users += 1
+            contact_email = self.user_infos[to_user]['contact_email']
+            if error is None:
+                stats.sent += 1
                 # set new last_emailed_time
                 UserOptions.objects.set_collaborate_last_emailed_time(
                     to_user, now)
                 logger.info('Successfully sent email to %s' % contact_email)
                 self.stdout.write('[%s] Successfully sent email to %s' % (str(datetime.datetime.now()), contact_email))
-            except Exception as e:
-                logger.error('Failed to send email to %s, error detail: %s' % (contact_email, e))
-                self.stderr.write('[%s] Failed to send email to %s, error detail: %s' % (str(datetime.datetime.now()), contact_email, e))
+            else:
+                stats.failed += 1
+                logger.error('Failed to send email to %s, error detail: %s' % (contact_email, error))
+                self.stderr.write('[%s] Failed to send email to %s, error detail: %s' % (str(datetime.datetime.now()), contact_email, error))
 
-            # restore current language
-            translation.activate(cur_language)
+        logger.info(stats.report())
+        self.stdout.write('[%s] %s' % (str(datetime.datetime.now()), stats.report()))
@@ -6,7 +6,7 @@ import json
 import logging
 
 from django.urls import reverse
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.forms import ModelForm, Textarea
 from django.utils.html import escape
@@ -20,9 +20,12 @@ from seahub.base.fields import LowerCaseCharField
 from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.invitations.models import Invitation
 from seahub.utils import normalize_cache_key
+from seahub.utils.background import run_in_background
 from seahub.constants import HASH_URLS
 from seahub.drafts.models import DraftReviewer
 from seahub.file_participants.utils import list_file_participants
+from seahub.notifications.settings import NOTIFICATION_BULK_CREATE_BATCH_SIZE, \
+    NOTIFICATION_ASYNC_FAN_OUT_THRESHOLD, NOTIFICATION_UNSEEN_COUNT_CACHE_TIMEOUT
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
@@ -147,13 +150,45 @@ class UserNotificationManager(models.Manager):
         """
         n = super(UserNotificationManager, self).create(
             to_user=to_user, msg_type=msg_type, detail=detail)
-        n.save()
 
-        cache_key = get_cache_key_of_unseen_notifications(to_user)
-        cache.delete(cache_key)
+        self._change_unseen_count(to_user, 1)
 
         return n
 
+    def _change_unseen_count(self, username, delta):
+        """Add `delta` to unseen count of a user if it is cached.
+        """
+        if not delta:
+            return
+
+        cache_key = get_cache_key_of_unseen_notifications(username)
+        try:
+            cache.incr(cache_key, delta)
+        except ValueError:
+            # not cached, counted on next read. A reader counting at the
+            # same time may have stored a count without this change since
+            cache.delete(cache_key)
+
+    def bulk_add_user_notifications(self, to_users, msg_type, detail):
+        """Add notifications of same `msg_type` and `detail` to many users,
+        with one insert per ``NOTIFICATION_BULK_CREATE_BATCH_SIZE`` users.
+
+        Returns number of notifications added.
+        """
+        to_users = list(dict.fromkeys(u for u in to_users if u))
+        now = datetime.datetime.now()
+        for i in range(0, len(to_users), NOTIFICATION_BULK_CREATE_BATCH_SIZE):
+            batch = to_users[i:i + NOTIFICATION_BULK_CREATE_BATCH_SIZE]
+            super(UserNotificationManager, self).bulk_create([
+                UserNotification(to_user=u, msg_type=msg_type, detail=detail,
+                                 timestamp=now) for u in batch])
+
+            # one delete instead of an incr per user, counted on next read
+            cache.delete_many([get_cache_key_of_unseen_notifications(u)
+                               for u in batch])
+
+        return len(to_users)
+
     def get_all_notifications(self, seen=None, time_since=None):
         """Get all notifications of all users.
 
@@ -190,27 +225,74 @@ class UserNotificationManager(models.Manager):
         """
         self.get_user_notifications(username).delete()
 
+        cache_key = get_cache_key_of_unseen_notifications(username)
+        cache.set(cache_key, 0, NOTIFICATION_UNSEEN_COUNT_CACHE_TIMEOUT)
+
     def count_unseen_user_notifications(self, username):
-        """
+        """Return number of unseen notifications of a user, from cache if
+        possible.
 
         Arguments:
         - `self`:
         - `username`:
         """
-        return super(UserNotificationManager, self).filter(
-            to_user=username, seen=False).count()
+        cache_key = get_cache_key_of_unseen_notifications(username)
+        count = cache.get(cache_key)
+        if count is None:
+            count = super(UserNotificationManager, self).filter(
+                to_user=username, seen=False).count()
+            # keep a count stored while counting, it may include changes
+            # made after this one is read
+            cache.add(cache_key, count, NOTIFICATION_UNSEEN_COUNT_CACHE_TIMEOUT)
+
+        # may be below 0 for a while if notices are seen while counting
+        return max(count, 0)
+
+    def mark_user_notifications_seen(self, username):
+        """Mark all notifications of a user as seen.
+
+        Returns number of notifications marked.
+        """
+        count = self.get_user_notifications(username, seen=False).update(
+            seen=True)
+
+        cache_key = get_cache_key_of_unseen_notifications(username)
+        cache.set(cache_key, 0, NOTIFICATION_UNSEEN_COUNT_CACHE_TIMEOUT)
+
+        return count
+
+    def mark_notifications_seen(self, username, notice_ids):
+        """Mark notifications of `notice_ids` of a user as seen.
+
+        Returns number of notifications marked.
+        """
+        if not notice_ids:
+            return 0
+
+        count = self.get_user_notifications(username, seen=False).filter(
+            id__in=notice_ids).update(seen=True)
+        self._change_unseen_count(username, -count)
+
+        return count
 
     def seen_user_msg_notices(self, to_user, from_user):
         """Mark priv message notices of a user as seen.
         """
         user_notices = super(UserNotificationManager, self).filter(
-            to_user=to_user, seen=False, msg_type=MSG_TYPE_USER_MESSAGE)
-        for notice in user_notices:
-            notice_from_user = notice.user_message_detail_to_dict().get('msg_from')
+            to_user=to_user, seen=False,
+            msg_type=MSG_TYPE_USER_MESSAGE).values_list('id', 'detail')
+
+        notice_ids = []
+        for notice_id, detail in user_notices:
+            try:
+                notice_from_user = json.loads(detail)['msg_from']
+            except ValueError:
+                # old notices keep sender as detail
+                notice_from_user = detail
             if from_user == notice_from_user:
-                if notice.seen is False:
-                    notice.seen = True
-                    notice.save()
+                notice_ids.append(notice_id)
+
+        self.mark_notifications_seen(to_user, notice_ids)
 
     def add_group_join_request_notice(self, to_user, detail):
         """
@@ -336,8 +418,9 @@ class UserNotification(models.Model):
         """
         seen = self.seen
         if seen is False:
+            UserNotification.objects.mark_notifications_seen(self.to_user,
+                                                             [self.id])
             self.seen = True
-            self.save()
         return seen
 
     def is_file_uploaded_msg(self):
@@ -773,6 +856,31 @@ from seahub.invitations.signals import accept_guest_invitation_successful
 from seahub.drafts.signals import comment_draft_successful, \
         request_reviewer_successful
 
+def _bulk_add_user_notifications(to_users, msg_type, detail):
+    try:
+        UserNotification.objects.bulk_add_user_notifications(to_users,
+                                                             msg_type, detail)
+    except Exception as e:
+        logger.error('Failed to add %s notifications to %d users: %s' %
+                     (msg_type, len(to_users), e))
+
+def add_user_notifications(to_users, msg_type, detail):
+    """Notify many users at once. If they are more than
+    ``NOTIFICATION_ASYNC_FAN_OUT_THRESHOLD``, which is not set by default,
+    notifications are added by a background thread once the current
+    transaction is committed, and lost if the process exits before.
+    """
+    to_users = list(to_users)
+    if not NOTIFICATION_ASYNC_FAN_OUT_THRESHOLD or \
+            len(to_users) <= NOTIFICATION_ASYNC_FAN_OUT_THRESHOLD:
+        UserNotification.objects.bulk_add_user_notifications(to_users,
+                                                             msg_type, detail)
+        return
+
+    transaction.on_commit(lambda: run_in_background(
+        'notification-fan-out', _bulk_add_user_notifications, to_users,
+        msg_type, detail))
+
 @receiver(upload_file_successful)
 def add_upload_file_msg_cb(sender, **kwargs):
     """Notify repo owner when others upload files to his/her folder from shared link.
@@ -817,12 +925,9 @@ def add_share_repo_to_group_msg_cb(sender, **kwargs):
     assert from_user and group_id and repo and path is not None, 'Arguments error'
 
     members = ccnet_api.get_group_members(int(group_id))
-    for member in members:
-        to_user = member.user_name
-        if to_user == from_user:
-            continue
-        detail = repo_share_to_group_msg_to_json(from_user, repo.id, group_id, path, org_id)
-        UserNotification.objects.add_repo_share_to_group_msg(to_user, detail)
+    to_users = [m.user_name for m in members if m.user_name != from_user]
+    detail = repo_share_to_group_msg_to_json(from_user, repo.id, group_id, path, org_id)
+    add_user_notifications(to_users, MSG_TYPE_REPO_SHARE_TO_GROUP, detail)
 
 @receiver(group_join_request)
 def group_join_request_cb(sender, **kwargs):
@@ -833,9 +938,7 @@ def group_join_request_cb(sender, **kwargs):
 
     detail = group_join_request_to_json(username, group_id,
                                         join_request_msg)
-    for staff in staffs:
-        UserNotification.objects.add_group_join_request_notice(to_user=staff,
-                                                               detail=detail)
+    add_user_notifications(staffs, MSG_TYPE_GROUP_JOIN_REQUEST, detail)
 
 @receiver(add_user_to_group)
 def add_user_to_group_cb(sender, **kwargs):
@@ -861,9 +964,8 @@ def comment_file_successful_cb(sender, **kwargs):
 
     notify_users = list_file_participants(repo.id, file_path)
     notify_users = [x for x in notify_users if x != author]
-    for u in notify_users:
-        detail = file_comment_msg_to_json(repo.id, file_path, author, comment)
-        UserNotification.objects.add_file_comment_msg(u, detail)
+    detail = file_comment_msg_to_json(repo.id, file_path, author, comment)
+    add_user_notifications(notify_users, MSG_TYPE_FILE_COMMENT, detail)
 
 @receiver(comment_draft_successful)
 def comment_draft_successful_cb(sender, **kwargs):
@@ -873,13 +975,11 @@ def comment_draft_successful_cb(sender, **kwargs):
 
     detail = draft_comment_msg_to_json(draft.id, author, comment)
 
-    if draft.username != author:
-        UserNotification.objects.add_draft_comment_msg(draft.username, detail)
-
+    notify_users = [draft.username]
     reviewers = DraftReviewer.objects.filter(draft=draft)
-    for r in reviewers:
-        if r.reviewer != author:
-            UserNotification.objects.add_draft_comment_msg(r.reviewer, detail)
+    notify_users.extend(r.reviewer for r in reviewers)
+    notify_users = [x for x in notify_users if x != author]
+    add_user_notifications(notify_users, MSG_TYPE_DRAFT_COMMENT, detail)
 
 @receiver(request_reviewer_successful)
 def requeset_reviewer_successful_cb(sender, **kwargs):
@@ -2,3 +2,27 @@
 from django.conf import settings
 
 NOTIFICATION_CACHE_TIMEOUT = getattr(settings, 'NOTIFICATION_CACHE_TIMEOUT', 0)
+
+# number of notifications inserted in one query when many users are notified
+NOTIFICATION_BULK_CREATE_BATCH_SIZE = getattr(settings, 'NOTIFICATION_BULK_CREATE_BATCH_SIZE', 1000)
+
+# notifications to more users than this are added by a background thread
+# after the request, 0 to always add them in the request. The thread is not
+# durable, notifications not added yet are lost if the process exits
+NOTIFICATION_ASYNC_FAN_OUT_THRESHOLD = getattr(settings, 'NOTIFICATION_ASYNC_FAN_OUT_THRESHOLD', 0)
+
+# seconds to cache unseen notification count of a user, it is kept up to date
+# when notifications are added or seen and counted again after this
+NOTIFICATION_UNSEEN_COUNT_CACHE_TIMEOUT = getattr(settings, 'NOTIFICATION_UNSEEN_COUNT_CACHE_TIMEOUT', 60 * 60)
+
+# seconds to cache details of a notice, a renamed or deleted library, group or
+# file shows up in notices after this, names of users are read every time
+NOTICE_DETAIL_CACHE_TIMEOUT = getattr(settings, 'NOTICE_DETAIL_CACHE_TIMEOUT', 60 * 60)
+
+# threads sending collaboration and file updates emails, each keeps one
+# connection to the mail server open
+DIGEST_EMAIL_WORKERS = getattr(settings, 'DIGEST_EMAIL_WORKERS', 4)
+
+# emails rendered and sent at a time, users are marked as emailed after each
+# batch, so a failed run sends again only to users of unsent batches
+DIGEST_EMAIL_BATCH_SIZE = getattr(settings, 'DIGEST_EMAIL_BATCH_SIZE', 200)
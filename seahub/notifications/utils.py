@@ -6,13 +6,20 @@ from django.core.cache import cache
 from django.urls import reverse
 
 from seaserv import ccnet_api, seafile_api
-from seahub.notifications.models import Notification
-from seahub.notifications.settings import NOTIFICATION_CACHE_TIMEOUT
+from seahub.notifications.models import Notification, MSG_TYPE_REPO_SHARE, \
+    MSG_TYPE_REPO_SHARE_TO_GROUP, MSG_TYPE_ADD_USER_TO_GROUP, \
+    MSG_TYPE_DRAFT_COMMENT, MSG_TYPE_REPO_TRANSFER, MSG_TYPE_DRAFT_REVIEWER, \
+    MSG_TYPE_FILE_UPLOADED, MSG_TYPE_FILE_COMMENT
+from seahub.notifications.settings import NOTIFICATION_CACHE_TIMEOUT, \
+    NOTICE_DETAIL_CACHE_TIMEOUT
 from seahub.avatar.templatetags.avatar_tags import api_avatar_url
-from seahub.base.templatetags.seahub_tags import email2nickname, email2contact_email
+from seahub.profile.utils import get_user_infos
+from seahub.utils import normalize_cache_key
 
 logger = logging.getLogger(__name__)
 
+NOTICE_DETAIL_CACHE_PREFIX = 'notice_detail_'
+
 
 def refresh_cache():
     """
@@ -22,209 +29,228 @@ def refresh_cache():
               NOTIFICATION_CACHE_TIMEOUT)
 
 
+# msg type: (key of user in detail, prefix of keys of user info, key of
+# contact email, key of avatar url)
+NOTICE_USER_FIELDS = {
+    MSG_TYPE_REPO_SHARE: ('share_from', 'share_from_user_', 'contact_email',
+                          'avatar_url'),
+    MSG_TYPE_REPO_SHARE_TO_GROUP: ('share_from', 'share_from_user_',
+                                   'contact_email', 'avatar_url'),
+    MSG_TYPE_ADD_USER_TO_GROUP: ('group_staff', 'group_staff_',
+                                 'contact_email', 'avatar_url'),
+    MSG_TYPE_DRAFT_COMMENT: ('author', 'author_', 'context_email',
+                             'avatar_url'),
+    MSG_TYPE_REPO_TRANSFER: ('repo_owner', 'transfer_from_user_',
+                             'contact_email', 'avatar_url'),
+    MSG_TYPE_DRAFT_REVIEWER: ('from_user', 'request_user_', 'contact_email',
+                              'avatat_url'),
+    MSG_TYPE_FILE_COMMENT: ('author', 'author_', 'contact_email',
+                            'avatar_url'),
+}
+
+NOTICE_DETAIL_MSG_TYPES = set(NOTICE_USER_FIELDS) | {MSG_TYPE_FILE_UPLOADED}
+
+
+def _get_notice_detail_cache_key(notice_id):
+    return normalize_cache_key(str(notice_id), NOTICE_DETAIL_CACHE_PREFIX)
+
+def _get_shared_repo_key(d):
+    """Key of repo or virtual repo of a share notice.
+    """
+    path = d.get('path', '/')
+    if path == '/':
+        return d['repo_id'], '/', None
+    return d['repo_id'], path, d.get('org_id', None)
+
+class NoticeDetailResolver(object):
+    """Repos, groups and files referred by notices, each looked up once.
+    """
+
+    def __init__(self):
+        self.repos = {}
+        self.repo_owners = {}
+        self.groups = {}
+        self.file_ids = {}
+
+    def get_repo(self, repo_id, path='/', org_id=None):
+        key = (repo_id, path, org_id)
+        if key in self.repos:
+            return self.repos[key]
+
+        if path == '/':
+            repo = seafile_api.get_repo(repo_id)
+        else:
+            owner = self.repo_owners.get((repo_id, org_id))
+            if owner is None:
+                if org_id:
+                    owner = seafile_api.get_org_repo_owner(repo_id)
+                else:
+                    owner = seafile_api.get_repo_owner(repo_id)
+                self.repo_owners[(repo_id, org_id)] = owner
+
+            if org_id:
+                repo = seafile_api.get_org_virtual_repo(org_id, repo_id, path,
+                                                        owner)
+            else:
+                repo = seafile_api.get_virtual_repo(repo_id, path, owner)
+
+        self.repos[key] = repo
+        return repo
+
+    def get_group(self, group_id):
+        if group_id not in self.groups:
+            self.groups[group_id] = ccnet_api.get_group(group_id)
+        return self.groups[group_id]
+
+    def file_exists(self, repo_id, file_path):
+        key = (repo_id, file_path)
+        if key not in self.file_ids:
+            self.file_ids[key] = seafile_api.get_file_id_by_path(repo_id,
+                                                                 file_path)
+        return bool(self.file_ids[key])
+
+def _resolve_notice_detail(notice, d, resolver):
+    """Return detail of `notice` parsed as `d` with names of repos, groups
+    and files it refers to, or None if they no longer exist. Info of users
+    is not set, as it may change.
+    """
+    msg_type = notice.msg_type
+    if msg_type in (MSG_TYPE_REPO_SHARE, MSG_TYPE_REPO_SHARE_TO_GROUP):
+        repo = resolver.get_repo(*_get_shared_repo_key(d))
+        group = None
+        if msg_type == MSG_TYPE_REPO_SHARE_TO_GROUP:
+            group = resolver.get_group(d['group_id'])
+            if not group:
+                return None
+        if not repo:
+            return None
+
+        d.pop('org_id', None)
+        d['repo_name'] = repo.name
+        d['repo_id'] = repo.id
+        if group:
+            d['group_name'] = group.group_name
+
+    elif msg_type == MSG_TYPE_ADD_USER_TO_GROUP:
+        group = resolver.get_group(d['group_id'])
+        if group is None:
+            return None
+        d['group_name'] = group.group_name
+
+    elif msg_type == MSG_TYPE_REPO_TRANSFER:
+        repo = resolver.get_repo(d['repo_id'])
+        if not repo:
+            return None
+        d.pop('org_id', None)
+
+    elif msg_type == MSG_TYPE_DRAFT_REVIEWER:
+        d.pop('to_user', None)
+
+    elif msg_type == MSG_TYPE_FILE_UPLOADED:
+        repo = resolver.get_repo(d['repo_id'])
+        if not repo:
+            return None
+
+        filename = d['file_name']
+        if d['uploaded_to'] == '/':
+            # current upload path is '/'
+            file_path = '/' + filename
+            name = repo.name
+        else:
+            uploaded_to = d['uploaded_to'].rstrip('/')
+            file_path = uploaded_to + '/' + filename
+            name = os.path.basename(uploaded_to)
+
+        d['repo_name'] = repo.name
+        d['folder_path'] = d.pop('uploaded_to')
+        d['folder_name'] = name
+        d['file_path'] = file_path
+
+    elif msg_type == MSG_TYPE_FILE_COMMENT:
+        repo = resolver.get_repo(d['repo_id'])
+        if repo is None or not resolver.file_exists(repo.id, d['file_path']):
+            return None
+        d['file_name'] = os.path.basename(d['file_path'])
+
+    if msg_type in NOTICE_USER_FIELDS:
+        user_key, prefix = NOTICE_USER_FIELDS[msg_type][:2]
+        d[prefix + 'email'] = d.pop(user_key)
+
+    return d
+
+def get_notice_details(notices):
+    """Return details of `notices` as ``{notice id: detail}``, None for a
+    notice referring to a deleted repo, group or file.
+
+    Details are cached per notice, those missed in cache are resolved with
+    each repo, group and file looked up once.
+    """
+    notices = [n for n in notices if n.msg_type in NOTICE_DETAIL_MSG_TYPES]
+    keys = dict((n.id, _get_notice_detail_cache_key(n.id)) for n in notices)
+    cached = cache.get_many(list(keys.values()))
+
+    details = {}
+    to_cache = {}
+    resolver = NoticeDetailResolver()
+    for notice in notices:
+        key = keys[notice.id]
+        if key in cached:
+            details[notice.id] = cached[key]['detail']
+            continue
+
+        try:
+            d = _resolve_notice_detail(notice, json.loads(notice.detail),
+                                       resolver)
+        except Exception as e:
+            logger.error(e)
+            continue
+
+        details[notice.id] = d
+        to_cache[key] = {'detail': d}
+
+    if to_cache:
+        cache.set_many(to_cache, NOTICE_DETAIL_CACHE_TIMEOUT)
+
+    return details
+
 def update_notice_detail(request, notices):
-    repo_dict = {}
+    details = get_notice_details(notices)
+
+    emails = set()
     for notice in notices:
-        if notice.is_repo_share_msg():
-            try:
-                d = json.loads(notice.detail)
-                repo_id = d['repo_id']
-                path = d.get('path', '/')
-                org_id = d.get('org_id', None)
-                if path == '/':
-                    repo = seafile_api.get_repo(repo_id)
-                else:
-                    if org_id:
-                        owner = seafile_api.get_org_repo_owner(repo_id)
-                        repo = seafile_api.get_org_virtual_repo(
-                            org_id, repo_id, path, owner)
-                    else:
-                        owner = seafile_api.get_repo_owner(repo_id)
-                        repo = seafile_api.get_virtual_repo(repo_id, path, owner)
-
-                if repo is None:
-                    notice.detail = None
-                else:
-                    d.pop('org_id', None)
-                    share_from_user_email = d.pop('share_from')
-                    url, is_default, date_uploaded = api_avatar_url(share_from_user_email, 32)
-                    d['repo_name'] = repo.name
-                    d['repo_id'] = repo.id
-                    d['share_from_user_name'] = email2nickname(share_from_user_email)
-                    d['share_from_user_email'] = share_from_user_email
-                    d['share_from_user_contact_email'] = email2contact_email(share_from_user_email)
-                    d['share_from_user_avatar_url'] = url
-                    notice.detail = d
-
-            except Exception as e:
-                logger.error(e)
-
-        elif notice.is_repo_share_to_group_msg():
-            try:
-                d = json.loads(notice.detail)
-                group_id = d['group_id']
-                path = d.get('path', '/')
-                org_id = d.get('org_id', None)
-                repo_id = d['repo_id']
-                group = ccnet_api.get_group(group_id)
-                if path == '/':
-                    repo = seafile_api.get_repo(repo_id)
-                else:
-                    if org_id:
-                        owner = seafile_api.get_org_repo_owner(repo_id)
-                        repo = seafile_api.get_org_virtual_repo(
-                            org_id, repo_id, path, owner)
-                    else:
-                        owner = seafile_api.get_repo_owner(repo_id)
-                        repo = seafile_api.get_virtual_repo(repo_id, path, owner)
-
-                if not repo or not group:
-                    notice.detail = None
-                else:
-                    d.pop('org_id', None)
-                    share_from_user_email = d.pop('share_from')
-                    url, is_default, date_uploaded = api_avatar_url(share_from_user_email, 32)
-                    d['share_from_user_name'] = email2nickname(share_from_user_email)
-                    d['share_from_user_email'] = share_from_user_email
-                    d['share_from_user_contact_email'] = email2contact_email(share_from_user_email)
-                    d['share_from_user_avatar_url'] = url
-                    d['repo_name'] = repo.name
-                    d['repo_id'] = repo.id
-                    d['group_name'] = group.group_name
-                    notice.detail = d
-
-            except Exception as e:
-                logger.error(e)
-
-        elif notice.is_add_user_to_group():
-            try:
-                d = json.loads(notice.detail)
-                group_id = d['group_id']
-                group = ccnet_api.get_group(group_id)
-                if group is None:
-                    notice.detail = None
-                else:
-                    group_staff_email = d.pop('group_staff')
-                    url, is_default, date_uploaded = api_avatar_url(group_staff_email, 32)
-                    d['group_staff_name'] = email2nickname(group_staff_email)
-                    d['group_staff_email'] = group_staff_email
-                    d['group_staff_contact_email'] = email2contact_email(group_staff_email)
-                    d['group_staff_avatar_url'] = url
-                    d['group_name'] = group.group_name
-
-                    notice.detail = d
-            except Exception as e:
-                logger.error(e)
-
-        elif notice.is_draft_comment_msg():
-            try:
-                d = json.loads(notice.detail)
-                author_email = d.pop('author')
-                url, is_default, date_uploaded = api_avatar_url(author_email, 32)
-                d['author_name'] = email2nickname(author_email)
-                d['author_email'] = author_email
-                d['author_context_email'] = email2contact_email(author_email)
-                d['author_avatar_url'] = url
-
-                notice.detail = d
-            except Exception as e:
-                logger.error(e)
-
-        elif notice.is_repo_transfer_msg():
-            try:
-                d = json.loads(notice.detail)
-                repo_id = d['repo_id']
-                repo = seafile_api.get_repo(repo_id)
-                if not repo:
-                    notice.detail = None
-                else:
-                    d.pop('org_id', None)
-                    repo_owner_email = d.pop('repo_owner')
-                    d['transfer_from_user_name'] = email2nickname(repo_owner_email)
-                    d['transfer_from_user_email'] = repo_owner_email
-                    d['transfer_from_user_contact_email'] = email2contact_email(repo_owner_email)
-                    url, is_default, date_uploaded = api_avatar_url(repo_owner_email, 32)
-                    d['transfer_from_user_avatar_url'] = url
-                    notice.detail = d
-
-            except Exception as e:
-                logger.error(e)
-
-        elif notice.is_draft_reviewer_msg():
-            try:
-                d = json.loads(notice.detail)
-                d.pop('to_user', None)
-                request_user_email = d.pop('from_user')
-                url, is_default, date_uploaded = api_avatar_url(request_user_email, 32)
-                d['request_user_name'] = email2nickname(request_user_email)
-                d['request_user_email'] = request_user_email
-                d['request_user_contact_email'] = email2contact_email(request_user_email)
-                d['request_user_avatat_url'] = url
-                notice.detail = d
-            except Exception as e:
-                logger.error(e)
-
-        elif notice.is_file_uploaded_msg():
-            try:
-                d = json.loads(notice.detail)
-                filename = d['file_name']
-                repo_id = d['repo_id']
-
-                if repo_id in repo_dict:
-                    repo = repo_dict[repo_id]
-                else:
-                    repo = seafile_api.get_repo(repo_id)
-                    repo_dict[repo_id] = repo
-
-                if repo:
-                    if d['uploaded_to'] == '/':
-                        # current upload path is '/'
-                        file_path = '/' + filename
-                        name = repo.name
-                    else:
-                        uploaded_to = d['uploaded_to'].rstrip('/')
-                        file_path = uploaded_to + '/' + filename
-                        name = os.path.basename(uploaded_to)
-
-                    d['repo_name'] = repo.name
-                    d['folder_path'] = d.pop('uploaded_to')
-                    d['folder_name'] = name
-                    d['file_path'] = file_path
-                    url, is_default, date_uploaded = api_avatar_url('', 32)
-                    d['uploaded_user_avatar_url'] = url
-                    notice.detail = d
-                else:
-                    notice.detail = None
+        d = details.get(notice.id)
+        if d and notice.msg_type in NOTICE_USER_FIELDS:
+            emails.add(d[NOTICE_USER_FIELDS[notice.msg_type][1] + 'email'])
+    user_infos = get_user_infos(emails, avatar_size=32)
+    default_avatar_url = None
 
-            except Exception as e:
-                logger.error(e)
+    for notice in notices:
+        if notice.id not in details:
+            continue
 
-        elif notice.is_file_comment_msg():
-            try:
-                d = json.loads(notice.detail)
+        d = details[notice.id]
+        if d is None:
+            notice.detail = None
+            continue
 
-                repo_id = d['repo_id']
-                file_path = d['file_path']
+        d = dict(d)
+        if notice.msg_type in NOTICE_USER_FIELDS:
+            user_key, prefix, contact_email_key, avatar_url_key = \
+                NOTICE_USER_FIELDS[notice.msg_type]
+            info = user_infos.get(d[prefix + 'email'])
+            if info is None:
+                # no email, not looked up
+                info = {'name': '', 'contact_email': '',
+                        'avatar_url': api_avatar_url('', 32)[0]}
+            d[prefix + 'name'] = info['name']
+            d[prefix + contact_email_key] = info['contact_email']
+            d[prefix + avatar_url_key] = info['avatar_url']
 
-                if repo_id in repo_dict:
-                    repo = repo_dict[repo_id]
-                else:
-                    repo = seafile_api.get_repo(repo_id)
-                    repo_dict[repo_id] = repo
+        elif notice.msg_type == MSG_TYPE_FILE_UPLOADED:
+            if default_avatar_url is None:
+                default_avatar_url = api_avatar_url('', 32)[0]
+            d['uploaded_user_avatar_url'] = default_avatar_url
 
-                if repo is None or not seafile_api.get_file_id_by_path(repo.id, file_path):
-                    notice.detail = None
-                else:
-                    author_email = d.pop('author')
-                    file_name = os.path.basename(file_path)
-                    url, is_default, date_uploaded = api_avatar_url(author_email, 32)
-                    d['author_avatar_url'] = url
-                    d['author_name'] = email2nickname(author_email)
-                    d['author_email'] = author_email
-                    d['author_contact_email'] = email2contact_email(author_email)
-                    d['file_name'] = file_name
-                    notice.detail = d
-            except Exception as e:
-                logger.error(e)
+        notice.detail = d
 
     return notices
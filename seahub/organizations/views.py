@@ -20,6 +20,7 @@ from seaserv import ccnet_api
 
 from seahub.auth import login
 from seahub.auth.decorators import login_required, login_required_ajax
+from seahub.auth.utils import clear_user_cache
 from seahub.base.accounts import User
 from seahub.group.views import remove_group_common
 from seahub.profile.models import Profile
@@ -38,7 +39,10 @@ logger = logging.getLogger(__name__)
 
 ########## ccnet rpc wrapper
 def create_org(org_name, url_prefix, creator):
-    return seaserv.create_org(org_name, url_prefix, creator)
+    ret = seaserv.create_org(org_name, url_prefix, creator)
+    # creator is added to the org
+    clear_user_cache(creator)
+    return ret
 
 def count_orgs():
     return seaserv.ccnet_threaded_rpc.count_orgs()
@@ -47,11 +51,15 @@ def get_org_by_url_prefix(url_prefix):
     return seaserv.ccnet_threaded_rpc.get_org_by_url_prefix(url_prefix)
 
 def set_org_user(org_id, username, is_staff=False):
-    return seaserv.ccnet_threaded_rpc.add_org_user(org_id, username,
-                                                   int(is_staff))
+    ret = seaserv.ccnet_threaded_rpc.add_org_user(org_id, username,
+                                                  int(is_staff))
+    clear_user_cache(username)
+    return ret
 
 def unset_org_user(org_id, username):
-    return seaserv.ccnet_threaded_rpc.remove_org_user(org_id, username)
+    ret = seaserv.ccnet_threaded_rpc.remove_org_user(org_id, username)
+    clear_user_cache(username)
+    return ret
 
 def org_user_exists(org_id, username):
     return seaserv.ccnet_threaded_rpc.org_user_exists(org_id, username)
@@ -8,8 +8,21 @@ from seahub.auth.signals import user_logged_in
 PASSWORD_HASH_KEY = getattr(settings, 'PASSWORD_SESSION_PASSWORD_HASH_KEY', 'password_session_password_hash_key')
 
 
+def has_usable_password(user):
+    """Returns False for LDAP/Shibboleth/SAML/... users"""
+    usable = getattr(user, '_cached_password_usable', None)
+    if usable is not None:
+        return usable
+    return user.enc_password != '!'
+
+
 def get_password_hash(user):
     """Returns a string of crypted password hash"""
+    # users from user cache carry the result, see `seahub.auth.utils`
+    password_hash = getattr(user, '_cached_password_session_hash', None)
+    if password_hash is not None:
+        return password_hash
+
     password = user.enc_password or ''
     return md5(
         md5(password.encode()).hexdigest().encode() + settings.SECRET_KEY.encode()
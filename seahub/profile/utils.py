@@ -40,3 +40,71 @@ def convert_contact_emails(in_list):
             ret.append(e)
 
     return ret
+
+def get_user_infos(emails, avatar_size=None):
+    """Return name and contact email of users, and avatar url if
+    `avatar_size` is given, as ``{email: {'name': .., 'contact_email': ..,
+    'avatar_url': ..}}``.
+
+    Same as calling `email2nickname`, `email2contact_email` and
+    `api_avatar_url` for every email, but with one cache round trip and at
+    most one database query for profiles and two for avatars missed in
+    cache. Empty emails are left out, see `get_empty_user_info`.
+    """
+    emails = set(e for e in emails if e)
+    if not emails:
+        return {}
+
+    nickname_keys = dict((e, normalize_cache_key(e, NICKNAME_CACHE_PREFIX))
+                         for e in emails)
+    contact_keys = dict((e, normalize_cache_key(e, CONTACT_CACHE_PREFIX))
+                        for e in emails)
+    cached = cache.get_many(list(nickname_keys.values()) +
+                            list(contact_keys.values()))
+
+    infos = {}
+    missed = set()
+    for e in emails:
+        nickname = (cached.get(nickname_keys[e]) or '').strip()
+        contact_email = cached.get(contact_keys[e]) or ''
+        if not nickname or not contact_email.strip():
+            missed.add(e)
+        infos[e] = {'name': nickname, 'contact_email': contact_email}
+
+    if missed:
+        profiles = dict((p.user, p) for p in
+                        Profile.objects.filter(user__in=missed))
+        to_cache = {}
+        for e in missed:
+            p = profiles.get(e)
+            if p and p.nickname and p.nickname.strip():
+                nickname = p.nickname.strip()
+            else:
+                nickname = e.split('@')[0]
+            contact_email = p.contact_email if p and p.contact_email else e
+
+            infos[e] = {'name': nickname, 'contact_email': contact_email}
+            to_cache[nickname_keys[e]] = nickname
+            to_cache[contact_keys[e]] = contact_email
+
+        # nickname and contact email share the timeout in default settings
+        cache.set_many(to_cache, min(NICKNAME_CACHE_TIMEOUT,
+                                     CONTACT_CACHE_TIMEOUT))
+
+    if avatar_size:
+        from seahub.avatar.templatetags.avatar_tags import api_avatar_urls
+        for e, (url, is_default, date_uploaded) in \
+                api_avatar_urls(emails, avatar_size).items():
+            infos[e]['avatar_url'] = url
+
+    return infos
+
+def get_empty_user_info(avatar_size=None):
+    """Info of a user left out by `get_user_infos`, i.e. of an empty email,
+    the same as `email2nickname` and friends return for it.
+    """
+    info = {'name': '', 'contact_email': ''}
+    if avatar_size:
+        from seahub.avatar.templatetags.avatar_tags import api_avatar_url
+        info['avatar_url'] = api_avatar_url('', avatar_size)[0]
+    return info
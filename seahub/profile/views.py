@@ -14,6 +14,7 @@ from seaserv import seafile_api
 from .forms import DetailedProfileForm
 from .models import Profile, DetailedProfile
 from seahub.auth.decorators import login_required
+from seahub.auth.utils import clear_user_cache
 from seahub.utils import is_org_context, is_pro_version, is_valid_username
 from seahub.base.accounts import User, UNUSABLE_PASSWORD
 from seahub.base.templatetags.seahub_tags import email2nickname
@@ -242,6 +243,7 @@ def delete_user_account(request):
     if is_org_context(request):
         org_id = request.user.org.org_id
         seaserv.ccnet_threaded_rpc.remove_org_user(org_id, username)
+        clear_user_cache(username)
 
     return HttpResponseRedirect(settings.LOGIN_URL)
 
@@ -8,8 +8,9 @@ from seaserv import seafile_api
 
 from seahub.base.models import UserStarredFiles
 from seahub.base.templatetags.seahub_tags import email2nickname, email2contact_email
-from seahub.settings import ENABLE_VIDEO_THUMBNAIL, THUMBNAIL_ROOT
-from seahub.thumbnail.utils import get_thumbnail_src
+from seahub.settings import ENABLE_VIDEO_THUMBNAIL
+from seahub.thumbnail.utils import get_thumbnail_src, \
+    get_file_ids_with_thumbnail
 from seahub.utils import is_pro_version, FILEEXT_TYPE_MAP, IMAGE, XMIND, VIDEO
 from seahub.utils.file_tags import get_files_tags_in_dir
 from seahub.utils.repo import is_group_repo_staff, is_repo_owner
@@ -148,6 +149,11 @@ def get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
             logger.error(e)
             files_tags_in_dir = {}
 
+        thumbnail_file_ids = set()
+        if with_thumbnail and not repo_obj.encrypted:
+            thumbnail_file_ids = get_file_ids_with_thumbnail(file_list,
+                                                             thumbnail_size)
+
         for dirent in file_list:
 
             file_name = dirent.obj_name
@@ -210,9 +216,7 @@ def get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
                     # if thumbnail has already been created, return its src.
                     # Then web browser will use this src to get thumbnail instead of
                     # recreating it.
-                    thumbnail_file_path = os.path.join(THUMBNAIL_ROOT,
-                            str(thumbnail_size), file_obj_id)
-                    if os.path.exists(thumbnail_file_path):
+                    if file_obj_id in thumbnail_file_ids:
                         src = get_thumbnail_src(repo_id, thumbnail_size, file_path)
                         file_info['encoded_thumbnail_src'] = urlquote(src)
 
@@ -29,3 +29,14 @@ class AdminRole(models.Model):
     role = models.CharField(max_length=255)
 
     objects = AdminRoleManager()
+
+
+########## signal handlers
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=AdminRole)
+@receiver(post_delete, sender=AdminRole)
+def clear_admin_user_cache(sender, instance, **kwargs):
+    from seahub.auth.utils import clear_user_cache
+    clear_user_cache(instance.email)
@@ -1,14 +1,17 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 
+import hashlib
 import logging
 import os
 
-from seahub.settings import EVENTS_CONFIG_FILE, CLOUD_MODE
+from django.core.cache import cache
+
+from seahub.settings import EVENTS_CONFIG_FILE, CLOUD_MODE, \
+    SEARCH_DIRENT_CACHE_TIMEOUT
 from seahub.utils.file_types import IMAGE, DOCUMENT, SPREADSHEET, SVG, PDF, \
         MARKDOWN, VIDEO, AUDIO, TEXT
 from seahub.utils import get_user_repos
-from seahub.base.templatetags.seahub_tags import email2nickname, \
-    email2contact_email
+from seahub.profile.utils import get_user_infos
 
 import seaserv
 from seaserv import seafile_api
@@ -19,6 +22,8 @@ from seafes import es_search
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+SEARCH_DIRENT_CACHE_PREFIX = 'search_dirent_'
+
 
 # Decoupled from saehub's variable
 SEARCH_FILEEXT = {
@@ -130,13 +135,77 @@ def get_search_repos_map(search_repo, username, org_id, shared_from, not_shared_
 
     return repo_id_map, repo_type_map
 
+def _get_dirent_cache_key(repo_id, commit_id, path):
+    value = '%s_%s_%s' % (repo_id, commit_id, path)
+    return SEARCH_DIRENT_CACHE_PREFIX + \
+        hashlib.md5(value.encode('utf-8')).hexdigest()
+
+def _get_head_commit_id(repo):
+    commit_id = getattr(repo, 'head_cmmt_id', None)
+    if not commit_id:
+        head_repo = seafile_api.get_repo(repo.id)
+        commit_id = head_repo.head_cmmt_id if head_repo else None
+    return commit_id
+
+def get_dirents_by_paths(repo_id, commit_id, paths):
+    """Return ``{path: {'last_modified_by': .., 'last_modified': ..,
+    'size': ..}}`` of `paths` in repo at `commit_id`, None for paths not
+    found.
+
+    Paths missed in cache are looked up with one `list_dir` per parent
+    directory.
+    """
+    keys = dict((p, _get_dirent_cache_key(repo_id, commit_id, p))
+                for p in set(paths))
+    cached = cache.get_many(list(keys.values()))
+
+    dirents = {}
+    names_by_parent = {}
+    for path, key in keys.items():
+        if key in cached:
+            dirents[path] = cached[key] or None
+        else:
+            parent_dir, name = os.path.split(path.rstrip('/'))
+            names_by_parent.setdefault(parent_dir, {})[name] = path
+
+    to_cache = {}
+    for parent_dir, names in names_by_parent.items():
+        try:
+            dirent_list = seafile_api.list_dir_by_commit_and_path(
+                repo_id, commit_id, parent_dir, -1, -1)
+        except Exception as e:
+            logger.error(e)
+            continue
+
+        found = dict((d.obj_name, d) for d in dirent_list or []
+                     if d.obj_name in names)
+        for name, path in names.items():
+            dirent = found.get(name)
+            if dirent:
+                info = {
+                    'last_modified_by': dirent.modifier,
+                    'last_modified': dirent.mtime,
+                    'size': dirent.size,
+                }
+            else:
+                # a commit never changes, not found is cached too
+                info = {}
+            dirents[path] = info or None
+            to_cache[keys[path]] = info
+
+    if to_cache:
+        cache.set_many(to_cache, SEARCH_DIRENT_CACHE_TIMEOUT)
+
+    return dirents
+
 def search_files(repos_map, search_path, keyword, obj_desc, start, size, org_id=None):
     # search file
     if len(repos_map) > 1:
         search_path = None
     files_found, total = es_search(repos_map, search_path, keyword, obj_desc, start, size)
 
-    result = []
+    hits = []
+    paths_by_repo = {}
     for f in files_found:
         repo = repos_map.get(f['repo_id'], None)
         if not repo:
@@ -150,36 +219,54 @@ def search_files(repos_map, search_path, keyword, obj_desc, start, size, org_id=
                 f['repo_id'] = repo.repo_id
                 f['fullpath'] = f['fullpath'].split(repo.origin_path)[-1]
 
+        hits.append((f, repo))
+        if f['fullpath'] != '/':
+            paths_by_repo.setdefault(f['repo_id'], (repo, []))[1].append(
+                f['fullpath'])
+
+    # if match multiple files, keep the lookup only once.
+    repos = dict((repo.id, repo) for f, repo in hits)
+    for repo in repos.values():
         if not repo.owner:
             if org_id:
                 repo.owner = seafile_api.get_org_repo_owner(repo.id)
             else:
                 repo.owner = seafile_api.get_repo_owner(repo.id)
+    user_infos = get_user_infos([r.owner for r in repos.values()])
+
+    dirents = {}
+    for repo_id, (repo, paths) in paths_by_repo.items():
+        try:
+            commit_id = _get_head_commit_id(repo)
+        except Exception as e:
+            logger.error(e)
+            continue
+        if not commit_id:
+            continue
 
-        # if match multiple files, keep the lookup only once.
-        if not hasattr(repo, 'owner_nickname') or not repo.owner_nickname:
-            repo.owner_nickname = email2nickname(repo.owner)
+        for path, dirent in get_dirents_by_paths(repo_id, commit_id,
+                                                 paths).items():
+            dirents[(repo_id, path)] = dirent
 
-        if not hasattr(repo, 'owner_contact_email') or not repo.owner_contact_email:
-            repo.owner_contact_email = email2contact_email(repo.owner)
+    result = []
+    for f, repo in hits:
+        owner_info = user_infos.get(repo.owner, {})
+        if not getattr(repo, 'owner_nickname', None):
+            repo.owner_nickname = owner_info.get('name', '')
+
+        if not getattr(repo, 'owner_contact_email', None):
+            repo.owner_contact_email = owner_info.get('contact_email', '')
 
         if f['fullpath'] == '/':
             f['last_modified_by'] = repo.last_modifier
             f['last_modified'] = repo.last_modify
             f['size'] = repo.size
         else:
-            try:
-                dirent = seafile_api.get_dirent_by_path(f['repo_id'], f['fullpath'])
-            except Exception as e:
-                logger.error(e)
-                continue
-
+            dirent = dirents.get((f['repo_id'], f['fullpath']))
             if not dirent:
                 continue
 
-            f['last_modified_by'] = dirent.modifier
-            f['last_modified'] = dirent.mtime
-            f['size'] = dirent.size
+            f.update(dirent)
 
         f['repo'] = repo
         f['repo_name'] = repo.name
@@ -463,6 +463,14 @@ TEXT_PREVIEW_EXT = """ac, am, bat, c, cc, cmake, cpp, cs, css, diff, el, h, html
 
 # Common settings(file extension, storage) for avatar and group avatar.
 AVATAR_FILE_STORAGE = '' # Replace with 'seahub.base.database_storage.DatabaseStorage' if save avatar files to database
+# Store avatar files in database as binary instead of base64, the `data`
+# column of `avatar_uploaded` table must be a blob, e.g. on MySQL:
+# ALTER TABLE `avatar_uploaded` MODIFY `data` MEDIUMBLOB NOT NULL;
+AVATAR_FILE_STORAGE_BINARY = False
+# Bytes of avatar files stored in database kept in memory of each process,
+# and seconds before they are checked against cache again.
+IMAGE_VIEW_MEMORY_CACHE_BYTES = 16 * 1024 * 1024
+IMAGE_VIEW_MEMORY_CACHE_TIMEOUT = 60
 AVATAR_ALLOWED_FILE_EXTS = ('.jpg', '.png', '.jpeg', '.gif')
 # Avatar
 AVATAR_STORAGE_DIR = 'avatars'
@@ -485,11 +493,27 @@ install_topdir = os.path.expanduser(os.path.join(os.path.dirname(__file__), '..'
 central_conf_dir = os.environ.get('SEAFILE_CENTRAL_CONF_DIR', '')
 
 CACHES = {
+    # Recently used entries are kept in memory of each process for a short
+    # time, in front of a sqlite database shared by all processes.
     'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': os.path.join(CACHE_DIR, 'seahub_cache'),
+        'BACKEND': 'seahub.base.cache.TieredCache',
         'OPTIONS': {
-            'MAX_ENTRIES': 1000000
+            'SHARED': {
+                'BACKEND': 'seahub.base.cache.SQLiteCache',
+                'LOCATION': os.path.join(CACHE_DIR, 'seahub_cache.db'),
+                'OPTIONS': {
+                    'MAX_ENTRIES': 1000000
+                }
+            },
+            'LOCAL_MAX_ENTRIES': 10000,
+            'LOCAL_TIMEOUT': 30,
+            # write-mostly keys kept in the shared cache only: api throttle
+            # buckets, login attempts, unseen notification counts, trusted
+            # ip version and device access info
+            'SHARED_ONLY_KEY_PREFIXES': [
+                'throttle_', 'UserLoginAttempt_', 'USER_NOTIFICATION_COUNT_',
+                'TRUSTED_IP_VERSION', 'ApiTokenAccess_',
+            ],
         }
     },
 
@@ -681,6 +705,25 @@ LOGIN_ATTEMPT_LIMIT = 5
 LOGIN_ATTEMPT_TIMEOUT = 15 * 60 # in seconds (default: 15 minutes)
 FREEZE_USER_ON_LOGIN_FAILED = False # deactivate user account when login attempts exceed limit
 
+# Seconds to cache users authenticated by session, 0 to disable.
+# Changes of org membership show up after this at the latest.
+USER_CACHE_TIMEOUT = 60
+
+# Seconds to cache api tokens, and interval of writing last access time,
+# ip and client version of devices to database.
+API_TOKEN_CACHE_TIMEOUT = 10 * 60
+API_TOKEN_FLUSH_INTERVAL = 60
+
+# Seconds to cache dir listings by dir id. Dirents of a dir id never change,
+# starred items, tags and names of users are read on every request. Locks and
+# permissions of pro edition come only with dirents, so pro edition still
+# lists the dir on every request and the cache mostly helps community edition.
+DIR_LISTING_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Seconds to cache modifier, mtime and size of search results by commit id of
+# their repo, a commit never changes.
+SEARCH_DIRENT_CACHE_TIMEOUT = 24 * 60 * 60
+
 # Age of cookie, in seconds (default: 1 day).
 SESSION_COOKIE_AGE = 24 * 60 * 60
 
@@ -716,6 +759,25 @@ THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT = 256
 # video thumbnails
 ENABLE_VIDEO_THUMBNAIL = False
 THUMBNAIL_VIDEO_FRAME_TIME = 5  # use the frame at 5 second as thumbnail
+THUMBNAIL_VIDEO_TIMEOUT = 30  # seconds, ffmpeg is killed after it
+THUMBNAIL_VIDEO_WORKERS = 2  # max ffmpeg processes per seahub process
+
+# thumbnail pre-generation, see `manage.py pregenerate_thumbnails`
+THUMBNAIL_PREGENERATE_SIZES = [THUMBNAIL_DEFAULT_SIZE, THUMBNAIL_SIZE_FOR_GRID,
+                               THUMBNAIL_SIZE_FOR_ORIGINAL]
+THUMBNAIL_PREGENERATE_WORKERS = 4
+
+# seconds to remember a failed thumbnail generation, so it is not retried on
+# every request, for bad files (too large, corrupt, unsupported) and for
+# other errors (fileserver unreachable, ffmpeg failed, ...)
+THUMBNAIL_FAILURE_CACHE_TIMEOUT = 24 * 60 * 60
+THUMBNAIL_FAILURE_CACHE_TIMEOUT_TRANSIENT = 5 * 60
+
+# thumbnail store size limit, see `manage.py evict_thumbnails`
+THUMBNAIL_STORE_MAX_BYTES = 0  # in bytes, 0 means no limit
+THUMBNAIL_STORE_MAX_AGE = 0  # days since last access, 0 means no limit
+# access time of a thumbnail is updated at most once per this many seconds
+THUMBNAIL_ACCESS_TIME_RESOLUTION = 60 * 60
 
 # template for create new office file
 OFFICE_TEMPLATE_ROOT = os.path.join(MEDIA_ROOT, 'office-template')
@@ -0,0 +1,201 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Index of existing thumbnails, so directory listings can tell which images
+have a thumbnail without one `stat` per image.
+
+For every size there is an append-only file ``THUMBNAIL_ROOT/index/<size>``
+with one file id per line, shared by all processes. Each process loads it
+into a bloom filter and afterwards only reads what other processes have
+appended since. The file is rewritten (new inode) when thumbnails are
+evicted, which makes every process reload it.
+
+Index files are only written from scratch by ``rebuild_thumbnail_indexes``
+and ``evict_thumbnails``, as that walks the whole store. Until then web
+processes look up thumbnails in the store one by one.
+
+A false positive only makes the client fetch a thumbnail that is then
+generated on demand, a false negative makes it ask for creation of one that
+already exists, so the index never needs to be exact.
+"""
+import os
+import math
+import fcntl
+import hashlib
+import logging
+import threading
+
+from seahub.settings import THUMBNAIL_ROOT
+from seahub.thumbnail.store import iter_size_thumbnails, thumbnail_exists
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.path.join(THUMBNAIL_ROOT, 'index')
+
+# bytes of one line in index file, a sha1 hex and the newline
+LINE_LENGTH = 41
+
+
+class BloomFilter(object):
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1024)
+        self.num_bits = int(math.ceil(
+            -self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, int(round(
+            self.num_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # file ids are sha1 hex, already uniformly distributed
+        try:
+            h1 = int(key[:16], 16)
+            h2 = int(key[16:32], 16) | 1
+        except ValueError:
+            digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+            h1 = int(digest[:16], 16)
+            h2 = int(digest[16:32], 16) | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7))
+                   for pos in self._positions(key))
+
+
+class ThumbnailIndex(object):
+
+    def __init__(self, size):
+        self.size = size
+        self.path = os.path.join(INDEX_DIR, str(size))
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._ino = None
+        self._offset = 0
+
+    def _load(self, st):
+        self._bloom = BloomFilter(2 * st.st_size // LINE_LENGTH)
+        self._ino = st.st_ino
+        self._offset = 0
+        self._read_new_lines()
+
+    def _read_new_lines(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+
+        # a line may still be half written by another process
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].split():
+            self._bloom.add(line.decode('ascii', 'ignore'))
+        self._offset += end
+
+    def _refresh(self):
+        """Bring the bloom filter up to date with the index file.
+
+        Return False if there is no index file yet.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self._bloom = None
+            return False
+
+        if self._bloom is None or st.st_ino != self._ino or \
+                st.st_size < self._offset:
+            self._load(st)
+        elif st.st_size > self._offset:
+            self._read_new_lines()
+
+        if self._bloom.count > self._bloom.capacity:
+            # too crowded, false positive rate goes up, reload bigger
+            self._load(st)
+        return True
+
+    def rebuild(self, blocking=True):
+        """Write the index file again from what is in the store.
+
+        Only one process rebuilds an index at a time, with `blocking` False
+        return at once if another process is doing it.
+        """
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        with open(self.path + '.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX |
+                            (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return
+
+            tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                for entry in iter_size_thumbnails(self.size):
+                    f.write(entry.name + '\n')
+            os.replace(tmp_path, self.path)
+
+    def filter_existing(self, file_ids):
+        """Return the subset of `file_ids` which have a thumbnail.
+        """
+        with self._lock:
+            if self._refresh():
+                bloom = self._bloom
+                return {file_id for file_id in file_ids if file_id in bloom}
+
+        return {file_id for file_id in file_ids
+                if thumbnail_exists(file_id, self.size)}
+
+    def add(self, file_ids):
+        """Record new thumbnails, do nothing if there is no index file yet,
+        it will be built with them from the store.
+        """
+        with self._lock:
+            if not self._refresh():
+                return
+
+            new_ids = [file_id for file_id in file_ids
+                       if file_id not in self._bloom]
+            if not new_ids:
+                return
+
+            # appends of a few lines are atomic with O_APPEND
+            with open(self.path, 'a') as f:
+                f.write(''.join(file_id + '\n' for file_id in new_ids))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_thumbnail_index(size):
+    size = int(size)
+    with _indexes_lock:
+        if size not in _indexes:
+            _indexes[size] = ThumbnailIndex(size)
+        return _indexes[size]
+
+def get_existing_thumbnails(file_ids, size):
+    """Return the subset of `file_ids` which have a thumbnail of `size`.
+    """
+    file_ids = set(file_ids)
+    if not file_ids:
+        return set()
+    return get_thumbnail_index(size).filter_existing(file_ids)
+
+def add_to_thumbnail_index(file_id, sizes):
+    for size in sizes:
+        try:
+            get_thumbnail_index(size).add([file_id])
+        except Exception as e:
+            logger.error(e)
+
+def rebuild_thumbnail_indexes():
+    try:
+        size_entries = list(os.scandir(THUMBNAIL_ROOT))
+    except OSError:
+        return
+
+    for size_entry in size_entries:
+        if size_entry.name.isdigit() and size_entry.is_dir():
+            get_thumbnail_index(size_entry.name).rebuild()
@@ -0,0 +1,146 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+import os
+import re
+import shutil
+import resource
+import tempfile
+import threading
+import multiprocessing
+import urllib.request
+from io import BytesIO
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from django.core.management.base import BaseCommand
+
+from seahub.thumbnail.utils import _create_thumbnail_common
+from seahub.utils.ranged_file import open_ranged_url
+
+class _RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Serve local files and honour single ``bytes=start-[end]`` ranges, like
+    the fileserver does.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        range_header = self.headers.get('Range')
+        m = re.match(r'bytes=(\d+)-(\d*)$', range_header or '')
+        if not m:
+            return super(_RangeRequestHandler, self).send_head()
+
+        path = self.translate_path(self.path)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404)
+            return None
+
+        size = os.fstat(f.fileno()).st_size
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else size - 1
+        end = min(end, size - 1)
+        if start >= size:
+            f.close()
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */%d' % size)
+            self.end_headers()
+            return None
+
+        f.seek(start)
+        self._remaining = end - start + 1
+        self.send_response(206)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, size))
+        self.send_header('Content-Length', str(self._remaining))
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, '_remaining', None)
+        if remaining is None:
+            return super(_RangeRequestHandler, self).copyfile(source, outputfile)
+
+        try:
+            while remaining > 0:
+                data = source.read(min(remaining, 64 * 1024))
+                if not data:
+                    break
+                outputfile.write(data)
+                remaining -= len(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # client closed the connection after reading what it needs
+            pass
+        finally:
+            self._remaining = None
+
+def _max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _run_one(mode, url, size, output, queue):
+    rss_before = _max_rss_kb()
+    try:
+        if mode == 'buffered':
+            f = BytesIO(urllib.request.urlopen(url).read())
+        else:
+            f = open_ranged_url(url)
+
+        success, status_code = _create_thumbnail_common(f, output, size)
+        f.close()
+    except Exception as e:
+        success, status_code = False, e
+    queue.put((success, status_code, rss_before, _max_rss_kb()))
+
+class Command(BaseCommand):
+    help = "Measure peak RSS of generating a thumbnail from local image " \
+        "files, with the original fully buffered in memory and streamed " \
+        "with range requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='image files')
+        parser.add_argument('--size', type=int, default=1024,
+                            help='thumbnail size, default 1024')
+
+    def handle(self, *args, **options):
+        size = options['size']
+        files = [os.path.abspath(f) for f in options['files']]
+
+        serve_dir = tempfile.mkdtemp()
+        output_dir = tempfile.mkdtemp()
+        for index, path in enumerate(files):
+            os.symlink(path, os.path.join(serve_dir, str(index)))
+
+        handler = lambda *a, **kw: _RangeRequestHandler(*a, directory=serve_dir, **kw)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = 'http://127.0.0.1:%d' % server.server_address[1]
+
+        # fork, so every measurement starts from the same resident set
+        ctx = multiprocessing.get_context('fork')
+        self.stdout.write('%-40s %10s %16s %16s' % (
+            'file', 'size(MB)', 'buffered(MB)', 'streamed(MB)'))
+        try:
+            for index, path in enumerate(files):
+                peaks = []
+                for mode in ('buffered', 'streamed'):
+                    queue = ctx.Queue()
+                    output = os.path.join(output_dir, '%d-%s' % (index, mode))
+                    p = ctx.Process(target=_run_one, args=(
+                        mode, '%s/%d' % (base_url, index), size, output, queue))
+                    p.start()
+                    success, status_code, rss_before, rss_after = queue.get()
+                    p.join()
+                    if not success:
+                        peaks.append('failed(%s)' % status_code)
+                    else:
+                        peaks.append('%.1f' % ((rss_after - rss_before) / 1024.0))
+
+                self.stdout.write('%-40s %10.1f %16s %16s' % (
+                    os.path.basename(path)[:40],
+                    os.path.getsize(path) / 1024.0 / 1024,
+                    peaks[0], peaks[1]))
+        finally:
+            server.shutdown()
+            shutil.rmtree(serve_dir, ignore_errors=True)
+            shutil.rmtree(output_dir, ignore_errors=True)
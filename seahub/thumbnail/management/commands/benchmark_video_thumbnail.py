@@ -0,0 +1,97 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+import timeit
+from io import BytesIO
+from http.server import ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from seahub.settings import THUMBNAIL_VIDEO_FRAME_TIME, THUMBNAIL_VIDEO_TIMEOUT
+from seahub.thumbnail.utils import _create_thumbnail_common, \
+    extract_video_frame
+from seahub.thumbnail.management.commands.benchmark_thumbnail_memory import \
+    _RangeRequestHandler
+
+def _run_tmp_png(url, size, output, tmp_dir):
+    """Previous way: decode to the exact time, write a png to a temp file and
+    open it again with PIL.
+    """
+    tmp_path = os.path.join(tmp_dir, 'frame.png')
+    subprocess.run(['ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+                    '-ss', str(THUMBNAIL_VIDEO_FRAME_TIME), '-i', url,
+                    '-vframes', '1', tmp_path],
+                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                   timeout=THUMBNAIL_VIDEO_TIMEOUT, check=True)
+    ret = _create_thumbnail_common(tmp_path, output, size)
+    os.unlink(tmp_path)
+    return ret
+
+def _run_pipe(url, size, output, tmp_dir):
+    frame = extract_video_frame(url, THUMBNAIL_VIDEO_FRAME_TIME, size,
+                                THUMBNAIL_VIDEO_TIMEOUT)
+    return _create_thumbnail_common(BytesIO(frame), output, size)
+
+class Command(BaseCommand):
+    help = "Compare time of creating a video thumbnail through a temporary " \
+        "png file and through a keyframe piped from ffmpeg."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='video files')
+        parser.add_argument('--size', type=int, default=192,
+                            help='thumbnail size, default 192')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='runs per file and method, default 3')
+
+    def handle(self, *args, **options):
+        size = options['size']
+        files = [os.path.abspath(f) for f in options['files']]
+
+        serve_dir = tempfile.mkdtemp()
+        tmp_dir = tempfile.mkdtemp()
+        for index, path in enumerate(files):
+            os.symlink(path, os.path.join(serve_dir, str(index)))
+
+        # serve videos over http with range support, like the fileserver
+        handler = lambda *a, **kw: _RangeRequestHandler(*a, directory=serve_dir, **kw)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = 'http://127.0.0.1:%d' % server.server_address[1]
+
+        self.stdout.write('%-40s %10s %14s %14s' % (
+            'file', 'size(MB)', 'tmp png(s)', 'pipe(s)'))
+        try:
+            for index, path in enumerate(files):
+                url = '%s/%d' % (base_url, index)
+                output = os.path.join(tmp_dir, 'thumbnail')
+                results = []
+                for func in (_run_tmp_png, _run_pipe):
+                    timings = []
+                    for i in range(max(1, options['repeat'])):
+                        t1 = timeit.default_timer()
+                        try:
+                            success, status_code = func(url, size, output, tmp_dir)
+                        except Exception as e:
+                            success, status_code = False, e
+                        if not success:
+                            break
+                        timings.append(timeit.default_timer() - t1)
+
+                    if success:
+                        results.append('%.3f' % sorted(timings)[len(timings) // 2])
+                    else:
+                        results.append('failed')
+                        self.stderr.write('%s: %s' % (func.__name__, status_code))
+
+                self.stdout.write('%-40s %10.1f %14s %14s' % (
+                    os.path.basename(path)[:40],
+                    os.path.getsize(path) / 1024.0 / 1024,
+                    results[0], results[1]))
+        finally:
+            server.shutdown()
+            shutil.rmtree(serve_dir, ignore_errors=True)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,47 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from seahub.settings import THUMBNAIL_STORE_MAX_BYTES, THUMBNAIL_STORE_MAX_AGE
+from seahub.thumbnail.store import evict_thumbnails, migrate_legacy_thumbnails
+from seahub.thumbnail.index import rebuild_thumbnail_indexes
+
+class Command(BaseCommand):
+    help = "Remove least recently used thumbnails, to keep the thumbnail " \
+        "store under THUMBNAIL_STORE_MAX_BYTES and THUMBNAIL_STORE_MAX_AGE."
+    label = "evict_thumbnails"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-bytes', type=int,
+                            default=THUMBNAIL_STORE_MAX_BYTES,
+                            help='byte budget of the store, 0 means no limit')
+        parser.add_argument('--max-age', type=int,
+                            default=THUMBNAIL_STORE_MAX_AGE,
+                            help='days since last access, 0 means no limit')
+        parser.add_argument('--limit', type=int, default=0,
+                            help='remove at most this many thumbnails per run')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only report what would be removed')
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            moved = migrate_legacy_thumbnails()
+            if moved:
+                self.stdout.write('[%s] Moved %d thumbnails to the sharded '
+                                  'layout\n' % (datetime.now(), moved))
+
+        total_bytes, removed_count, removed_bytes = evict_thumbnails(
+            options['max_bytes'], options['max_age'] * 24 * 60 * 60,
+            limit=options['limit'], dry_run=options['dry_run'])
+
+        if not options['dry_run']:
+            # drop evicted thumbnails from the indexes
+            rebuild_thumbnail_indexes()
+
+        self.stdout.write('[%s] Thumbnail store uses %d bytes, %s %d '
+                          'thumbnails (%d bytes)\n' % (
+                              datetime.now(), total_bytes,
+                              'would remove' if options['dry_run'] else 'removed',
+                              removed_count, removed_bytes))
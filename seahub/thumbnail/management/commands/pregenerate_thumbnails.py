@@ -0,0 +1,159 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+import os
+import stat
+import time
+import logging
+import posixpath
+import multiprocessing
+from collections import deque
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seaserv import seafile_api
+
+from seahub.settings import THUMBNAIL_IMAGE_SIZE_LIMIT, \
+    THUMBNAIL_PREGENERATE_SIZES, THUMBNAIL_PREGENERATE_WORKERS
+from seahub.thumbnail.models import ThumbnailTask
+from seahub.thumbnail.store import thumbnail_exists
+from seahub.thumbnail.utils import pregenerate_thumbnails
+from seahub.utils import gen_inner_file_get_url, get_file_type_and_ext, \
+    normalize_dir_path
+from seahub.utils.file_types import IMAGE
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _run_task(args):
+    file_id, inner_path, sizes = args
+    success, status_code = pregenerate_thumbnails(inner_path, file_id, sizes)
+    return file_id, success, status_code
+
+
+def walk_repo_images(repo_id, path, sizes):
+    """Breadth-first walk of `path`, yield ``(repo_id, path, file_id)`` of
+    every image which misses thumbnail of any size, once per file id.
+    """
+    seen_file_ids = set()
+    dirs = deque([path])
+    while dirs:
+        parent_dir = dirs.popleft()
+        dirents = seafile_api.list_dir_by_path(repo_id, parent_dir) or []
+        for dirent in dirents:
+            dirent_path = posixpath.join(parent_dir, dirent.obj_name)
+            if stat.S_ISDIR(dirent.mode):
+                dirs.append(dirent_path)
+                continue
+
+            filetype, fileext = get_file_type_and_ext(dirent.obj_name)
+            if filetype != IMAGE or fileext.lower() == 'psd':
+                continue
+
+            if dirent.size > THUMBNAIL_IMAGE_SIZE_LIMIT * 1024**2:
+                continue
+
+            if dirent.obj_id in seen_file_ids:
+                continue
+            seen_file_ids.add(dirent.obj_id)
+
+            if all(thumbnail_exists(dirent.obj_id, size) for size in sizes):
+                continue
+
+            yield (repo_id, dirent_path, dirent.obj_id)
+
+
+class Command(BaseCommand):
+    help = "Queue the images of a library or folder, and pre-generate " \
+        "thumbnails of all configured sizes for every queued image."
+    label = "pregenerate_thumbnails"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repo-id', help='library to queue images from')
+        parser.add_argument('--path', default='/',
+                            help='folder to queue images from, default "/"')
+        parser.add_argument('--workers', type=int,
+                            default=THUMBNAIL_PREGENERATE_WORKERS,
+                            help='number of worker processes')
+        parser.add_argument('--no-process', action='store_true',
+                            help='only queue images, do not generate thumbnails')
+
+    def handle(self, *args, **options):
+        sizes = sorted(set(int(s) for s in THUMBNAIL_PREGENERATE_SIZES))
+        if not sizes:
+            raise CommandError('THUMBNAIL_PREGENERATE_SIZES is empty.')
+
+        repo_id = options['repo_id']
+        if repo_id:
+            self.enqueue(repo_id, normalize_dir_path(options['path']), sizes)
+
+        if not options['no_process']:
+            self.process(sizes, max(1, options['workers']))
+
+    def enqueue(self, repo_id, path, sizes):
+        repo = seafile_api.get_repo(repo_id)
+        if not repo:
+            raise CommandError('Library %s not found.' % repo_id)
+
+        if repo.encrypted:
+            raise CommandError('Library %s is encrypted.' % repo_id)
+
+        if not seafile_api.get_dir_id_by_path(repo_id, path):
+            raise CommandError('Folder %s not found.' % path)
+
+        tasks = []
+        count = 0
+        for task in walk_repo_images(repo_id, path, sizes):
+            tasks.append(task)
+            if len(tasks) >= BATCH_SIZE:
+                ThumbnailTask.objects.add_tasks(tasks)
+                count += len(tasks)
+                tasks = []
+
+        ThumbnailTask.objects.add_tasks(tasks)
+        count += len(tasks)
+        self.stdout.write('[%s] Queued %d images of %s:%s\n' %
+                          (datetime.now(), count, repo_id, path))
+
+    def _gen_jobs(self, tasks, sizes):
+        for task in tasks:
+            token = seafile_api.get_fileserver_access_token(task.repo_id,
+                    task.file_id, 'view', '', use_onetime=False)
+            if not token:
+                logger.warning('Failed to get fileserver token of %s:%s' %
+                               (task.repo_id, task.path))
+                continue
+
+            inner_path = gen_inner_file_get_url(token,
+                                                os.path.basename(task.path))
+            yield (task.file_id, inner_path, sizes)
+
+    def process(self, sizes, workers):
+        # seafile rpc and database are only used in this process, workers
+        # just download images from fileserver and write thumbnails
+        succeeded = failed = 0
+        start = time.time()
+        with multiprocessing.Pool(workers) as pool:
+            while True:
+                tasks = ThumbnailTask.objects.get_pending_tasks(BATCH_SIZE)
+                if not tasks:
+                    break
+
+                for file_id, success, status_code in pool.imap_unordered(
+                        _run_task, self._gen_jobs(tasks, sizes)):
+                    if success:
+                        succeeded += 1
+                    else:
+                        failed += 1
+                        logger.warning('Failed to generate thumbnails of %s: %s' %
+                                       (file_id, status_code))
+
+                # failed images are dropped too, they would fail again
+                ThumbnailTask.objects.filter(
+                    id__in=[task.id for task in tasks]).delete()
+
+        self.stdout.write('[%s] Generated thumbnails of %d images, %d failed, '
+                          'takes %.1fs\n' % (datetime.now(), succeeded, failed,
+                                             time.time() - start))
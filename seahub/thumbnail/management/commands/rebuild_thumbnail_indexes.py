@@ -0,0 +1,16 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from seahub.thumbnail.index import rebuild_thumbnail_indexes
+
+class Command(BaseCommand):
+    help = "Build the indexes of existing thumbnails from the thumbnail " \
+        "store, run once after upgrade or when an index file is lost."
+    label = "rebuild_thumbnail_indexes"
+
+    def handle(self, *args, **options):
+        rebuild_thumbnail_indexes()
+        self.stdout.write('[%s] Rebuilt thumbnail indexes\n' % datetime.now())
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('repo_id', models.CharField(db_index=True, max_length=36)),
+                ('path', models.TextField()),
+                ('file_id', models.CharField(max_length=40, unique=True)),
+                ('ctime', models.DateTimeField(default=datetime.datetime.now)),
+            ],
+            options={
+                'db_table': 'thumbnail_task',
+            },
+        ),
+    ]
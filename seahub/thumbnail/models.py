@@ -1,4 +1,48 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
+import logging
+import datetime
+
 from django.db import models
+from django.dispatch import receiver
+
+from seahub.signals import repo_deleted
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailTaskManager(models.Manager):
+
+    def add_tasks(self, tasks):
+        """Queue ``(repo_id, path, file_id)`` tuples for thumbnail
+        pre-generation. Files already in the queue are ignored.
+        """
+        objs = [self.model(repo_id=repo_id, path=path, file_id=file_id)
+                for repo_id, path, file_id in tasks]
+        self.bulk_create(objs, ignore_conflicts=True)
+
+    def get_pending_tasks(self, limit):
+        return list(self.all().order_by('id')[:limit])
+
+
+class ThumbnailTask(models.Model):
+    """A file waiting for its thumbnails to be pre-generated.
+    """
+    repo_id = models.CharField(max_length=36, db_index=True)
+    path = models.TextField()
+    file_id = models.CharField(max_length=40, unique=True)
+    ctime = models.DateTimeField(default=datetime.datetime.now)
+
+    objects = ThumbnailTaskManager()
+
+    class Meta:
+        db_table = 'thumbnail_task'
+
 
-# Create your models here.
+###### signal handlers
+@receiver(repo_deleted)
+def remove_repo_thumbnail_tasks(sender, **kwargs):
+    repo_id = kwargs['repo_id']
+    try:
+        ThumbnailTask.objects.filter(repo_id=repo_id).delete()
+    except Exception as e:
+        logger.error(e)
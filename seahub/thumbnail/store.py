@@ -0,0 +1,213 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Thumbnail store on local file system.
+
+Thumbnails live in ``THUMBNAIL_ROOT/<size>/<xx>/<yy>/<file_id>``, where ``xx``
+and ``yy`` are the first two bytes of the (sha1) file id, so no directory
+grows beyond a few hundred entries. Thumbnails of the old flat layout,
+``THUMBNAIL_ROOT/<size>/<file_id>``, are moved into their shard folder when
+they are first looked up, or all at once by ``evict_thumbnails``.
+
+The access time of a thumbnail is refreshed when it is served, at most once
+per ``THUMBNAIL_ACCESS_TIME_RESOLUTION`` seconds, and `evict_thumbnails`
+drops the least recently used ones to keep the store under a byte budget.
+"""
+import os
+import time
+import logging
+
+from seahub.settings import THUMBNAIL_ROOT, THUMBNAIL_ACCESS_TIME_RESOLUTION
+
+logger = logging.getLogger(__name__)
+
+# thumbnails are only evicted down to this fraction of the budget, so
+# eviction does not run again right after the store is refilled a little
+EVICT_LOW_WATERMARK = 0.9
+
+
+def get_thumbnail_path(file_id, size):
+    return os.path.join(THUMBNAIL_ROOT, str(size), file_id[:2], file_id[2:4],
+                        file_id)
+
+def get_legacy_thumbnail_path(file_id, size):
+    """Path of thumbnails created before the store was sharded.
+    """
+    return os.path.join(THUMBNAIL_ROOT, str(size), file_id)
+
+def prepare_thumbnail_path(file_id, size):
+    """Return the path to write a thumbnail to, create its folder if needed.
+    """
+    path = get_thumbnail_path(file_id, size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def _migrate_legacy_thumbnail(file_id, size):
+    """Move a thumbnail of the old flat layout into its shard folder.
+
+    Return True if it is moved.
+    """
+    legacy_path = get_legacy_thumbnail_path(file_id, size)
+    if not os.path.isfile(legacy_path):
+        return False
+
+    try:
+        os.rename(legacy_path, prepare_thumbnail_path(file_id, size))
+    except OSError:
+        # moved by another process meanwhile
+        return os.path.exists(get_thumbnail_path(file_id, size))
+    return True
+
+def thumbnail_exists(file_id, size):
+    if os.path.exists(get_thumbnail_path(file_id, size)):
+        return True
+    return _migrate_legacy_thumbnail(file_id, size)
+
+def read_thumbnail(file_id, size):
+    """Return content of a thumbnail and record the access.
+
+    Raise `IOError` if the thumbnail does not exist.
+    """
+    path = get_thumbnail_path(file_id, size)
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        if not _migrate_legacy_thumbnail(file_id, size):
+            raise
+        f = open(path, 'rb')
+
+    with f:
+        content = f.read()
+        st = os.fstat(f.fileno())
+
+    # set atime explicitly, it works on `noatime` and `relatime` mounts too,
+    # mtime is kept since it is used as Last-Modified of thumbnail
+    now = time.time()
+    if now - st.st_atime > THUMBNAIL_ACCESS_TIME_RESOLUTION:
+        try:
+            os.utime(path, (now, st.st_mtime))
+        except OSError as e:
+            logger.warning(e)
+
+    return content
+
+def _iter_dir_files(path):
+    stack = [path]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+def iter_size_thumbnails(size):
+    """Yield `os.DirEntry` of every thumbnail of `size` in the store.
+    """
+    yield from _iter_dir_files(os.path.join(THUMBNAIL_ROOT, str(size)))
+
+def iter_thumbnails():
+    """Yield `os.DirEntry` of every thumbnail in the store.
+    """
+    try:
+        size_entries = list(os.scandir(THUMBNAIL_ROOT))
+    except OSError:
+        return
+
+    for size_entry in size_entries:
+        if size_entry.name.isdigit() and size_entry.is_dir():
+            yield from _iter_dir_files(size_entry.path)
+
+def migrate_legacy_thumbnails():
+    """Move thumbnails of the old flat layout into their shard folders.
+
+    Return the number of moved thumbnails.
+    """
+    count = 0
+    try:
+        size_entries = list(os.scandir(THUMBNAIL_ROOT))
+    except OSError:
+        return count
+
+    for size_entry in size_entries:
+        if not size_entry.name.isdigit() or not size_entry.is_dir():
+            continue
+
+        for entry in os.scandir(size_entry.path):
+            if not entry.is_file(follow_symlinks=False) or len(entry.name) != 40:
+                continue
+
+            try:
+                os.rename(entry.path,
+                          prepare_thumbnail_path(entry.name, size_entry.name))
+                count += 1
+            except OSError as e:
+                logger.warning(e)
+
+    return count
+
+def evict_thumbnails(max_bytes, max_age=0, limit=0, dry_run=False):
+    """Remove least recently accessed thumbnails.
+
+    Thumbnails not accessed in `max_age` seconds are always removed. If the
+    store is larger than `max_bytes`, the oldest ones are removed until it
+    is back under the low watermark. 0 disables either check. At most
+    `limit` thumbnails are removed in one run if `limit` is not 0.
+
+    The store is scanned twice and only a histogram of access times is kept
+    in memory, whatever the number of thumbnails.
+
+    Return `(total_bytes, removed_count, removed_bytes)`.
+    """
+    now = time.time()
+    bucket_seconds = max(THUMBNAIL_ACCESS_TIME_RESOLUTION, 1)
+
+    # 1st pass, bytes used per access time bucket
+    total_bytes = 0
+    buckets = {}
+    for entry in iter_thumbnails():
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        total_bytes += st.st_size
+        bucket = int(st.st_atime // bucket_seconds)
+        buckets[bucket] = buckets.get(bucket, 0) + st.st_size
+
+    cutoff = 0
+    if max_age:
+        cutoff = now - max_age
+
+    if max_bytes and total_bytes > max_bytes:
+        excess = total_bytes - max_bytes * EVICT_LOW_WATERMARK
+        for bucket in sorted(buckets):
+            if excess <= 0:
+                break
+            excess -= buckets[bucket]
+            cutoff = max(cutoff, (bucket + 1) * bucket_seconds)
+
+    removed_count = removed_bytes = 0
+    if not cutoff:
+        return total_bytes, removed_count, removed_bytes
+
+    # 2nd pass, remove everything accessed before cutoff
+    for entry in iter_thumbnails():
+        if limit and removed_count >= limit:
+            break
+
+        try:
+            st = entry.stat(follow_symlinks=False)
+            if st.st_atime >= cutoff:
+                continue
+            if not dry_run:
+                os.unlink(entry.path)
+        except OSError:
+            continue
+
+        removed_count += 1
+        removed_bytes += st.st_size
+
+    return total_bytes, removed_count, removed_bytes
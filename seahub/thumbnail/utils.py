@@ -8,25 +8,39 @@ import logging
 import subprocess
 from io import BytesIO
 import zipfile
+import http.client
 try: # Py2 and Py3 compatibility
     from urllib.request import urlretrieve
 except:
     from urllib.request import urlretrieve
 
 from PIL import Image
+from django.core.cache import cache
 from seaserv import get_file_id_by_path, get_repo, get_file_size, \
     seafile_api
 
-from seahub.utils import gen_inner_file_get_url, get_file_type_and_ext
-from seahub.utils.file_types import VIDEO, XMIND
+from seahub.utils import gen_inner_file_get_url, get_file_type_and_ext, \
+    normalize_cache_key
+from seahub.utils.ranged_file import open_ranged_url
+from seahub.utils.background import get_executor
+from seahub.thumbnail.store import get_thumbnail_path, \
+    prepare_thumbnail_path, thumbnail_exists
+from seahub.thumbnail.index import get_existing_thumbnails, \
+    add_to_thumbnail_index
+from seahub.utils.file_types import IMAGE, VIDEO, XMIND
 from seahub.settings import THUMBNAIL_IMAGE_SIZE_LIMIT, \
-    THUMBNAIL_EXTENSION, THUMBNAIL_ROOT, THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT,\
-    ENABLE_VIDEO_THUMBNAIL, THUMBNAIL_VIDEO_FRAME_TIME
+    THUMBNAIL_EXTENSION, THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT,\
+    ENABLE_VIDEO_THUMBNAIL, THUMBNAIL_VIDEO_FRAME_TIME, \
+    THUMBNAIL_VIDEO_TIMEOUT, THUMBNAIL_VIDEO_WORKERS, \
+    THUMBNAIL_PREGENERATE_SIZES, THUMBNAIL_FAILURE_CACHE_TIMEOUT, \
+    THUMBNAIL_FAILURE_CACHE_TIMEOUT_TRANSIENT
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
 XMIND_IMAGE_SIZE = 1024
 
+THUMBNAIL_FAILURE_CACHE_PREFIX = 'THUMBNAIL_FAILURE_'
+
 def get_thumbnail_src(repo_id, size, path):
     return posixpath.join("thumbnail", repo_id, str(size), path.lstrip('/'))
 
@@ -76,12 +90,45 @@ def get_rotated_image(image):
 
     return image
 
+def _get_thumbnail_failure_cache_key(file_id, size):
+    return normalize_cache_key('%s_%s' % (file_id, size),
+                               THUMBNAIL_FAILURE_CACHE_PREFIX)
+
+def get_thumbnail_failure(file_id, sizes):
+    """Return status code of a recent failed generation of `file_id`'s
+    thumbnail in any of `sizes`, None if there is none.
+    """
+    keys = [_get_thumbnail_failure_cache_key(file_id, size) for size in sizes]
+    failures = cache.get_many(keys)
+    for key in keys:
+        if key in failures:
+            return failures[key]
+    return None
+
+def set_thumbnail_failure(file_id, sizes, status_code):
+    """Remember a failed generation. A file id is content-addressed, so
+    a bad file stays bad, other errors are retried sooner.
+    """
+    if status_code == 500:
+        timeout = THUMBNAIL_FAILURE_CACHE_TIMEOUT_TRANSIENT
+    else:
+        timeout = THUMBNAIL_FAILURE_CACHE_TIMEOUT
+
+    if timeout <= 0:
+        return
+
+    cache.set_many({_get_thumbnail_failure_cache_key(file_id, size): status_code
+                    for size in sizes}, timeout)
+
 def generate_thumbnail(request, repo_id, size, path):
     """ generate and save thumbnail if not exist
 
     before generate thumbnail, you should check:
     1. if repo exist: should exist;
     2. if repo is encrypted: not encrypted;
+
+    For an image, the missing smaller sizes of `THUMBNAIL_PREGENERATE_SIZES`
+    are rendered from the same decode, they cost almost nothing more.
     """
 
     try:
@@ -90,10 +137,6 @@ def generate_thumbnail(request, repo_id, size, path):
         logger.error(e)
         return (False, 400)
 
-    thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
-    if not os.path.exists(thumbnail_dir):
-        os.makedirs(thumbnail_dir)
-
     filetype, fileext = get_file_type_and_ext(os.path.basename(path))
 
     if filetype == VIDEO and not ENABLE_VIDEO_THUMBNAIL:
@@ -103,43 +146,78 @@ def generate_thumbnail(request, repo_id, size, path):
     if not file_id:
         return (False, 400)
 
-    thumbnail_file = os.path.join(thumbnail_dir, file_id)
-    if os.path.exists(thumbnail_file):
+    if thumbnail_exists(file_id, size):
+        # heal the index if the thumbnail is missing there
+        add_to_thumbnail_index(file_id, [size])
         return (True, 200)
 
+    status_code = get_thumbnail_failure(file_id, [size])
+    if status_code:
+        return (False, status_code)
+
+    sizes = [size]
+    if filetype == IMAGE and fileext.lower() != 'psd':
+        sizes += [s for s in THUMBNAIL_PREGENERATE_SIZES if s < size and
+                  not thumbnail_exists(file_id, s)]
+
+    return _generate_thumbnails(repo_id, path, file_id, sizes)
+
+def _generate_thumbnails(repo_id, path, file_id, sizes):
+    """Create thumbnails of `sizes` for file `file_id`, none of them exists.
+    """
+    ret = _create_thumbnails(repo_id, path, file_id, sizes)
+    if ret[0]:
+        add_to_thumbnail_index(file_id, sizes)
+    else:
+        set_thumbnail_failure(file_id, sizes, ret[1])
+    return ret
+
+def _create_thumbnails(repo_id, path, file_id, sizes):
+    filetype, fileext = get_file_type_and_ext(os.path.basename(path))
+
     repo = get_repo(repo_id)
     file_size = get_file_size(repo.store_id, repo.version, file_id)
 
     if filetype == VIDEO:
-        # video thumbnails
-        if ENABLE_VIDEO_THUMBNAIL:
-            return create_video_thumbnails(repo, file_id, path, size,
-                                           thumbnail_file, file_size)
-        else:
-            return (False, 400)
-
-    if filetype == XMIND:
-        return extract_xmind_image(repo_id, path, size)
+        targets = [(size, prepare_thumbnail_path(file_id, size)) for size in sizes]
+        return create_video_thumbnails(repo, file_id, path, targets, file_size)
+
+    if filetype == XMIND or fileext.lower() == 'psd':
+        # no multi-size rendering for these, one call per size
+        for size in sizes:
+            thumbnail_file = prepare_thumbnail_path(file_id, size)
+            if filetype == XMIND:
+                ret = extract_xmind_image(repo_id, path, size)
+            elif file_size > THUMBNAIL_IMAGE_SIZE_LIMIT * 1024**2:
+                ret = (False, 400)
+            else:
+                ret = create_psd_thumbnails(repo, file_id, path, size,
+                                            thumbnail_file, file_size)
+            if not ret[0]:
+                return ret
+        return (True, 200)
 
     # image thumbnails
     if file_size > THUMBNAIL_IMAGE_SIZE_LIMIT * 1024**2:
         return (False, 400)
 
-    if fileext.lower() == 'psd':
-        return create_psd_thumbnails(repo, file_id, path, size,
-                                           thumbnail_file, file_size)
-
+    # the image is read with several range requests, so the token can not be
+    # a one-time token
     token = seafile_api.get_fileserver_access_token(repo_id,
-            file_id, 'view', '', use_onetime=True)
+            file_id, 'view', '', use_onetime=False)
 
     if not token:
         return (False, 500)
 
     inner_path = gen_inner_file_get_url(token, os.path.basename(path))
+    targets = [(size, prepare_thumbnail_path(file_id, size)) for size in sizes]
     try:
-        image_file = urllib.request.urlopen(inner_path)
-        f = BytesIO(image_file.read())
-        return _create_thumbnail_common(f, thumbnail_file, size)
+        with open_ranged_url(inner_path) as f:
+            return _create_thumbnails_common(f, targets)
+    except (urllib.error.URLError, http.client.HTTPException, TimeoutError) as e:
+        # fileserver error, not a problem of the image
+        logger.error(e)
+        return (False, 500)
     except Exception as e:
         logger.warning(e)
         return (False, 400)
@@ -181,7 +259,36 @@ def create_psd_thumbnails(repo, file_id, path, size, thumbnail_file, file_size):
         os.unlink(tmp_img_path)
         return (False, 500)
 
-def create_video_thumbnails(repo, file_id, path, size, thumbnail_file, file_size):
+def extract_video_frame(video_url, frame_time, max_size, timeout):
+    """Return the frame of a video at `frame_time` as PPM data, scaled down
+    to fit in `max_size`. Return None if the video is shorter.
+
+    ffmpeg seeks the input to the keyframe before `frame_time` and pipes
+    that single frame to stdout, nothing is written to disk.
+    """
+    scale = "scale='min(iw,%d)':'min(ih,%d)':force_original_aspect_ratio=decrease" \
+        % (max_size, max_size)
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error',
+           '-ss', str(frame_time), '-noaccurate_seek', '-i', video_url,
+           '-frames:v', '1', '-vf', scale,
+           '-f', 'image2pipe', '-vcodec', 'ppm', 'pipe:1']
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          timeout=timeout, check=True)
+    return proc.stdout or None
+
+def _extract_video_thumbnail_frame(video_url, max_size):
+    frame = extract_video_frame(video_url, THUMBNAIL_VIDEO_FRAME_TIME,
+                                max_size, THUMBNAIL_VIDEO_TIMEOUT)
+    if not frame and THUMBNAIL_VIDEO_FRAME_TIME:
+        # video is shorter than THUMBNAIL_VIDEO_FRAME_TIME
+        frame = extract_video_frame(video_url, 0, max_size,
+                                    THUMBNAIL_VIDEO_TIMEOUT)
+    return frame
+
+def create_video_thumbnails(repo, file_id, path, targets, file_size):
+    """Create thumbnails of a video, `targets` is a list of
+    `(size, thumbnail_file)`, all of them rendered from one frame.
+    """
 
     t1 = timeit.default_timer()
     token = seafile_api.get_fileserver_access_token(repo.id,
@@ -191,24 +298,30 @@ def create_video_thumbnails(repo, file_id, path, size, thumbnail_file, file_size
         return (False, 500)
 
     inner_path = gen_inner_file_get_url(token, os.path.basename(path))
-    tmp_path = str(os.path.join(tempfile.gettempdir(), '%s.png' % file_id[:8]))
+    max_size = max(size for size, thumbnail_file in targets)
 
+    # the pool bounds the number of ffmpeg processes
+    future = get_executor('video-thumbnail', THUMBNAIL_VIDEO_WORKERS).submit(
+        _extract_video_thumbnail_frame, inner_path, max_size)
     try:
-        subprocess.check_output(['ffmpeg', '-ss', str(THUMBNAIL_VIDEO_FRAME_TIME), '-vframes', '1', tmp_path, '-i', inner_path])
+        # ffmpeg may run twice, plus the time waiting for a free worker
+        frame = future.result(timeout=THUMBNAIL_VIDEO_TIMEOUT * 3)
     except Exception as e:
+        future.cancel()
         logger.error(e)
         return (False, 500)
-    
+
+    if not frame:
+        logger.error('No frame extracted from video %s' % path)
+        return (False, 500)
+
     t2 = timeit.default_timer()
     logger.debug('Create thumbnail of [%s](size: %s) takes: %s' % (path, file_size, (t2 - t1)))
 
     try:
-        ret = _create_thumbnail_common(tmp_path, thumbnail_file, size)
-        os.unlink(tmp_path)
-        return ret
+        return _create_thumbnails_common(BytesIO(frame), targets)
     except Exception as e:
         logger.error(e)
-        os.unlink(tmp_path)
         return (False, 500)
 
 def _create_thumbnail_common(fp, thumbnail_file, size):
@@ -216,6 +329,15 @@ def _create_thumbnail_common(fp, thumbnail_file, size):
 
     `fp` can be a filename (string) or a file object.
     """
+    return _create_thumbnails_common(fp, [(size, thumbnail_file)])
+
+def _create_thumbnails_common(fp, targets):
+    """Common logic for creating image thumbnails of several sizes.
+
+    `fp` can be a filename (string) or a file object, `targets` is a list of
+    `(size, thumbnail_file)`. The image is decoded and rotated once, then
+    downsampled step by step from the largest size to the smallest one.
+    """
     image = Image.open(fp)
 
     # check image memory cost size limit
@@ -226,44 +348,86 @@ def _create_thumbnail_common(fp, thumbnail_file, size):
     if image_memory_cost > THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT:
         return (False, 403)
 
+    # let the decoder downscale while decoding (JPEG only, no-op otherwise),
+    # so the full size image is never held in memory
+    max_size = max(size for size, thumbnail_file in targets)
+    image.draft(None, (max_size, max_size))
+
     if image.mode not in ["1", "L", "P", "RGB", "RGBA"]:
         image = image.convert("RGB")
 
     image = get_rotated_image(image)
-    image.thumbnail((size, size), Image.ANTIALIAS)
-    image.save(thumbnail_file, THUMBNAIL_EXTENSION)
+    for size, thumbnail_file in sorted(targets, reverse=True):
+        # each size is downsampled from the previous, larger one
+        image.thumbnail((size, size), Image.ANTIALIAS)
+        image.save(thumbnail_file, THUMBNAIL_EXTENSION)
     return (True, 200)
 
+def pregenerate_thumbnails(inner_path, file_id, sizes):
+    """Create the missing thumbnails of all `sizes` for an image.
+
+    Called in the worker processes of `pregenerate_thumbnails` command, so it
+    only talks to fileserver, never to seafile rpc or database.
+    """
+    targets = []
+    for size in sizes:
+        if not thumbnail_exists(file_id, size):
+            targets.append((size, prepare_thumbnail_path(file_id, size)))
+
+    if not targets:
+        return (True, 200)
+
+    try:
+        with open_ranged_url(inner_path) as f:
+            ret = _create_thumbnails_common(f, targets)
+    except Exception as e:
+        logger.warning(e)
+        return (False, 400)
+
+    if ret[0]:
+        add_to_thumbnail_index(file_id, [size for size, _ in targets])
+    return ret
+
 def extract_xmind_image(repo_id, path, size=XMIND_IMAGE_SIZE):
 
     # get inner path
     file_name = os.path.basename(path)
     file_id = seafile_api.get_file_id_by_path(repo_id, path)
     fileserver_token = seafile_api.get_fileserver_access_token(repo_id,
-            file_id, 'view', '')
+            file_id, 'view', '', use_onetime=False)
     inner_path = gen_inner_file_get_url(fileserver_token, file_name)
 
-    # extract xmind image
-    xmind_file = urllib.request.urlopen(inner_path)
-    xmind_file_str = BytesIO(xmind_file.read())
-    xmind_zip_file = zipfile.ZipFile(xmind_file_str, 'r')
-    extracted_xmind_image = xmind_zip_file.read('Thumbnails/thumbnail.png')
+    # extract xmind image, only the central directory and the thumbnail entry
+    # of the archive are fetched
+    with open_ranged_url(inner_path) as xmind_file:
+        xmind_zip_file = zipfile.ZipFile(xmind_file, 'r')
+        extracted_xmind_image = xmind_zip_file.read('Thumbnails/thumbnail.png')
     extracted_xmind_image_str = BytesIO(extracted_xmind_image)
 
     # save origin xmind image to thumbnail folder
-    thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
-    if not os.path.exists(thumbnail_dir):
-        os.makedirs(thumbnail_dir)
-    local_xmind_image = os.path.join(thumbnail_dir, file_id)
+    local_xmind_image = prepare_thumbnail_path(file_id, size)
 
     try:
         ret = _create_thumbnail_common(extracted_xmind_image_str, local_xmind_image, size)
+        if ret[0]:
+            add_to_thumbnail_index(file_id, [size])
         return ret
     except Exception as e:
         logger.error(e)
         return (False, 500)
 
+def get_file_ids_with_thumbnail(dirents, size):
+    """Return obj ids of file `dirents` which already have a thumbnail of
+    `size`, looked up in the thumbnail index all at once.
+    """
+    file_ids = []
+    for dirent in dirents:
+        filetype, fileext = get_file_type_and_ext(dirent.obj_name)
+        if filetype in (IMAGE, XMIND) or \
+                (filetype == VIDEO and ENABLE_VIDEO_THUMBNAIL):
+            file_ids.append(dirent.obj_id)
+
+    return get_existing_thumbnails(file_ids, size)
+
 def get_thumbnail_image_path(obj_id, image_size):
-    thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(image_size))
-    thumbnail_image_path = os.path.join(thumbnail_dir, obj_id)
-    return thumbnail_image_path
+    return get_thumbnail_path(obj_id, image_size)
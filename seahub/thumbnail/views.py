@@ -15,10 +15,11 @@ from seaserv import get_repo, get_file_id_by_path
 
 from seahub.auth.decorators import login_required_ajax, login_required
 from seahub.views import check_folder_permission
-from seahub.settings import THUMBNAIL_DEFAULT_SIZE, THUMBNAIL_EXTENSION, \
-    THUMBNAIL_ROOT
+from seahub.settings import THUMBNAIL_DEFAULT_SIZE, THUMBNAIL_EXTENSION
 from seahub.thumbnail.utils import generate_thumbnail, \
     get_thumbnail_src, get_share_link_thumbnail_src
+from seahub.thumbnail.store import get_thumbnail_path, thumbnail_exists, \
+    read_thumbnail
 from seahub.share.models import FileShare, check_share_link_common
 
 # Get an instance of a logger
@@ -63,14 +64,23 @@ def thumbnail_create(request, repo_id):
         return HttpResponse(json.dumps({'err_msg': err_msg}),
                 status=status_code, content_type=content_type)
 
+def _get_thumbnail_last_modified(obj_id, size):
+    """Return mtime of a thumbnail, or None if there is no thumbnail.
+
+    A thumbnail of the legacy layout is moved to the store first.
+    """
+    if not thumbnail_exists(obj_id, size):
+        return None
+
+    last_modified_time = os.path.getmtime(get_thumbnail_path(obj_id, size))
+    # convert float to datatime obj
+    return datetime.datetime.fromtimestamp(last_modified_time)
+
 def latest_entry(request, repo_id, size, path):
     obj_id = get_file_id_by_path(repo_id, path)
     if obj_id:
         try:
-            thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
-            last_modified_time = os.path.getmtime(thumbnail_file)
-            # convert float to datatime obj
-            return datetime.datetime.fromtimestamp(last_modified_time)
+            return _get_thumbnail_last_modified(obj_id, size)
         except os.error:
             # no thumbnail file exists
             return None
@@ -108,14 +118,12 @@ def thumbnail_get(request, repo_id, size, path):
         return HttpResponse()
 
     success = True
-    thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
-    if not os.path.exists(thumbnail_file):
+    if not thumbnail_exists(obj_id, size):
         success, status_code = generate_thumbnail(request, repo_id, size, path)
 
     if success:
         try:
-            with open(thumbnail_file, 'rb') as f:
-                thumbnail = f.read()
+            thumbnail = read_thumbnail(obj_id, size)
             return HttpResponse(content=thumbnail,
                                 content_type='image/' + THUMBNAIL_EXTENSION)
         except IOError as e:
@@ -201,10 +209,7 @@ def share_link_latest_entry(request, token, size, path):
     obj_id = get_file_id_by_path(repo_id, image_path)
     if obj_id:
         try:
-            thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
-            last_modified_time = os.path.getmtime(thumbnail_file)
-            # convert float to datatime obj
-            return datetime.datetime.fromtimestamp(last_modified_time)
+            return _get_thumbnail_last_modified(obj_id, size)
         except Exception as e:
             logger.error(e)
             # no thumbnail file exists
@@ -249,14 +254,12 @@ def share_link_thumbnail_get(request, token, size, path):
         return HttpResponse()
 
     success = True
-    thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
-    if not os.path.exists(thumbnail_file):
+    if not thumbnail_exists(obj_id, size):
         success, status_code = generate_thumbnail(request, repo_id, size, image_path)
 
     if success:
         try:
-            with open(thumbnail_file, 'rb') as f:
-                thumbnail = f.read()
+            thumbnail = read_thumbnail(obj_id, size)
             return HttpResponse(content=thumbnail,
                                 content_type='image/' + THUMBNAIL_EXTENSION)
         except IOError as e:
@@ -6,8 +6,8 @@ from django.shortcuts import render
 from django.utils.deprecation import MiddlewareMixin
 
 from seahub.utils.ip import get_remote_ip
-from seahub.trusted_ip.models import TrustedIP
-from seahub.settings import ENABLE_LIMIT_IPADDRESS, TRUSTED_IP_LIST
+from seahub.trusted_ip.utils import is_trusted_ip
+from seahub.settings import ENABLE_LIMIT_IPADDRESS
 
 
 class LimitIpMiddleware(MiddlewareMixin):
@@ -16,7 +16,7 @@ class LimitIpMiddleware(MiddlewareMixin):
             return None
 
         ip = get_remote_ip(request)
-        if not TrustedIP.objects.match_ip(ip) and ip not in TRUSTED_IP_LIST:
+        if not is_trusted_ip(ip):
             if "api2/" in request.path or "api/v2.1/" in request.path:
                 return HttpResponse(
                     json.dumps({"err_msg": "you can't login, because IP \
@@ -1,10 +1,7 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
-import operator
-
-from django.conf import settings
 from django.db import models
-from django.db.models import Q
-from functools import reduce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 
 class TrustedIPManager(models.Manager):
@@ -27,26 +24,10 @@ class TrustedIPManager(models.Manager):
             return False
 
     def match_ip(self, ip):
-        """e.g.  163.13.12.233
-        will generate all can be match ip.
-        e.g. 163.13.12.233
-             163.13.12.*
-             163.13.*.*
-             163.*.*.*
-        use Q query to join all ip
+        """Whether `ip` is in any trusted ip address or network.
         """
-        ip_list = [ip]
-        ip_list_tmp = ip.split('.')
-        ip_list.append(ip_list_tmp[0] + '.' + ip_list_tmp[1] + '.' + ip_list_tmp[2] + '.*')
-        ip_list.append(ip_list_tmp[0] + '.' + ip_list_tmp[1] + '.*.*')
-        ip_list.append(ip_list_tmp[0] + '.*.*.*')
-
-        query_list = [Q(ip=ip) for ip in ip_list]
-        ip_obj = super(TrustedIPManager, self).filter(reduce(operator.or_, query_list))
-        if len(ip_obj) > 0:
-            return True
-        else:
-            return False
+        from seahub.trusted_ip.utils import is_trusted_ip
+        return is_trusted_ip(ip)
 
 
 class TrustedIP(models.Model):
@@ -57,3 +38,11 @@ class TrustedIP(models.Model):
         return {
             'ip': self.ip
         }
+
+
+########## signal handlers
+@receiver(post_save, sender=TrustedIP)
+@receiver(post_delete, sender=TrustedIP)
+def trusted_ip_changed(sender, **kwargs):
+    from seahub.trusted_ip.utils import reset_trusted_ip_matcher
+    reset_trusted_ip_matcher()
@@ -0,0 +1,159 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Trusted ip addresses compiled into binary tries, one for IPv4 and one for
+IPv6, so checking the ip of a request does not query database.
+
+An entry may be an address, a network in CIDR notation like ``10.0.0.0/8``
+or ``fd00::/8``, or an IPv4 address with trailing wildcards like
+``10.1.*.*``.
+
+The tries are rebuilt in the process changing trusted ips at once, other
+processes notice the change within ``TRUSTED_IP_CHECK_INTERVAL`` seconds
+through a version number in cache.
+"""
+import time
+import logging
+import ipaddress
+import threading
+
+from django.core.cache import cache
+
+from seahub.settings import TRUSTED_IP_LIST
+
+logger = logging.getLogger(__name__)
+
+TRUSTED_IP_VERSION_CACHE_KEY = 'TRUSTED_IP_VERSION'
+
+# seconds between checks whether trusted ips are changed by other processes
+TRUSTED_IP_CHECK_INTERVAL = 10
+
+
+def parse_trusted_ip(value):
+    """Return the `ipaddress` network of a trusted ip entry, or None if it
+    is not valid.
+
+    Wildcards are only supported at the end, e.g. "10.1.*.*" is
+    10.1.0.0/16, while "10.*.1.*" is not valid. "*.*.*.*" is not valid
+    either, trusting every address has to be written as "0.0.0.0/0".
+    """
+    value = value.strip()
+    if '*' in value:
+        parts = value.split('.')
+        if len(parts) != 4:
+            return None
+
+        fixed = 0
+        while fixed < 4 and parts[fixed] != '*':
+            fixed += 1
+        if fixed == 0 or any(part != '*' for part in parts[fixed:]):
+            return None
+
+        value = '%s/%d' % ('.'.join(parts[:fixed] + ['0'] * (4 - fixed)),
+                           fixed * 8)
+
+    try:
+        return ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return None
+
+
+class IPTrie(object):
+    """Binary trie of networks of one ip version, a node is a list of
+    child for bit 0, child for bit 1 and whether a network ends there.
+    """
+
+    def __init__(self, max_prefixlen):
+        self.max_prefixlen = max_prefixlen
+        self.root = [None, None, False]
+
+    def add(self, network):
+        bits = int(network.network_address)
+        node = self.root
+        for i in range(network.prefixlen):
+            if node[2]:
+                # covered by a shorter network
+                return
+            bit = (bits >> (self.max_prefixlen - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, False]
+            node = node[bit]
+
+        # longer networks below are covered by this one
+        node[:] = [None, None, True]
+
+    def match(self, address):
+        bits = int(address)
+        node = self.root
+        for i in range(self.max_prefixlen):
+            if node[2]:
+                return True
+            node = node[(bits >> (self.max_prefixlen - 1 - i)) & 1]
+            if node is None:
+                return False
+        return node[2]
+
+
+class TrustedIPMatcher(object):
+
+    def __init__(self, ips):
+        self.tries = {4: IPTrie(32), 6: IPTrie(128)}
+        for ip in ips:
+            network = parse_trusted_ip(ip)
+            if network is None:
+                logger.warning('Ignore invalid trusted ip %s' % ip)
+                continue
+            self.tries[network.version].add(network)
+
+    def match(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        return self.tries[address.version].match(address)
+
+
+_matcher = None
+_matcher_version = None
+_checked_at = 0
+_matcher_lock = threading.Lock()
+
+def get_trusted_ip_matcher():
+    global _matcher, _matcher_version, _checked_at
+
+    with _matcher_lock:
+        now = time.time()
+        if _matcher is not None and \
+                now - _checked_at < TRUSTED_IP_CHECK_INTERVAL:
+            return _matcher
+
+        # read version before the ips, a change in between is picked up in
+        # the next check
+        version = cache.get(TRUSTED_IP_VERSION_CACHE_KEY, 0)
+        if _matcher is None or version != _matcher_version:
+            from seahub.trusted_ip.models import TrustedIP
+            ips = list(TrustedIP.objects.values_list('ip', flat=True))
+            _matcher = TrustedIPMatcher(ips + list(TRUSTED_IP_LIST))
+            _matcher_version = version
+
+        _checked_at = now
+        return _matcher
+
+def is_trusted_ip(ip):
+    return get_trusted_ip_matcher().match(ip)
+
+def reset_trusted_ip_matcher():
+    """Rebuild tries of this process on next check, and tell other
+    processes to do so.
+    """
+    global _matcher
+
+    try:
+        cache.incr(TRUSTED_IP_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(TRUSTED_IP_VERSION_CACHE_KEY, 1, None)
+
+    with _matcher_lock:
+        _matcher = None
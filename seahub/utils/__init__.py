@@ -923,9 +923,9 @@ def get_site_name():
     """
     return config.SITE_NAME
 
-def send_html_email(subject, con_template, con_context, from_email, to_email,
-                    reply_to=None):
-    """Send HTML email
+def get_html_email(subject, con_template, con_context, from_email, to_email,
+                   reply_to=None):
+    """Return HTML email rendered in current language, to be sent later.
     """
 
     # get logo path
@@ -951,7 +951,14 @@ def send_html_email(subject, con_template, con_context, from_email, to_email,
     msg = EmailMessage(subject, t.render(con_context), from_email,
                        to_email, headers=headers)
     msg.content_subtype = "html"
-    msg.send()
+    return msg
+
+def send_html_email(subject, con_template, con_context, from_email, to_email,
+                    reply_to=None):
+    """Send HTML email
+    """
+    get_html_email(subject, con_template, con_context, from_email, to_email,
+                   reply_to).send()
 
 def gen_dir_share_link(token):
     """Generate directory share link.
@@ -0,0 +1,54 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Threads of a web process for work a request need not wait for.
+
+Work of these threads is lost when the process exits, so it must be
+something done again later if lost, like creating a missing thumbnail.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name, max_workers=1):
+    """Return thread pool `name` of this process, created on first use so
+    it is not shared by forked workers.
+    """
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers,
+                                          thread_name_prefix=name)
+            _executors[name] = executor
+        return executor
+
+def _run(func, args):
+    try:
+        func(*args)
+    except Exception as e:
+        logger.error('Failed to run %s in background: %s' %
+                     (func.__name__, e))
+    finally:
+        # database connection of a background thread is not reused
+        connection.close()
+
+def run_in_background(name, func, *args, **kwargs):
+    """Run `func(*args)` in thread pool `name`, see `get_executor`.
+    """
+    executor = get_executor(name, kwargs.get('max_workers', 1))
+    return executor.submit(_run, func, args)
+
+def run_later(interval, func, *args):
+    """Run `func(*args)` in a daemon thread after `interval` seconds.
+    """
+    timer = threading.Timer(interval, _run, (func, args))
+    timer.daemon = True
+    timer.start()
+    return timer
@@ -0,0 +1,150 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Seekable, read-only file object over a fileserver url.
+
+Data is fetched on demand with HTTP ``Range`` requests, so consumers like PIL
+or ``zipfile`` can parse a remote file without first downloading the whole
+thing into memory.
+"""
+import io
+import logging
+import urllib.request
+import urllib.error
+
+logger = logging.getLogger(__name__)
+
+# Forward seeks shorter than this are served by reading and discarding from
+# the response already open, instead of issuing a new range request.
+SKIP_THRESHOLD = 256 * 1024
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+class RangedHTTPFile(io.RawIOBase):
+    """Raw file object reading ``url`` with range requests.
+
+    Sequential reads share one open response. A seek only re-opens the
+    connection when the target is behind, or too far ahead of, the part of
+    the file currently being streamed. If the server ignores ``Range`` and
+    answers ``200``, the body is skipped up to the wanted offset.
+    """
+
+    def __init__(self, url, timeout=30):
+        super(RangedHTTPFile, self).__init__()
+        self.url = url
+        self.timeout = timeout
+        self.requests_count = 0
+
+        self._pos = 0
+        self._size = None
+        self._resp = None
+        self._resp_pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._open(self._pos)
+        if self._size is None:
+            raise io.UnsupportedOperation('Size of %s is unknown' % self.url)
+        return self._size
+
+    def _close_resp(self):
+        if self._resp is not None:
+            self._resp.close()
+            self._resp = None
+
+    def _open(self, start):
+        """Open a response streaming from ``start``.
+
+        Return False if ``start`` is at or beyond the end of file.
+        """
+        self._close_resp()
+
+        req = urllib.request.Request(self.url,
+                                     headers={'Range': 'bytes=%d-' % start})
+        self.requests_count += 1
+        try:
+            resp = urllib.request.urlopen(req, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code != 416:
+                raise
+            # requested range not satisfiable, e.g. "bytes */4096"
+            total = e.headers.get('Content-Range', '').rpartition('/')[2]
+            if total.isdigit():
+                self._size = int(total)
+            return False
+
+        if resp.getcode() == 206:
+            # e.g. "bytes 1024-4095/4096"
+            total = resp.headers.get('Content-Range', '').rpartition('/')[2]
+            if total.isdigit():
+                self._size = int(total)
+            self._resp_pos = start
+        else:
+            length = resp.headers.get('Content-Length', '')
+            if length.isdigit():
+                self._size = int(length)
+            self._resp_pos = 0
+
+        self._resp = resp
+        if self._resp_pos < start:
+            self._skip(start - self._resp_pos)
+        return True
+
+    def _skip(self, length):
+        while length > 0:
+            data = self._resp.read(min(length, DEFAULT_BUFFER_SIZE))
+            if not data:
+                break
+            length -= len(data)
+            self._resp_pos += len(data)
+
+    def readinto(self, b):
+        if self._size is not None and self._pos >= self._size:
+            return 0
+
+        if self._resp is None or self._resp_pos != self._pos:
+            distance = self._pos - self._resp_pos
+            if self._resp is not None and 0 < distance <= SKIP_THRESHOLD:
+                self._skip(distance)
+            elif not self._open(self._pos):
+                return 0
+
+        n = self._resp.readinto(b)
+        self._pos += n
+        self._resp_pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError('invalid whence (%r)' % whence)
+
+        if pos < 0:
+            raise ValueError('negative seek position %d' % pos)
+
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._close_resp()
+        super(RangedHTTPFile, self).close()
+
+def open_ranged_url(url, buffer_size=DEFAULT_BUFFER_SIZE, timeout=30):
+    """Return a buffered, seekable file object reading ``url`` on demand.
+    """
+    return io.BufferedReader(RangedHTTPFile(url, timeout=timeout),
+                             buffer_size=buffer_size)
@@ -1,14 +1,11 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 # encoding: utf-8
-import hashlib
 import os
 import stat
 import json
-import mimetypes
 import logging
 import posixpath
 
-from django.core.cache import cache
 from django.urls import reverse, resolve
 from django.contrib import messages
 from django.http import HttpResponse, Http404, \
@@ -17,7 +14,6 @@ from django.shortcuts import render, redirect
 from django.utils.http import urlquote
 from django.utils.html import escape
 from django.utils.translation import ugettext as _
-from django.views.decorators.http import condition
 
 import seaserv
 from seaserv import get_repo, get_commits, \
@@ -26,6 +22,7 @@ from seaserv import get_repo, get_commits, \
 from pysearpc import SearpcError
 
 from seahub.avatar.util import get_avatar_file_storage
+from seahub.base.database_storage.serve import serve_database_file
 from seahub.auth.decorators import login_required
 from seahub.auth import login as auth_login
 from seahub.auth import get_backends
@@ -1027,37 +1024,12 @@ def convert_cmmt_desc_link(request):
     raise Http404
 
 storage = get_avatar_file_storage()
-def latest_entry(request, filename):
-    try:
-        return storage.modified_time(filename)
-    except Exception as e:
-        logger.error(e)
-        return None
 
-@condition(last_modified_func=latest_entry)
 def image_view(request, filename):
     if AVATAR_FILE_STORAGE is None:
         raise Http404
 
-    # read file from cache, if hit
-    filename_md5 = hashlib.md5(filename.encode('utf-8')).hexdigest()
-    cache_key = 'image_view__%s' % filename_md5
-    file_content = cache.get(cache_key)
-    if file_content is None:
-        # otherwise, read file from database and update cache
-        image_file = storage.open(filename, 'rb')
-        if not image_file:
-            raise Http404
-        file_content = image_file.read()
-        cache.set(cache_key, file_content, 365 * 24 * 60 * 60)
-
-    # Prepare response
-    content_type, content_encoding = mimetypes.guess_type(filename)
-    response = HttpResponse(content=file_content, content_type=content_type)
-    response['Content-Disposition'] = 'inline; filename=%s' % filename
-    if content_encoding:
-        response['Content-Encoding'] = content_encoding
-    return response
+    return serve_database_file(request, storage, filename)
 
 def custom_css_view(request):
     file_content = config.CUSTOM_CSS
@@ -37,8 +37,8 @@ from seahub.views import get_unencry_rw_repos_by_user, \
 from seahub.group.utils import is_group_member, is_group_admin_or_owner, \
     get_group_member_info
 import seahub.settings as settings
-from seahub.settings import THUMBNAIL_ROOT, \
-    THUMBNAIL_DEFAULT_SIZE, SHOW_TRAFFIC, MEDIA_URL, ENABLE_VIDEO_THUMBNAIL
+from seahub.settings import THUMBNAIL_DEFAULT_SIZE, SHOW_TRAFFIC, MEDIA_URL, \
+    ENABLE_VIDEO_THUMBNAIL
 from seahub.utils import check_filename_with_rename, EMPTY_SHA1, \
     gen_block_get_url, \
     new_merge_with_no_conflict, get_commit_before_new_merge, \
@@ -51,7 +51,7 @@ from seahub.utils.repo import get_locked_files_by_dir, get_repo_owner, \
         repo_has_been_shared_out, parse_repo_perm
 from seahub.utils.error_msg import file_type_error_msg, file_size_error_msg
 from seahub.base.accounts import User
-from seahub.thumbnail.utils import get_thumbnail_src
+from seahub.thumbnail.utils import get_thumbnail_src, get_file_ids_with_thumbnail
 from seahub.share.utils import is_repo_admin
 from seahub.base.templatetags.seahub_tags import translate_seahub_time, \
     email2nickname, tsstr_sec
@@ -235,6 +235,9 @@ def list_lib_dir(request, repo_id):
         dirent_list.append(d_)
 
     size = int(request.GET.get('thumbnail_size', THUMBNAIL_DEFAULT_SIZE))
+    thumbnail_file_ids = set()
+    if not repo.encrypted:
+        thumbnail_file_ids = get_file_ids_with_thumbnail(file_list, size)
 
     for f in file_list:
         f_ = {}
@@ -267,9 +270,7 @@ def list_lib_dir(request, repo_id):
                 # if thumbnail has already been created, return its src.
                 # Then web browser will use this src to get thumbnail instead of
                 # recreating it.
-                thumbnail_file_path = os.path.join(THUMBNAIL_ROOT, str(size), f.obj_id)
-                thumbnail_exist = os.path.exists(thumbnail_file_path)
-                if thumbnail_exist:
+                if f.obj_id in thumbnail_file_ids:
                     file_path = posixpath.join(path, f.obj_name)
                     src = get_thumbnail_src(repo_id, size, file_path)
                     f_['encoded_thumbnail_src'] = urlquote(src)
@@ -75,7 +75,8 @@ from seahub.views import check_folder_permission, \
 from seahub.utils.repo import is_repo_owner, parse_repo_perm
 from seahub.group.utils import is_group_member
 from seahub.thumbnail.utils import extract_xmind_image, get_thumbnail_src, \
-        XMIND_IMAGE_SIZE, get_share_link_thumbnail_src, get_thumbnail_image_path
+        XMIND_IMAGE_SIZE, get_share_link_thumbnail_src
+from seahub.thumbnail.store import thumbnail_exists
 from seahub.drafts.utils import get_file_draft, \
         is_draft_file, has_draft_file
 
@@ -734,8 +735,7 @@ def view_lib_file(request, repo_id, path):
         return render(request, template, return_dict)
 
     elif filetype == XMIND:
-        xmind_image_path = get_thumbnail_image_path(file_id, XMIND_IMAGE_SIZE)
-        if not os.path.exists(xmind_image_path) and not extract_xmind_image(repo_id, path)[0]:
+        if not thumbnail_exists(file_id, XMIND_IMAGE_SIZE) and not extract_xmind_image(repo_id, path)[0]:
             error_msg = _('Unable to view file')
             return_dict['err'] = error_msg
         else:
@@ -1272,8 +1272,7 @@ def view_shared_file(request, fileshare):
         elif filetype == SPREADSHEET:
             handle_spreadsheet(inner_path, obj_id, fileext, ret_dict)
         elif filetype == XMIND:
-            xmind_image_path = get_thumbnail_image_path(obj_id, XMIND_IMAGE_SIZE)
-            if not os.path.exists(xmind_image_path) and not extract_xmind_image(repo_id, path)[0]:
+            if not thumbnail_exists(obj_id, XMIND_IMAGE_SIZE) and not extract_xmind_image(repo_id, path)[0]:
                 error_msg = _('Unable to view file')
                 ret_dict['err'] = error_msg
             else:
@@ -1494,8 +1493,7 @@ def view_file_via_shared_dir(request, fileshare):
                 if cur_img_index != len(img_list) - 1:
                     img_next = posixpath.join(parent_dir, img_list[cur_img_index + 1])
         elif filetype == XMIND:
-            xmind_image_path = get_thumbnail_image_path(obj_id, XMIND_IMAGE_SIZE)
-            if not os.path.exists(xmind_image_path) and not extract_xmind_image(repo_id, real_path)[0]:
+            if not thumbnail_exists(obj_id, XMIND_IMAGE_SIZE) and not extract_xmind_image(repo_id, real_path)[0]:
                 error_msg = _('Unable to view file')
                 ret_dict['err'] = error_msg
             else:
@@ -28,12 +28,13 @@ from seahub.utils import gen_dir_share_link, \
 from seahub.utils.repo import is_repo_owner, get_repo_owner
 from seahub.settings import ENABLE_UPLOAD_FOLDER, \
     ENABLE_RESUMABLE_FILEUPLOAD, ENABLE_VIDEO_THUMBNAIL, \
-    THUMBNAIL_ROOT, THUMBNAIL_DEFAULT_SIZE, THUMBNAIL_SIZE_FOR_GRID, \
+    THUMBNAIL_DEFAULT_SIZE, THUMBNAIL_SIZE_FOR_GRID, \
     MAX_NUMBER_OF_FILES_FOR_FILEUPLOAD, SHARE_LINK_EXPIRE_DAYS_MIN, \
     SHARE_LINK_EXPIRE_DAYS_MAX, SEAFILE_COLLAB_SERVER, \
     ENABLE_SHARE_LINK_REPORT_ABUSE
 from seahub.utils.file_types import IMAGE, VIDEO, XMIND
-from seahub.thumbnail.utils import get_share_link_thumbnail_src
+from seahub.thumbnail.utils import get_share_link_thumbnail_src, \
+    get_file_ids_with_thumbnail
 from seahub.group.utils import is_group_admin
 from seahub.api2.endpoints.group_owned_libraries import get_group_id_by_repo_owner
 
@@ -323,6 +324,7 @@ def view_shared_dir(request, fileshare):
     if mode != 'list':
         mode = 'grid'
     thumbnail_size = THUMBNAIL_DEFAULT_SIZE if mode == 'list' else THUMBNAIL_SIZE_FOR_GRID
+    thumbnail_file_ids = get_file_ids_with_thumbnail(file_list, thumbnail_size)
 
     for f in file_list:
         file_type, file_ext = get_file_type_and_ext(f.obj_name)
@@ -333,7 +335,7 @@ def view_shared_dir(request, fileshare):
 
         if file_type in (IMAGE, XMIND) or \
                 (file_type == VIDEO and ENABLE_VIDEO_THUMBNAIL):
-            if os.path.exists(os.path.join(THUMBNAIL_ROOT, str(thumbnail_size), f.obj_id)):
+            if f.obj_id in thumbnail_file_ids:
                 req_image_path = posixpath.join(req_path, f.obj_name)
                 src = get_share_link_thumbnail_src(token, thumbnail_size, req_image_path)
                 f.encoded_thumbnail_src = urlquote(src)
@@ -36,6 +36,7 @@ from seahub.base.templatetags.seahub_tags import tsstr_sec, email2nickname, \
     email2contact_email
 from seahub.auth import authenticate
 from seahub.auth.decorators import login_required, login_required_ajax
+from seahub.auth.utils import clear_user_cache
 from seahub.constants import GUEST_USER, DEFAULT_USER, DEFAULT_ADMIN, \
         SYSTEM_ADMIN, DAILY_ADMIN, AUDIT_ADMIN, HASH_URLS, DEFAULT_ORG
 from seahub.institutions.models import (Institution, InstitutionAdmin,
@@ -619,6 +620,7 @@ def user_add(request):
         if request.user.org:
             org_id = request.user.org.org_id
             ccnet_threaded_rpc.add_org_user(org_id, email, 0)
+            clear_user_cache(email)
             if IS_EMAIL_CONFIGURED:
                 try:
                     send_user_add_mail(request, email, password)
@@ -42,6 +42,13 @@ class DeviceAccessibleIpSetting(BaseTestCase):
         json_resp = json.loads(resp.content)
         assert self.test_ip in  [x['ip'] for x in json_resp]
 
+    @patch('seahub.api2.permissions.IsProVersion.has_permission')
+    def test_post_unmatchable_wildcards(self, mock_IsProVersion):
+        mock_IsProVersion.return_value= True
+        for ip in ('1.*.3.*', '*.*.*.*'):
+            resp = self.client.post(self.url, {'ipaddress': ip})
+            assert resp.status_code == 400
+
     @patch('seahub.api2.permissions.IsProVersion.has_permission')
     def test_can_delete(self, mock_IsProVersion):
         mock_IsProVersion.return_value= True
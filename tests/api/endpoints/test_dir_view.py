@@ -7,11 +7,12 @@ from seaserv import seafile_api
 
 from django.urls import reverse
 
+from seahub.profile.models import Profile
 from seahub.test_utils import BaseTestCase
 from seahub.utils import check_filename_with_rename
 
 from tests.common.utils import randstring
-from seahub.settings import THUMBNAIL_ROOT
+from seahub.thumbnail.store import prepare_thumbnail_path
 
 try:
     from seahub.settings import LOCAL_PRO_DEV_ENV
@@ -267,10 +268,7 @@ class DirViewTest(BaseTestCase):
 
         # prepare thumbnail
         size = 48
-        thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
-        if not os.path.exists(thumbnail_dir):
-            os.makedirs(thumbnail_dir)
-        thumbnail_file = os.path.join(thumbnail_dir, file_id)
+        thumbnail_file = prepare_thumbnail_path(file_id, size)
 
         with open(thumbnail_file, 'w'):
             pass
@@ -286,6 +284,117 @@ class DirViewTest(BaseTestCase):
         assert json_resp['dirent_list'][0]['name'] == image_file_name
         assert image_file_name in json_resp['dirent_list'][0]['encoded_thumbnail_src']
 
+    def test_copied_dir_has_its_own_paths(self):
+
+        self.login_as(self.user)
+
+        image_file_name = randstring(6) + '.jpg'
+        seafile_api.post_empty_file(self.repo_id, self.folder_path,
+                image_file_name, self.user_name)
+        file_id = seafile_api.get_file_id_by_path(self.repo_id,
+                posixpath.join(self.folder_path, image_file_name))
+        with open(prepare_thumbnail_path(file_id, 48), 'w'):
+            pass
+
+        # copied folder has the same dir id at another path
+        copied_folder_name = randstring(6)
+        seafile_api.copy_file(self.repo_id, '/',
+                              json.dumps([self.folder_name]),
+                              self.repo_id, '/',
+                              json.dumps([copied_folder_name]),
+                              self.user_name, 0, synchronous=1)
+        copied_folder_path = '/' + copied_folder_name
+
+        resp = self.client.get(self.url + '?t=f&with_thumbnail=true&p=%s' % self.folder_path)
+        self.assertEqual(200, resp.status_code)
+
+        resp = self.client.get(self.url + '?t=f&with_thumbnail=true&p=%s' % copied_folder_path)
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+        assert len(json_resp['dirent_list']) == 1
+        dirent = json_resp['dirent_list'][0]
+        assert dirent['parent_dir'] == copied_folder_path + '/'
+        assert copied_folder_name in dirent['encoded_thumbnail_src']
+        assert self.folder_name not in dirent['encoded_thumbnail_src']
+
+    def test_get_unchanged_dir_with_etag(self):
+
+        self.login_as(self.user)
+
+        resp = self.client.get(self.url)
+        self.assertEqual(200, resp.status_code)
+        etag = resp['ETag']
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, resp.status_code)
+        assert resp['ETag'] == etag
+
+        # a new file changes dir id
+        seafile_api.post_empty_file(self.repo_id, '/', randstring(6),
+                                    self.user_name)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, resp.status_code)
+        assert resp['ETag'] != etag
+        assert len(json.loads(resp.content)['dirent_list']) == 3
+
+    def test_created_thumbnail_changes_etag(self):
+
+        self.login_as(self.user)
+
+        image_file_name = randstring(6) + '.jpg'
+        seafile_api.post_empty_file(self.repo_id, self.folder_path,
+                image_file_name, self.user_name)
+        url = self.url + '?t=f&with_thumbnail=true&p=%s' % self.folder_path
+
+        resp = self.client.get(url)
+        etag = resp['ETag']
+        file_id = json.loads(resp.content)['dirent_list'][0]['id']
+
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, resp.status_code)
+
+        # listing is cached but thumbnail is checked again
+        with open(prepare_thumbnail_path(file_id, 48), 'w'):
+            pass
+
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, resp.status_code)
+        assert resp['ETag'] != etag
+        json_resp = json.loads(resp.content)
+        assert 'encoded_thumbnail_src' in json_resp['dirent_list'][0]
+
+    def test_modifier_name_changes_etag(self):
+
+        self.login_as(self.user)
+
+        resp = self.client.get(self.url + '?t=f')
+        etag = resp['ETag']
+
+        # listing is cached but names of modifiers are not
+        Profile.objects.add_or_update(self.user_name, nickname='new name')
+
+        resp = self.client.get(self.url + '?t=f', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, resp.status_code)
+        assert resp['ETag'] != etag
+        json_resp = json.loads(resp.content)
+        assert json_resp['dirent_list'][0]['modifier_name'] == 'new name'
+
+    def test_starred_file_changes_etag(self):
+
+        self.login_as(self.user)
+
+        resp = self.client.get(self.url + '?t=f')
+        etag = resp['ETag']
+
+        # star file, listing is cached but star info is not
+        resp = self.client.post(reverse('starredfiles'), {'repo_id': self.repo.id, 'p': self.file_path})
+        self.assertEqual(201, resp.status_code)
+
+        resp = self.client.get(self.url + '?t=f', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+        assert json_resp['dirent_list'][0]['starred'] == True
+
     def test_get_dir_with_invalid_perm(self):
         # login as admin, then get dir info in user's repo
         self.login_as(self.admin)
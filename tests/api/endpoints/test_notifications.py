@@ -7,6 +7,7 @@ class NotificationsTest(BaseTestCase):
     def setUp(self):
         self.endpoint = '/api/v2.1/notifications/'
         self.username = self.user.username
+        self.clear_cache()
 
     def test_can_get_unseen_count(self):
 
@@ -47,6 +48,7 @@ class NotificationTest(BaseTestCase):
     def setUp(self):
         self.endpoint = '/api/v2.1/notification/'
         self.username = self.user.username
+        self.clear_cache()
 
     def test_can_unseen_notification_by_id(self):
 
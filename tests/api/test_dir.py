@@ -1,5 +1,6 @@
 import json
 import os
+import posixpath
 import time
 
 from django.urls import reverse
@@ -45,6 +46,81 @@ class DirTest(BaseTestCase):
 
         self.assertEqual(404, resp.status_code)
 
+    def test_can_list_recursively(self):
+        self.create_folder(repo_id=self.repo.id, parent_dir=self.folder,
+                           dirname='sub', username=self.user.username)
+        self.create_file(repo_id=self.repo.id, parent_dir=self.folder + '/sub',
+                         filename='deep.md', username=self.user.username)
+
+        resp = self.client.get(self.endpoint + '?recursive=1')
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+
+        # entries of a dir come before entries of its sub dirs
+        paths = [posixpath.join(e['parent_dir'], e['name']) for e in json_resp]
+        assert paths.index(self.folder) < paths.index(self.folder + '/sub')
+        assert paths.index(self.folder + '/sub') < \
+            paths.index(self.folder + '/sub/deep.md')
+
+        deep = json_resp[paths.index(self.folder + '/sub/deep.md')]
+        assert deep['type'] == 'file'
+        assert deep['modifier_name'] == email2nickname(self.user.username)
+
+    def test_can_list_recursively_streamed(self):
+        self.create_folder(repo_id=self.repo.id, parent_dir=self.folder,
+                           dirname='sub', username=self.user.username)
+
+        resp = self.client.get(self.endpoint + '?recursive=1')
+        expected = json.loads(resp.content)
+
+        resp = self.client.get(self.endpoint + '?recursive=1&stream=1')
+        self.assertEqual(200, resp.status_code)
+        assert resp.streaming
+        assert resp['Content-Type'] == 'application/x-ndjson'
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        assert [json.loads(line) for line in lines] == expected
+
+        resp = self.client.get(self.endpoint + '?recursive=1&stream=1&t=d')
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        json_resp = [json.loads(line) for line in lines]
+        assert len(json_resp) == 2
+        assert all(e['type'] == 'dir' for e in json_resp)
+
+    def test_can_stream_list(self):
+        resp = self.client.get(self.endpoint + '?stream=1')
+        self.assertEqual(200, resp.status_code)
+        assert resp['Content-Type'] == 'application/x-ndjson'
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        entries = [json.loads(line) for line in lines]
+
+        assert len(entries) == 2
+        assert {e['name'] for e in entries} == {self.folder_name, self.file_name}
+        file_entry = [e for e in entries if e['type'] == 'file'][0]
+        assert file_entry['modifier_name'] == email2nickname(self.user.username)
+        assert file_entry['starred'] is False
+
+    def test_can_stream_list_by_cursor(self):
+        resp = self.client.get(self.endpoint + '?stream=1&limit=1')
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        assert len(lines) == 2
+        first = json.loads(lines[0])
+        next_cursor = json.loads(lines[1])['next_cursor']
+
+        resp = self.client.get(self.endpoint + '?stream=1&limit=1&cursor=%s' %
+                               next_cursor)
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        assert len(lines) == 1
+        second = json.loads(lines[0])
+        assert {first['name'], second['name']} == \
+            {self.folder_name, self.file_name}
+
+    def test_stream_list_with_invalid_cursor(self):
+        resp = self.client.get(self.endpoint + '?stream=1&cursor=a')
+        self.assertEqual(400, resp.status_code)
+
+        resp = self.client.get(self.endpoint + '?stream=1&limit=0')
+        self.assertEqual(400, resp.status_code)
+
     def test_get_dir_file_modifier(self):
         # upload the file , then test whether can get modifier
         self.login_as(self.user)
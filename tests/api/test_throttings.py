@@ -1,10 +1,17 @@
 from mock import patch
+import os
 import time
+import shutil
+import tempfile
 
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
 from django.urls import reverse
-from django.test import override_settings
+from django.test import RequestFactory, SimpleTestCase, override_settings
 
-from seahub.api2.throttling import SimpleRateThrottle
+from seahub.api2.throttling import SimpleRateThrottle, UserRateThrottle, \
+    get_throttle_stats
+from seahub.base.cache import SQLiteCache, TieredCache
 from seahub.test_utils import BaseTestCase
 
 
@@ -39,3 +46,97 @@ class ThrottingsTest(BaseTestCase):
             assert res.status_code == 200
 
             time.sleep(0.1)
+
+
+class GCRAThrottleTest(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+
+        class Throttle(SimpleRateThrottle):
+            rate = '3/minute'
+            scope = 'test'
+            cache = LocMemCache('throttle-test', {})
+            timer = lambda throttle: self.now
+
+            def get_cache_key(self, request, view):
+                return 'throttle_test'
+
+        Throttle.cache.clear()
+        self.throttle = Throttle()
+        self.request = RequestFactory().get('/')
+
+    def test_burst_then_interval(self):
+        for i in range(3):
+            assert self.throttle.allow_request(self.request, None) is True
+        assert self.throttle.allow_request(self.request, None) is False
+        assert self.throttle.wait() == 20.0
+
+        # one request is allowed every 20 seconds from now on
+        self.now += 20
+        assert self.throttle.allow_request(self.request, None) is True
+        assert self.throttle.allow_request(self.request, None) is False
+
+    def test_idle_client_does_not_save_up(self):
+        assert self.throttle.allow_request(self.request, None) is True
+
+        self.now += 600
+        for i in range(3):
+            assert self.throttle.allow_request(self.request, None) is True
+        assert self.throttle.allow_request(self.request, None) is False
+
+    def test_stats(self):
+        before = get_throttle_stats().get('test', {'allowed': 0, 'throttled': 0})
+        for i in range(4):
+            self.throttle.allow_request(self.request, None)
+
+        stats = get_throttle_stats()['test']
+        assert stats['allowed'] - before['allowed'] == 3
+        assert stats['throttled'] - before['throttled'] == 1
+
+
+class TieredCacheThrottleTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.shared = SQLiteCache(os.path.join(self.tmp_dir, 'cache.db'), {})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _get_cache(self):
+        # shared only keys of seahub settings
+        options = dict(settings.CACHES['default']['OPTIONS'],
+                       INVALIDATION_POLL_INTERVAL=0)
+        cache = TieredCache('', {'OPTIONS': options})
+        cache._shared_cache = self.shared
+        return cache
+
+    def test_throttle_keys_do_not_evict_local_entries(self):
+        cache1 = self._get_cache()
+        cache2 = self._get_cache()
+
+        # another process holds an entry in its local tier
+        cache1.set('NICKNAME_foo', 'foo')
+        assert cache2.get('NICKNAME_foo') == 'foo'
+        seq = self.shared.get(TieredCache.invalidation_seq_key)
+
+        class Throttle(UserRateThrottle):
+            rate = '10000/minute'
+            cache = cache1
+
+            def get_cache_key(self, request, view):
+                return self.cache_format % {'scope': self.scope,
+                                            'ident': 'foo@example.com'}
+
+        throttle = Throttle()
+        request = RequestFactory().get('/')
+        for i in range(TieredCache.max_invalidation_gap + 10):
+            assert throttle.allow_request(request, None) is True
+
+        # throttle buckets are neither kept locally nor broadcast
+        assert set(cache1._entries) == {cache1.make_key('NICKNAME_foo')}
+        assert self.shared.get(TieredCache.invalidation_seq_key) == seq
+
+        assert cache2.get('NICKNAME_foo') == 'foo'
+        assert cache2.get_stats()['local_hits'] == 1
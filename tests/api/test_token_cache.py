@@ -0,0 +1,69 @@
+import datetime
+
+from django.test import TestCase
+from mock import patch
+
+from seahub.api2.models import TokenV2
+from seahub.api2.token_cache import get_api_token, record_token_access, \
+    flush_token_access, clear_api_token_cache
+
+
+class TokenCacheTest(TestCase):
+
+    def setUp(self):
+        self.token = TokenV2(user='test@example.com',
+                             platform='windows',
+                             device_id='a' * 36,
+                             device_name='fake device name',
+                             client_version='1.0.0',
+                             platform_version='10')
+        self.token.save()
+
+    def tearDown(self):
+        self.token.delete()
+
+    def test_get_api_token(self):
+        assert get_api_token('x' * 40) is None
+
+        token = get_api_token(self.token.key)
+        assert token.device_id == self.token.device_id
+
+        with self.assertNumQueries(0):
+            assert get_api_token(self.token.key).key == self.token.key
+
+    def test_token_deleted(self):
+        get_api_token(self.token.key)
+        TokenV2.objects.filter(key=self.token.key).delete()
+
+        assert get_api_token(self.token.key) is None
+
+    @patch('seahub.api2.token_cache.run_later')
+    def test_record_token_access(self, mock_run_later):
+        token = get_api_token(self.token.key)
+        token.last_accessed = datetime.datetime.now()
+
+        record_token_access(token, '', '1.0.0', '10')
+        assert flush_token_access() == 0
+
+        record_token_access(token, '127.0.0.1', '2.0.0', '')
+        assert mock_run_later.call_count == 1
+        assert TokenV2.objects.get(key=token.key).client_version == '1.0.0'
+
+        assert get_api_token(token.key).client_version == '2.0.0'
+        assert flush_token_access() == 1
+
+        token = TokenV2.objects.get(key=token.key)
+        assert token.client_version == '2.0.0'
+        assert token.last_login_ip == '127.0.0.1'
+
+    @patch('seahub.api2.token_cache.run_later')
+    def test_access_of_deleted_token_not_cached(self, mock_run_later):
+        token = get_api_token(self.token.key)
+        token.last_accessed = None
+
+        # deleted by another process before access is recorded
+        TokenV2.objects.filter(key=self.token.key).delete()
+        clear_api_token_cache(self.token.key)
+        record_token_access(token, '127.0.0.1', '2.0.0', '')
+
+        assert get_api_token(self.token.key) is None
@@ -0,0 +1,87 @@
+from django.test import SimpleTestCase, override_settings
+from mock import patch
+
+from seahub.auth.utils import cache_user, clear_user_cache, \
+    get_cached_user, get_user_cache_stats
+from seahub.base.accounts import User
+
+
+class UserCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.email = 'cached@example.com'
+        self.user = User(self.email)
+        self.user.id = 1
+        self.user.enc_password = '!'
+        self.user.is_staff = True
+        self.user.is_active = True
+        self.user.ctime = 0
+        self.user.source = 'DB'
+        self.user.role = 'default'
+        self.user.reference_id = None
+        self.user.admin_role = 'default_admin'
+
+    def tearDown(self):
+        clear_user_cache(self.email)
+
+    def test_cache_user(self):
+        assert get_cached_user(self.email) is None
+
+        cache_user(self.user)
+        user = get_cached_user(self.email)
+        assert user.username == self.email
+        assert user.id == 1
+        assert user.is_staff
+        assert user.admin_role == 'default_admin'
+        assert not hasattr(user, '_cached_org')
+
+    def test_password_hash_not_cached(self):
+        from django.core.cache import cache
+        from seahub.auth.utils import _get_user_cache_key
+        from seahub.password_session.handlers import get_password_hash, \
+            has_usable_password
+
+        self.user.enc_password = 'PBKDF2SHA256$10000$salt$hash'
+        cache_user(self.user)
+
+        snapshot = cache.get(_get_user_cache_key(self.email))
+        assert 'PBKDF2SHA256$10000$salt$hash' not in snapshot.values()
+
+        user = get_cached_user(self.email)
+        assert '_cached_enc_password' not in user.__dict__
+        assert has_usable_password(user)
+        assert get_password_hash(user) == get_password_hash(self.user)
+
+    def test_clear_user_cache(self):
+        cache_user(self.user)
+        clear_user_cache(self.email)
+        assert get_cached_user(self.email) is None
+
+    def test_stats(self):
+        stats = get_user_cache_stats()
+        cache_user(self.user)
+        get_cached_user(self.email)
+        get_cached_user('nobody@example.com')
+
+        new_stats = get_user_cache_stats()
+        assert new_stats['hits'] == stats['hits'] + 1
+        assert new_stats['misses'] == stats['misses'] + 1
+
+    @override_settings(USER_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        cache_user(self.user)
+        assert get_cached_user(self.email) is None
+
+    @override_settings(MULTI_TENANCY=True)
+    @patch('seahub.auth.utils.ccnet_api')
+    def test_org_is_cached(self, mock_ccnet_api):
+        org = type('Org', (object, ), {'org_id': 1, 'org_name': 'org',
+                                       'url_prefix': 'org', 'creator': '',
+                                       'ctime': 0, 'is_staff': False})()
+        mock_ccnet_api.get_orgs_by_user.return_value = [org]
+        cache_user(self.user)
+
+        user = get_cached_user(self.email)
+        assert user._cached_org.org_id == 1
+        assert user._cached_orgs[0].url_prefix == 'org'
+        assert mock_ccnet_api.get_orgs_by_user.call_count == 1
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from mock import patch, MagicMock
+from django.test import SimpleTestCase
+
+from seahub.avatar.management.commands import rebuild_avatars
+from seahub.avatar.management.commands.rebuild_avatars import \
+    _get_stale_sizes, _rebuild_avatar
+
+
+def _get_avatar(mtimes):
+    avatar = MagicMock()
+    avatar.avatar.name = 'orig.png'
+    avatar.avatar_name.side_effect = lambda size: 'resized/%d.png' % size
+    avatar.avatar.storage.modified_time.side_effect = \
+        lambda name: mtimes.get(name)
+    return avatar
+
+
+class RebuildAvatarsTest(SimpleTestCase):
+
+    def test_stale_sizes(self):
+        avatar = _get_avatar({
+            'orig.png': datetime(2020, 1, 2),
+            'resized/32.png': datetime(2020, 1, 3),
+            'resized/64.png': datetime(2020, 1, 1),
+        })
+        assert _get_stale_sizes(avatar, [32, 64, 80]) == [64, 80]
+
+    @patch.object(rebuild_avatars, 'set_avatar_manifest')
+    @patch.object(rebuild_avatars, 'Avatar')
+    def test_rebuild_avatar(self, mock_avatar_cls, mock_set_avatar_manifest):
+        avatar = _get_avatar({
+            'orig.png': datetime(2020, 1, 2),
+            'resized/32.png': datetime(2020, 1, 3),
+        })
+        avatar.primary = True
+        avatar.create_thumbnails.side_effect = lambda sizes: sizes[:1]
+        mock_avatar_cls.objects.filter.return_value.first.return_value = avatar
+
+        assert _rebuild_avatar((1, [32, 64, 80], False)) == (1, 1, 1, 1)
+        avatar.create_thumbnails.assert_called_once_with([64, 80])
+        mock_set_avatar_manifest.assert_called_once_with(avatar, [32, 64])
+
+    @patch.object(rebuild_avatars, 'set_avatar_manifest')
+    @patch.object(rebuild_avatars, 'Avatar')
+    def test_force(self, mock_avatar_cls, mock_set_avatar_manifest):
+        avatar = _get_avatar({
+            'orig.png': datetime(2020, 1, 2),
+            'resized/32.png': datetime(2020, 1, 3),
+        })
+        avatar.primary = False
+        avatar.create_thumbnails.side_effect = lambda sizes: sizes
+        mock_avatar_cls.objects.filter.return_value.first.return_value = avatar
+
+        assert _rebuild_avatar((1, [32], True)) == (1, 1, 0, 0)
+        assert not mock_set_avatar_manifest.called
@@ -0,0 +1,165 @@
+import datetime
+
+from mock import patch, MagicMock
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from seahub.avatar import manifest
+from seahub.avatar.manifest import get_avatar_manifest, \
+    get_avatar_manifests, resolve_avatar_url, set_avatar_manifest, \
+    clear_avatar_manifest
+
+
+def _get_avatar(email='a@example.com'):
+    avatar = MagicMock()
+    avatar.id = 1
+    avatar.emailuser = email
+    avatar.date_uploaded = datetime.datetime(2020, 1, 1)
+    avatar.avatar.url = '/image-view/avatars/a.png'
+    avatar.avatar_url.side_effect = lambda size: '/image-view/%d/a.png' % size
+    avatar.avatar_name.side_effect = \
+        lambda size: 'avatars/%s/resized/%d/a.png' % (email, size)
+    avatar.avatar.storage.filter_existing.side_effect = set
+    return avatar
+
+
+class AvatarManifestTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = LocMemCache('avatar-manifest-test', {})
+        self.cache.clear()
+        patcher = patch.object(manifest, 'cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(manifest, 'AUTO_GENERATE_AVATAR_SIZES', (32, 64))
+    @patch.object(manifest, '_get_primary_avatars')
+    def test_build_on_miss(self, mock_get_primary_avatars):
+        mock_get_primary_avatars.return_value = [_get_avatar()]
+
+        m = get_avatar_manifest('a@example.com')
+        assert m['sizes'] == [32, 64]
+        assert m['urls'][32] == '/image-view/32/a.png'
+
+        # read from cache afterwards
+        get_avatar_manifest('a@example.com')
+        assert mock_get_primary_avatars.call_count == 1
+
+    @patch.object(manifest, 'AUTO_GENERATE_AVATAR_SIZES', (32, 64))
+    @patch.object(manifest, '_schedule_thumbnail')
+    @patch.object(manifest, '_get_primary_avatars')
+    def test_build_with_missing_thumbnail(self, mock_get_primary_avatars,
+                                          mock_schedule_thumbnail):
+        avatar = _get_avatar()
+        avatar.avatar.storage.filter_existing.side_effect = \
+            lambda names: set(n for n in names if '/64/' in n)
+        mock_get_primary_avatars.return_value = [avatar]
+
+        m = get_avatar_manifest('a@example.com')
+        assert m['sizes'] == [64]
+
+        # the missing size is created in background
+        assert resolve_avatar_url('a@example.com', m, 32) == '/image-view/64/a.png'
+        mock_schedule_thumbnail.assert_called_once_with('a@example.com', 1, 32)
+
+    @patch.object(manifest, '_get_primary_avatars')
+    def test_no_avatar(self, mock_get_primary_avatars):
+        mock_get_primary_avatars.return_value = []
+
+        assert get_avatar_manifest('a@example.com') == {}
+        assert get_avatar_manifest('a@example.com') == {}
+        assert mock_get_primary_avatars.call_count == 1
+        assert resolve_avatar_url('a@example.com', {}, 32) is None
+
+    @patch.object(manifest, 'AUTO_GENERATE_AVATAR_SIZES', (32, ))
+    @patch.object(manifest, '_get_primary_avatars')
+    def test_build_many(self, mock_get_primary_avatars):
+        set_avatar_manifest(_get_avatar('a@example.com'), [64])
+        avatar_b = _get_avatar('b@example.com')
+        avatar_c = _get_avatar('c@example.com')
+        avatar_c.id = 2
+        avatar_b.avatar.storage = avatar_c.avatar.storage
+        mock_get_primary_avatars.return_value = [avatar_b, avatar_c]
+
+        manifests = get_avatar_manifests(
+            ['a@example.com', 'b@example.com', 'c@example.com',
+             'd@example.com'])
+        assert manifests['a@example.com']['sizes'] == [64]
+        assert manifests['b@example.com']['sizes'] == [32]
+        assert manifests['c@example.com']['sizes'] == [32]
+        assert manifests['d@example.com'] == {}
+        mock_get_primary_avatars.assert_called_once()
+        assert sorted(mock_get_primary_avatars.call_args[0][0]) == \
+            ['b@example.com', 'c@example.com', 'd@example.com']
+
+        # thumbnails of all avatars are checked at once
+        avatar_c.avatar.storage.filter_existing.assert_called_once()
+        assert not avatar_c.avatar.storage.exists.called
+
+    @patch.object(manifest, '_schedule_thumbnail')
+    def test_resolve_missing_size(self, mock_schedule_thumbnail):
+        set_avatar_manifest(_get_avatar(), [32, 64])
+        m = get_avatar_manifest('a@example.com')
+
+        assert resolve_avatar_url('a@example.com', m, 32) == '/image-view/32/a.png'
+        assert not mock_schedule_thumbnail.called
+
+        assert resolve_avatar_url('a@example.com', m, 48) == '/image-view/64/a.png'
+        mock_schedule_thumbnail.assert_called_once_with('a@example.com', 1, 48)
+
+        assert resolve_avatar_url('a@example.com', m, 128) == '/image-view/64/a.png'
+
+    @patch.object(manifest, '_schedule_thumbnail')
+    def test_resolve_size_in_string(self, mock_schedule_thumbnail):
+        set_avatar_manifest(_get_avatar(), [32, 64])
+        m = get_avatar_manifest('a@example.com')
+
+        assert resolve_avatar_url('a@example.com', m, '32') == '/image-view/32/a.png'
+        assert resolve_avatar_url('a@example.com', m, '48') == '/image-view/64/a.png'
+        mock_schedule_thumbnail.assert_called_once_with('a@example.com', 1, 48)
+
+        with patch.object(manifest, 'AVATAR_DEFAULT_SIZE', 64):
+            assert resolve_avatar_url('a@example.com', m, 'x') == '/image-view/64/a.png'
+
+    @patch.object(manifest, 'invalidate_cache')
+    def test_update_size(self, mock_invalidate_cache):
+        avatar = _get_avatar()
+        set_avatar_manifest(avatar, [32])
+
+        manifest._update_manifest_size(avatar, 48, True)
+        m = get_avatar_manifest('a@example.com')
+        assert m['sizes'] == [32, 48]
+        mock_invalidate_cache.assert_called_once_with('a@example.com', 48)
+
+        manifest._update_manifest_size(avatar, 96, False)
+        assert get_avatar_manifest('a@example.com')['failed'] == [96]
+
+    def test_clear(self):
+        set_avatar_manifest(_get_avatar(), [32])
+        clear_avatar_manifest('a@example.com')
+        assert self.cache.get(manifest._get_manifest_cache_key('a@example.com')) is None
+
+    @patch.object(manifest, 'AVATAR_FILE_STORAGE',
+                  'seahub.base.database_storage.DatabaseStorage')
+    def test_versioned_url_in_database_storage(self):
+        avatar = _get_avatar()
+        avatar.thumbnail_version.side_effect = \
+            lambda size: '1b2c3d4e5f6a' if size == 32 else None
+        set_avatar_manifest(avatar, [32, 64])
+
+        m = get_avatar_manifest('a@example.com')
+        assert m['urls'][32] == '/image-view/32/a.png?v=1b2c3d4e5f6a'
+        # not written by this avatar, version is unknown
+        assert m['urls'][64] == '/image-view/64/a.png'
+        # thumbnails are not read to build urls
+        assert not avatar.avatar.storage.open.called
+
+        # rebuilt by another instance, which only wrote size 64
+        avatar = _get_avatar()
+        avatar.thumbnail_version.side_effect = \
+            lambda size: '6a5f4e3d2c1b' if size == 64 else None
+        set_avatar_manifest(avatar, [32, 64])
+
+        m = get_avatar_manifest('a@example.com')
+        assert m['urls'][32] == '/image-view/32/a.png?v=1b2c3d4e5f6a'
+        assert m['urls'][64] == '/image-view/64/a.png?v=6a5f4e3d2c1b'
@@ -1,3 +1,4 @@
+import io
 import os
 from django.conf import settings
 from django.db import connection
@@ -40,6 +41,13 @@ class DatabaseStorageTest(BaseTestCase):
 
         assert storage.exists('name') is True
 
+    def test_filter_existing(self):
+        storage = DatabaseStorage(options=self.dbs_options)
+        storage._save('name', open(self.image_path, 'rb'))
+
+        assert storage.filter_existing(['name', 'other']) == {'name'}
+        assert storage.filter_existing([]) == set()
+
     def test_delete(self):
         storage = DatabaseStorage(options=self.dbs_options)
         ret = storage._save('name', open(self.image_path, 'rb'))
@@ -59,3 +67,31 @@ class DatabaseStorageTest(BaseTestCase):
         storage._save('name', open(self.image_path, 'rb'))
 
         assert storage.modified_time('name') is not None
+
+    def test_open(self):
+        storage = DatabaseStorage(options=self.dbs_options)
+        storage._save('name', open(self.image_path, 'rb'))
+
+        with open(self.image_path, 'rb') as f:
+            assert storage.open('name', 'rb').read() == f.read()
+
+    def test_binary(self):
+        options = dict(self.dbs_options, binary=True)
+        storage = DatabaseStorage(options=options)
+        storage._save('name', open(self.image_path, 'rb'))
+
+        with open(self.image_path, 'rb') as f:
+            content = f.read()
+        assert storage.open('name', 'rb').read() == content
+
+        # files stored as base64 before are still readable
+        assert DatabaseStorage(options=self.dbs_options).open(
+            'name', 'rb').read() == content
+
+    def test_save_existing(self):
+        storage = DatabaseStorage(options=self.dbs_options)
+        storage._save('name', open(self.image_path, 'rb'))
+        storage._save('name', io.BytesIO(b'\x89PNG'))
+
+        assert storage.size('name') == 4
+        assert storage.open('name', 'rb').read() == b'\x89PNG'
@@ -0,0 +1,100 @@
+import io
+
+from mock import patch, MagicMock
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import Http404
+from django.test import SimpleTestCase, RequestFactory
+
+from seahub.base.database_storage import serve
+from seahub.base.database_storage.serve import serve_database_file, \
+    clear_served_file_cache
+
+
+class ServeDatabaseFileTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = LocMemCache('serve-database-file-test', {})
+        self.cache.clear()
+        patcher = patch.object(serve, 'cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(clear_served_file_cache, 'avatars/a.png')
+
+        self.storage = MagicMock()
+        self.storage.open.side_effect = lambda name, mode: \
+            io.BytesIO(b'0123456789')
+        self.factory = RequestFactory()
+
+    def test_serve(self):
+        resp = serve_database_file(self.factory.get('/image-view/avatars/a.png'),
+                                   self.storage, 'avatars/a.png')
+        assert resp.status_code == 200
+        assert resp.content == b'0123456789'
+        assert resp['Content-Type'] == 'image/png'
+        assert resp['Cache-Control'] == 'no-cache'
+        assert resp['ETag']
+
+    def test_versioned_url_is_immutable(self):
+        version = serve.get_content_version(b'0123456789')
+        resp = serve_database_file(
+            self.factory.get('/image-view/avatars/a.png?v=%s' % version),
+            self.storage, 'avatars/a.png')
+        assert 'immutable' in resp['Cache-Control']
+
+    def test_outdated_version_is_not_immutable(self):
+        resp = serve_database_file(self.factory.get('/image-view/avatars/a.png?v=1'),
+                                   self.storage, 'avatars/a.png')
+        assert resp['Cache-Control'] == 'no-cache'
+
+    def test_version_changes_with_content(self):
+        version = serve.get_content_version(b'0123456789')
+        serve_database_file(
+            self.factory.get('/image-view/avatars/a.png?v=%s' % version),
+            self.storage, 'avatars/a.png')
+        clear_served_file_cache('avatars/a.png')
+
+        self.storage.open.side_effect = lambda name, mode: io.BytesIO(b'new')
+        assert serve.get_content_version(b'new') != version
+        resp = serve_database_file(
+            self.factory.get('/image-view/avatars/a.png?v=%s' % version),
+            self.storage, 'avatars/a.png')
+        assert resp['Cache-Control'] == 'no-cache'
+
+    def test_not_modified_without_storage(self):
+        resp = serve_database_file(self.factory.get('/'), self.storage,
+                                   'avatars/a.png')
+        etag = resp['ETag']
+
+        resp = serve_database_file(
+            self.factory.get('/', HTTP_IF_NONE_MATCH=etag), self.storage,
+            'avatars/a.png')
+        assert resp.status_code == 304
+        assert self.storage.open.call_count == 1
+
+    def test_range(self):
+        resp = serve_database_file(
+            self.factory.get('/', HTTP_RANGE='bytes=2-5'), self.storage,
+            'avatars/a.png')
+        assert resp.status_code == 206
+        assert resp.content == b'2345'
+        assert resp['Content-Range'] == 'bytes 2-5/10'
+
+        resp = serve_database_file(
+            self.factory.get('/', HTTP_RANGE='bytes=-3'), self.storage,
+            'avatars/a.png')
+        assert resp.content == b'789'
+
+    def test_cleared_on_change(self):
+        serve_database_file(self.factory.get('/'), self.storage, 'avatars/a.png')
+        clear_served_file_cache('avatars/a.png')
+
+        self.storage.open.side_effect = lambda name, mode: io.BytesIO(b'new')
+        resp = serve_database_file(self.factory.get('/'), self.storage,
+                                   'avatars/a.png')
+        assert resp.content == b'new'
+
+    def test_not_found(self):
+        self.storage.open.side_effect = lambda name, mode: None
+        with self.assertRaises(Http404):
+            serve_database_file(self.factory.get('/'), self.storage,
+                                'avatars/b.png')
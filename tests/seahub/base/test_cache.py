@@ -0,0 +1,169 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from seahub.base.cache import SQLiteCache, TieredCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = SQLiteCache(os.path.join(self.tmp_dir, 'cache.db'), {})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_get_set_delete(self):
+        assert self.cache.get('a') is None
+        self.cache.set('a', {'name': 'foo'})
+        assert self.cache.get('a') == {'name': 'foo'}
+        assert self.cache.delete('a') is True
+        assert self.cache.get('a', 'default') == 'default'
+
+    def test_expired(self):
+        self.cache.set('a', 1, -1)
+        assert self.cache.get('a') is None
+        assert self.cache.add('a', 2) is True
+        assert self.cache.add('a', 3) is False
+        assert self.cache.get('a') == 2
+
+    def test_many(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        assert self.cache.get_many(['a', 'b', 'c']) == {'a': 1, 'b': 2}
+        self.cache.delete_many(['a', 'b'])
+        assert self.cache.get_many(['a', 'b']) == {}
+
+    def test_incr(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('a')
+        self.cache.set('a', 1)
+        assert self.cache.incr('a', 2) == 3
+        assert self.cache.get('a') == 3
+
+    def test_cull(self):
+        cache = SQLiteCache(os.path.join(self.tmp_dir, 'cull.db'),
+                            {'OPTIONS': {'MAX_ENTRIES': 10}})
+        cache.cull_check_interval = 1
+        for i in range(30):
+            cache.set('key%d' % i, i)
+        assert len(cache.get_many(['key%d' % i for i in range(30)])) <= 10
+        assert cache.get('key29') == 29
+
+
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.shared = SQLiteCache(os.path.join(self.tmp_dir, 'cache.db'), {})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _get_cache(self, **options):
+        cache = TieredCache('', {'OPTIONS': options})
+        cache._shared_cache = self.shared
+        return cache
+
+    def test_read_through(self):
+        cache = self._get_cache()
+        self.shared.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+
+        stats = cache.get_stats()
+        assert stats['local_hits'] == 1
+        assert stats['shared_hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_write_through(self):
+        cache = self._get_cache()
+        cache.set('a', 1)
+        assert self.shared.get('a') == 1
+        cache.delete('a')
+        assert self.shared.get('a') is None
+        assert cache.get('a') is None
+
+    def test_local_lru(self):
+        cache = self._get_cache(LOCAL_MAX_ENTRIES=2)
+        cache.set_many({'a': 1, 'b': 2})
+        cache.get('a')
+        cache.set('c', 3)
+        assert set(cache._entries) == {cache.make_key('a'), cache.make_key('c')}
+
+    def test_invalidation_broadcast(self):
+        cache1 = self._get_cache(INVALIDATION_POLL_INTERVAL=0)
+        cache2 = self._get_cache(INVALIDATION_POLL_INTERVAL=0)
+
+        cache1.set('a', 1)
+        assert cache2.get('a') == 1
+
+        cache1.set('a', 2)
+        assert cache2.get('a') == 2
+
+        cache1.delete('a')
+        assert cache2.get('a') is None
+
+    def test_clear_drops_local_entries(self):
+        cache1 = self._get_cache(INVALIDATION_POLL_INTERVAL=0)
+        cache2 = self._get_cache(INVALIDATION_POLL_INTERVAL=0)
+
+        cache1.set('a', 1)
+        assert cache2.get('a') == 1
+
+        cache1.clear()
+        assert cache2.get('a') is None
+
+    def test_broadcast_one_log_entry_per_call(self):
+        cache1 = self._get_cache(INVALIDATION_POLL_INTERVAL=0)
+        cache2 = self._get_cache(INVALIDATION_POLL_INTERVAL=0)
+
+        cache1.set('a', 1)
+        assert cache2.get('a') == 1
+
+        # many more keys than the gap, but in one call
+        data = dict(('key%d' % i, i) for i in range(
+            TieredCache.max_invalidation_gap + 10))
+        cache1.set_many(data)
+        assert self.shared.get(TieredCache.invalidation_seq_key) == 2
+
+        assert cache2.get('a') == 1
+        cache1.set('a', 2)
+        assert cache2.get('a') == 2
+        assert cache2.get_stats()['local_hits'] == 1
+
+    def test_more_invalidated_keys_than_local_entries(self):
+        cache1 = self._get_cache(INVALIDATION_POLL_INTERVAL=0)
+        cache2 = self._get_cache(INVALIDATION_POLL_INTERVAL=0,
+                                 LOCAL_MAX_ENTRIES=2)
+
+        cache1.set('a', 1)
+        assert cache2.get('a') == 1
+
+        cache1.set_many({'b': 2, 'c': 3, 'd': 4})
+        assert cache2.get('a') == 1
+        assert cache2.get_stats()['local_hits'] == 0
+
+    def test_shared_only_keys(self):
+        cache1 = self._get_cache(INVALIDATION_POLL_INTERVAL=0,
+                                 SHARED_ONLY_KEY_PREFIXES=['throttle_'])
+        cache2 = self._get_cache(INVALIDATION_POLL_INTERVAL=0,
+                                 SHARED_ONLY_KEY_PREFIXES=['throttle_'])
+
+        assert cache1.add('throttle_user_1', 1)
+        assert cache1.incr('throttle_user_1', 2) == 3
+        cache1.set_many({'throttle_user_2': 1, 'a': 1})
+        assert cache2.get_many(['throttle_user_1', 'throttle_user_2']) == \
+            {'throttle_user_1': 3, 'throttle_user_2': 1}
+
+        # only `a` is kept locally and broadcast
+        assert set(cache1._entries) == {cache1.make_key('a')}
+        assert set(cache2._entries) == set()
+        assert self.shared.get(TieredCache.invalidation_seq_key) == 1
+
+        cache1.delete('throttle_user_1')
+        assert cache2.get('throttle_user_1') is None
@@ -0,0 +1,53 @@
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.utils import translation
+
+from seahub.notifications.digest import get_users_by_language, \
+    iter_users_by_language, send_emails, send_emails_in_batches
+from seahub.profile.models import Profile
+from seahub.test_utils import BaseTestCase
+
+
+class DigestTest(BaseTestCase):
+
+    def test_get_users_by_language(self):
+        Profile.objects.add_or_update(self.user.username, lang_code='zh-cn')
+
+        users = get_users_by_language([self.user.username,
+                                       self.admin.username])
+        assert users['zh-cn'] == [self.user.username]
+        assert self.admin.username in sum(users.values(), [])
+
+    def test_iter_users_by_language_restores_language(self):
+        Profile.objects.add_or_update(self.user.username, lang_code='zh-cn')
+        cur_language = translation.get_language()
+
+        for lang_code, users in iter_users_by_language([self.user.username]):
+            assert translation.get_language() == lang_code
+
+        assert translation.get_language() == cur_language
+
+    def test_send_emails(self):
+        messages = [(i, EmailMessage('subject', 'body', None,
+                                     ['user%d@example.com' % i]))
+                    for i in range(5)]
+
+        results = send_emails(messages, workers=2)
+
+        assert sorted(results) == [(i, None) for i in range(5)]
+        assert len(mail.outbox) == 5
+
+    def test_send_emails_in_batches(self):
+        def messages():
+            for i in range(5):
+                yield i, EmailMessage('subject', 'body', None,
+                                      ['user%d@example.com' % i])
+
+        sent_before = []
+        for key, error in send_emails_in_batches(messages(), workers=2,
+                                                 batch_size=2):
+            assert error is None
+            sent_before.append(len(mail.outbox))
+
+        # results of a batch come before the next batch is rendered
+        assert sent_before == [2, 2, 4, 4, 5]
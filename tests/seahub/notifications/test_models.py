@@ -1,5 +1,10 @@
+from django.core.cache import cache
+from mock import patch
+
 from seahub.notifications.models import (
     UserNotification, repo_share_msg_to_json, file_comment_msg_to_json,
+    get_cache_key_of_unseen_notifications, MSG_TYPE_REPO_SHARE_TO_GROUP,
+    user_msg_to_json,
     repo_share_to_group_msg_to_json, file_uploaded_msg_to_json,
     group_join_request_to_json, add_user_to_group_to_json, group_msg_to_json)
 from seahub.share.utils import share_dir_to_user, share_dir_to_group
@@ -89,3 +94,74 @@ class UserNotificationTest(BaseTestCase):
 
         assert msg is not None
         assert 'bar has shared a folder named' in msg
+
+    @patch('seahub.notifications.models.NOTIFICATION_BULK_CREATE_BATCH_SIZE', 2)
+    def test_bulk_add_user_notifications(self):
+        detail = repo_share_to_group_msg_to_json('bar@bar.com', self.repo.id,
+                                                 self.group.id, '/', None)
+        to_users = ['a@a.com', 'b@b.com', 'a@a.com', 'c@c.com', '']
+        cache_key = get_cache_key_of_unseen_notifications('c@c.com')
+        cache.set(cache_key, 0)
+
+        count = UserNotification.objects.bulk_add_user_notifications(
+            to_users, MSG_TYPE_REPO_SHARE_TO_GROUP, detail)
+
+        assert count == 3
+        assert cache.get(cache_key) is None
+        for to_user in ('a@a.com', 'b@b.com', 'c@c.com'):
+            notices = UserNotification.objects.get_user_notifications(to_user)
+            assert len(notices) == 1
+            assert notices[0].detail == detail
+            assert notices[0].is_repo_share_to_group_msg()
+
+    def test_unseen_count_is_kept_in_cache(self):
+        username = self.user.username
+        UserNotification.objects.add_file_uploaded_msg(username, 'test')
+        assert UserNotification.objects.count_unseen_user_notifications(username) == 1
+
+        notice = UserNotification.objects.add_file_uploaded_msg(username, 'test')
+        with self.assertNumQueries(0):
+            assert UserNotification.objects.count_unseen_user_notifications(username) == 2
+
+        assert notice.is_seen() is False
+        with self.assertNumQueries(0):
+            assert UserNotification.objects.count_unseen_user_notifications(username) == 1
+
+        assert UserNotification.objects.mark_user_notifications_seen(username) == 1
+        with self.assertNumQueries(0):
+            assert UserNotification.objects.count_unseen_user_notifications(username) == 0
+        assert UserNotification.objects.get_user_notifications(
+            username, seen=False).count() == 0
+
+    def test_uncached_unseen_count_is_not_kept_stale(self):
+        username = self.user.username
+        cache_key = get_cache_key_of_unseen_notifications(username)
+
+        # a count without a new notice is stored by a concurrent reader
+        # while incr of the notice fails
+        cache.set(cache_key, 0)
+        with patch.object(cache, 'incr', side_effect=ValueError):
+            UserNotification.objects.add_file_uploaded_msg(username, 'test')
+        assert cache.get(cache_key) is None
+        assert UserNotification.objects.count_unseen_user_notifications(username) == 1
+
+        # a count stored by another reader while counting is kept
+        cache.set(cache_key, 2)
+        with patch.object(cache, 'get', return_value=None):
+            assert UserNotification.objects.count_unseen_user_notifications(username) == 1
+        assert cache.get(cache_key) == 2
+
+    def test_seen_user_msg_notices(self):
+        username = self.user.username
+        UserNotification.objects.add_user_message(
+            username, user_msg_to_json('hi', 'a@a.com'))
+        UserNotification.objects.add_user_message(
+            username, user_msg_to_json('hi', 'b@b.com'))
+        assert UserNotification.objects.count_unseen_user_notifications(username) == 2
+
+        UserNotification.objects.seen_user_msg_notices(username, 'a@a.com')
+
+        assert UserNotification.objects.count_unseen_user_notifications(username) == 1
+        notice = UserNotification.objects.get_user_notifications(username,
+                                                                 seen=False)[0]
+        assert notice.user_message_detail_to_dict()['msg_from'] == 'b@b.com'
@@ -0,0 +1,66 @@
+from mock import patch
+
+from seahub.notifications.models import (
+    UserNotification, repo_share_msg_to_json, file_uploaded_msg_to_json,
+    add_user_to_group_to_json)
+from seahub.notifications.utils import update_notice_detail
+from seahub.base.templatetags.seahub_tags import email2nickname
+from seahub.test_utils import BaseTestCase
+
+
+class UpdateNoticeDetailTest(BaseTestCase):
+    def setUp(self):
+        self.clear_cache()
+
+    def _get_notices(self):
+        return list(UserNotification.objects.get_user_notifications(
+            self.user.username))
+
+    def test_update_notice_detail(self):
+        UserNotification.objects.add_repo_share_msg(
+            self.user.username,
+            repo_share_msg_to_json(self.admin.username, self.repo.id, '/', None))
+        UserNotification.objects.add_file_uploaded_msg(
+            self.user.username,
+            file_uploaded_msg_to_json('a.md', self.repo.id, '/'))
+        UserNotification.objects.set_add_user_to_group_notice(
+            self.user.username,
+            add_user_to_group_to_json(self.admin.username, self.group.id))
+
+        notices = update_notice_detail(None, self._get_notices())
+        details = dict((n.msg_type, n.detail) for n in notices)
+
+        assert details['repo_share']['repo_name'] == self.repo.name
+        assert details['repo_share']['share_from_user_email'] == self.admin.username
+        assert details['repo_share']['share_from_user_name'] == \
+            email2nickname(self.admin.username)
+        assert 'share_from' not in details['repo_share']
+        assert details['file_uploaded']['file_path'] == '/a.md'
+        assert details['file_uploaded']['uploaded_user_avatar_url']
+        assert details['add_user_to_group']['group_name'] == self.group.group_name
+
+    def test_repo_is_looked_up_once(self):
+        for i in range(3):
+            UserNotification.objects.add_file_uploaded_msg(
+                self.user.username,
+                file_uploaded_msg_to_json('%d.md' % i, self.repo.id, '/'))
+
+        with patch('seahub.notifications.utils.seafile_api.get_repo',
+                   return_value=self.repo) as mock_get_repo:
+            notices = update_notice_detail(None, self._get_notices())
+            assert mock_get_repo.call_count == 1
+            assert all(n.detail['repo_name'] == self.repo.name for n in notices)
+
+            # details are cached
+            update_notice_detail(None, self._get_notices())
+            assert mock_get_repo.call_count == 1
+
+    def test_deleted_repo(self):
+        UserNotification.objects.add_file_uploaded_msg(
+            self.user.username,
+            file_uploaded_msg_to_json('a.md', self.repo.id, '/'))
+
+        with patch('seahub.notifications.utils.seafile_api.get_repo',
+                   return_value=None):
+            notices = update_notice_detail(None, self._get_notices())
+        assert notices[0].detail is None
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from seahub.base.templatetags.seahub_tags import email2nickname, \
+    email2contact_email
+from seahub.profile.models import Profile
+from seahub.profile.settings import NICKNAME_CACHE_PREFIX, CONTACT_CACHE_PREFIX
+from seahub.profile.utils import get_user_infos, get_empty_user_info
+from seahub.utils import normalize_cache_key
+
+
+class GetUserInfosTest(TestCase):
+
+    def setUp(self):
+        self.emails = ['a@example.com', 'b@example.com', 'c@example.com']
+        for email in self.emails:
+            cache.delete(normalize_cache_key(email, NICKNAME_CACHE_PREFIX))
+            cache.delete(normalize_cache_key(email, CONTACT_CACHE_PREFIX))
+
+        Profile.objects.add_or_update('a@example.com', 'Alice',
+                                      contact_email='alice@contact.com')
+
+    def test_get_user_infos(self):
+        infos = get_user_infos(self.emails + [''])
+        assert set(infos) == set(self.emails)
+        assert infos['a@example.com'] == {'name': 'Alice',
+                                          'contact_email': 'alice@contact.com'}
+        assert infos['b@example.com'] == {'name': 'b',
+                                          'contact_email': 'b@example.com'}
+
+        for email in self.emails:
+            assert infos[email]['name'] == email2nickname(email)
+            assert infos[email]['contact_email'] == email2contact_email(email)
+
+    def test_empty_user_info(self):
+        assert get_empty_user_info() == {'name': email2nickname(''),
+                                         'contact_email': email2contact_email('')}
+        assert get_empty_user_info(32)['avatar_url']
+
+    def test_cached(self):
+        get_user_infos(self.emails)
+
+        with self.assertNumQueries(0):
+            infos = get_user_infos(self.emails)
+        assert infos['a@example.com']['name'] == 'Alice'
+
+    def test_one_query_for_misses(self):
+        with self.assertNumQueries(1):
+            get_user_infos(self.emails)
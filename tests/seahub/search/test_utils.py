@@ -0,0 +1,135 @@
+import sys
+from types import SimpleNamespace
+
+from mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+# seafes comes with pro edition only
+try:
+    import seafes  # noqa: F401
+except ImportError:
+    sys.modules['seafes'] = Mock()
+
+from seahub.search.utils import get_dirents_by_paths, search_files
+
+
+def _dirent(name, size=1):
+    return SimpleNamespace(obj_name=name, modifier='modifier@example.com',
+                           mtime=1469415777, size=size)
+
+
+def _repo(repo_id, origin_path=None):
+    return SimpleNamespace(id=repo_id, repo_id=repo_id, name='repo',
+                           origin_path=origin_path, owner='owner@example.com',
+                           head_cmmt_id='commit', last_modifier='',
+                           last_modify=0, size=0)
+
+
+class SearchUtilsTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+        self.dirs = {
+            '/a': [_dirent('1.md', 1), _dirent('2.md', 2)],
+            '/b': [_dirent('3.md', 3)],
+        }
+        self.broken_dirs = set()
+        self.listed = []
+
+        self.seafile_api = patch('seahub.search.utils.seafile_api').start()
+        self.seafile_api.list_dir_by_commit_and_path.side_effect = \
+            self._list_dir
+        patch('seahub.search.utils.get_user_infos',
+              return_value={}).start()
+        self.addCleanup(patch.stopall)
+
+    def tearDown(self):
+        cache.clear()
+
+    def _list_dir(self, repo_id, commit_id, path, offset, limit):
+        self.listed.append(path)
+        if path in self.broken_dirs:
+            raise Exception('list dir failed')
+        return self.dirs.get(path, [])
+
+    def test_group_by_parent_dir(self):
+        dirents = get_dirents_by_paths('repo', 'commit',
+                                       ['/a/1.md', '/a/2.md', '/b/3.md'])
+
+        assert sorted(self.listed) == ['/a', '/b']
+        assert dirents['/a/1.md']['size'] == 1
+        assert dirents['/a/2.md']['size'] == 2
+        assert dirents['/b/3.md'] == {
+            'last_modified_by': 'modifier@example.com',
+            'last_modified': 1469415777,
+            'size': 3,
+        }
+
+        # found paths are cached
+        self.listed = []
+        assert get_dirents_by_paths('repo', 'commit', ['/a/1.md']) == \
+            {'/a/1.md': dirents['/a/1.md']}
+        assert self.listed == []
+
+    def test_not_found_path_is_cached(self):
+        dirents = get_dirents_by_paths('repo', 'commit', ['/a/gone.md'])
+        assert dirents == {'/a/gone.md': None}
+        assert self.listed == ['/a']
+
+        self.listed = []
+        dirents = get_dirents_by_paths('repo', 'commit', ['/a/gone.md'])
+        assert dirents == {'/a/gone.md': None}
+        assert self.listed == []
+
+    def test_list_dir_failure_drops_only_its_dir(self):
+        self.broken_dirs.add('/b')
+
+        dirents = get_dirents_by_paths('repo', 'commit',
+                                       ['/a/1.md', '/b/3.md'])
+        assert dirents['/a/1.md']['size'] == 1
+        assert '/b/3.md' not in dirents
+
+        # failure is not cached
+        self.broken_dirs.clear()
+        self.listed = []
+        dirents = get_dirents_by_paths('repo', 'commit', ['/b/3.md'])
+        assert dirents['/b/3.md']['size'] == 3
+        assert self.listed == ['/b']
+
+    @patch('seahub.search.utils.es_search')
+    def test_search_files_in_virtual_repo(self, mock_es_search):
+        mock_es_search.return_value = [
+            {'repo_id': 'origin', 'fullpath': '/sub/a/1.md'},
+            {'repo_id': 'origin', 'fullpath': '/other/4.md'},
+        ], 2
+        repo = _repo('virtual', origin_path='/sub')
+
+        result, total = search_files({'origin': repo}, None, 'md', None,
+                                     0, 10)
+
+        assert total == 2
+        assert len(result) == 1
+        assert result[0]['repo_id'] == 'virtual'
+        assert result[0]['fullpath'] == '/a/1.md'
+        assert result[0]['size'] == 1
+        self.seafile_api.list_dir_by_commit_and_path.assert_called_once_with(
+            'virtual', 'commit', '/a', -1, -1)
+
+    @patch('seahub.search.utils.es_search')
+    def test_search_files_with_list_dir_failure(self, mock_es_search):
+        mock_es_search.return_value = [
+            {'repo_id': 'repo', 'fullpath': '/a/1.md'},
+            {'repo_id': 'repo', 'fullpath': '/b/3.md'},
+            {'repo_id': 'repo', 'fullpath': '/a/2.md'},
+        ], 3
+        self.broken_dirs.add('/b')
+
+        result, total = search_files({'repo': _repo('repo')}, None, 'md',
+                                     None, 0, 10)
+
+        assert [f['fullpath'] for f in result] == ['/a/1.md', '/a/2.md']
+        assert [f['size'] for f in result] == [1, 2]
+        assert sorted(self.listed) == ['/a', '/b']
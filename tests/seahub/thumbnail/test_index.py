@@ -0,0 +1,74 @@
+import os
+import shutil
+import hashlib
+import tempfile
+
+from django.test import SimpleTestCase
+from mock import patch
+
+from seahub.thumbnail import index, store
+
+
+def _file_id(i):
+    return hashlib.sha1(str(i).encode()).hexdigest()
+
+
+class BloomFilterTest(SimpleTestCase):
+
+    def test_no_false_negative(self):
+        bloom = index.BloomFilter(1000)
+        file_ids = [_file_id(i) for i in range(1000)]
+        for file_id in file_ids:
+            bloom.add(file_id)
+
+        assert all(file_id in bloom for file_id in file_ids)
+        false_positives = sum(_file_id(i) in bloom for i in range(1000, 11000))
+        assert false_positives < 300
+
+
+class ThumbnailIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for patcher in (patch.object(store, 'THUMBNAIL_ROOT', self.root),
+                        patch.object(index, 'THUMBNAIL_ROOT', self.root),
+                        patch.object(index, 'INDEX_DIR',
+                                     os.path.join(self.root, 'index'))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _add_thumbnail(self, file_id, size):
+        with open(store.prepare_thumbnail_path(file_id, size), 'wb') as f:
+            f.write(b'png')
+
+    def test_falls_back_to_store_without_index_file(self):
+        self._add_thumbnail(_file_id(1), 48)
+        thumbnail_index = index.ThumbnailIndex(48)
+
+        assert thumbnail_index.filter_existing(
+            [_file_id(1), _file_id(2)]) == {_file_id(1)}
+
+        # index file is not built by lookups
+        assert not os.path.exists(thumbnail_index.path)
+
+    def test_rebuild_and_add(self):
+        self._add_thumbnail(_file_id(1), 48)
+        thumbnail_index = index.ThumbnailIndex(48)
+        thumbnail_index.rebuild()
+
+        assert thumbnail_index.filter_existing(
+            [_file_id(1), _file_id(2)]) == {_file_id(1)}
+
+        # added by another process
+        index.ThumbnailIndex(48).add([_file_id(2)])
+        assert thumbnail_index.filter_existing(
+            [_file_id(1), _file_id(2)]) == {_file_id(1), _file_id(2)}
+
+        # rebuilt after eviction
+        os.unlink(store.get_thumbnail_path(_file_id(1), 48))
+        index.ThumbnailIndex(48).rebuild()
+        assert thumbnail_index.filter_existing(
+            [_file_id(1), _file_id(2)]) == set()
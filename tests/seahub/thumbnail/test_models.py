@@ -0,0 +1,24 @@
+from django.test import TestCase
+
+from seahub.thumbnail.models import ThumbnailTask
+
+
+class ThumbnailTaskManagerTest(TestCase):
+
+    def test_add_tasks_dedupe_by_file_id(self):
+        repo_id = 'a' * 36
+        file_id = 'b' * 40
+        ThumbnailTask.objects.add_tasks([(repo_id, '/a.jpg', file_id),
+                                         (repo_id, '/b.jpg', file_id)])
+        ThumbnailTask.objects.add_tasks([(repo_id, '/c.jpg', file_id),
+                                         (repo_id, '/d.jpg', 'c' * 40)])
+
+        tasks = ThumbnailTask.objects.get_pending_tasks(10)
+        assert [t.file_id for t in tasks] == [file_id, 'c' * 40]
+        assert tasks[0].path == '/a.jpg'
+
+    def test_get_pending_tasks_limit(self):
+        ThumbnailTask.objects.add_tasks(
+            [('a' * 36, '/%d.jpg' % i, '%040d' % i) for i in range(5)])
+
+        assert len(ThumbnailTask.objects.get_pending_tasks(3)) == 3
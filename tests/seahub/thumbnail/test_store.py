@@ -0,0 +1,93 @@
+import os
+import time
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+from mock import patch
+
+from seahub.thumbnail import store
+
+
+class ThumbnailStoreTest(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        patcher = patch.object(store, 'THUMBNAIL_ROOT', self.root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _add(self, file_id, size, content_len, atime):
+        path = store.prepare_thumbnail_path(file_id, size)
+        with open(path, 'wb') as f:
+            f.write(b'x' * content_len)
+        os.utime(path, (atime, atime))
+        return path
+
+    def test_sharded_path(self):
+        file_id = 'ab' + 'cd' + 'e' * 36
+        assert store.get_thumbnail_path(file_id, 48) == \
+            os.path.join(self.root, '48', 'ab', 'cd', file_id)
+
+    def test_read_thumbnail_updates_atime(self):
+        old = time.time() - 10 * 24 * 3600
+        path = self._add('a' * 40, 48, 10, old)
+
+        assert store.read_thumbnail('a' * 40, 48) == b'x' * 10
+        st = os.stat(path)
+        assert st.st_atime > old + 3600
+        assert int(st.st_mtime) == int(old)
+
+    def test_evict_by_bytes(self):
+        now = time.time()
+        old_path = self._add('a' * 40, 48, 100, now - 10 * 24 * 3600)
+        new_path = self._add('b' * 40, 48, 100, now)
+
+        total, removed_count, removed_bytes = store.evict_thumbnails(150)
+        assert (total, removed_count, removed_bytes) == (200, 1, 100)
+        assert not os.path.exists(old_path)
+        assert os.path.exists(new_path)
+
+    def test_evict_by_age(self):
+        now = time.time()
+        old_path = self._add('a' * 40, 48, 100, now - 10 * 24 * 3600)
+        new_path = self._add('b' * 40, 96, 100, now)
+
+        store.evict_thumbnails(0, max_age=24 * 3600)
+        assert not os.path.exists(old_path)
+        assert os.path.exists(new_path)
+
+    def test_migrate_legacy_thumbnails(self):
+        file_id = 'c' * 40
+        os.makedirs(os.path.join(self.root, '48'))
+        with open(store.get_legacy_thumbnail_path(file_id, 48), 'wb') as f:
+            f.write(b'png')
+
+        assert store.migrate_legacy_thumbnails() == 1
+        assert store.thumbnail_exists(file_id, 48)
+        assert not os.path.exists(store.get_legacy_thumbnail_path(file_id, 48))
+
+    def test_legacy_thumbnail_moved_on_lookup(self):
+        file_id = 'd' * 40
+        os.makedirs(os.path.join(self.root, '48'))
+        with open(store.get_legacy_thumbnail_path(file_id, 48), 'wb') as f:
+            f.write(b'png')
+
+        assert store.thumbnail_exists(file_id, 48)
+        assert os.path.exists(store.get_thumbnail_path(file_id, 48))
+        assert not os.path.exists(store.get_legacy_thumbnail_path(file_id, 48))
+
+    def test_read_legacy_thumbnail(self):
+        file_id = 'e' * 40
+        os.makedirs(os.path.join(self.root, '48'))
+        with open(store.get_legacy_thumbnail_path(file_id, 48), 'wb') as f:
+            f.write(b'png')
+
+        assert store.read_thumbnail(file_id, 48) == b'png'
+        assert not os.path.exists(store.get_legacy_thumbnail_path(file_id, 48))
+
+        with self.assertRaises(IOError):
+            store.read_thumbnail('f' * 40, 48)
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from mock import patch
+from PIL import Image
+
+from seahub.thumbnail.utils import _create_thumbnails_common, \
+    extract_video_frame, get_thumbnail_failure, set_thumbnail_failure
+
+
+class CreateThumbnailsCommonTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _jpeg(self, width, height):
+        f = BytesIO()
+        Image.new('RGB', (width, height), (255, 0, 0)).save(f, 'JPEG')
+        f.seek(0)
+        return f
+
+    def test_multi_sizes_from_one_decode(self):
+        targets = [(size, os.path.join(self.tmp_dir, str(size)))
+                   for size in (48, 1024, 192)]
+
+        assert _create_thumbnails_common(self._jpeg(2048, 1536), targets) == (True, 200)
+
+        for size, thumbnail_file in targets:
+            image = Image.open(thumbnail_file)
+            assert image.size == (size, size * 3 // 4)
+
+    def test_image_smaller_than_size(self):
+        targets = [(size, os.path.join(self.tmp_dir, str(size)))
+                   for size in (96, 1024)]
+
+        assert _create_thumbnails_common(self._jpeg(200, 100), targets) == (True, 200)
+        assert Image.open(targets[0][1]).size == (96, 48)
+        assert Image.open(targets[1][1]).size == (200, 100)
+
+
+class ExtractVideoFrameTest(SimpleTestCase):
+
+    @patch('seahub.thumbnail.utils.subprocess.run')
+    def test_pipe_one_frame_with_input_seeking(self, mock_run):
+        mock_run.return_value.stdout = b'P6 ...'
+
+        assert extract_video_frame('http://fileserver/v.mp4', 5, 192, 30) == b'P6 ...'
+
+        cmd = mock_run.call_args[0][0]
+        assert cmd.index('-ss') < cmd.index('-i')
+        assert cmd[cmd.index('-i') + 1] == 'http://fileserver/v.mp4'
+        assert cmd[-1] == 'pipe:1'
+        assert mock_run.call_args[1]['timeout'] == 30
+
+    @patch('seahub.thumbnail.utils.subprocess.run')
+    def test_no_frame(self, mock_run):
+        mock_run.return_value.stdout = b''
+
+        assert extract_video_frame('http://fileserver/v.mp4', 5, 192, 30) is None
+
+
+class ThumbnailFailureCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_get_and_set(self):
+        file_id = 'a' * 40
+        assert get_thumbnail_failure(file_id, [48]) is None
+
+        set_thumbnail_failure(file_id, [48, 192], 403)
+        assert get_thumbnail_failure(file_id, [48]) == 403
+        assert get_thumbnail_failure(file_id, [96, 192]) == 403
+        assert get_thumbnail_failure(file_id, [96]) is None
+        assert get_thumbnail_failure('b' * 40, [48]) is None
+
+    @patch('seahub.thumbnail.utils.cache')
+    def test_transient_failure_has_short_timeout(self, mock_cache):
+        set_thumbnail_failure('a' * 40, [48], 500)
+        short_timeout = mock_cache.set_many.call_args[0][1]
+
+        set_thumbnail_failure('a' * 40, [48], 400)
+        long_timeout = mock_cache.set_many.call_args[0][1]
+
+        assert short_timeout < long_timeout
@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+from mock import patch
+
+from seahub.thumbnail import store, views
+
+
+class LatestEntryTest(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        patcher = patch.object(store, 'THUMBNAIL_ROOT', self.root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    @patch.object(views, 'get_file_id_by_path')
+    def test_legacy_thumbnail(self, mock_get_file_id_by_path):
+        file_id = 'a' * 40
+        mock_get_file_id_by_path.return_value = file_id
+        assert views.latest_entry(None, 'repo', 48, '/a.jpg') is None
+
+        os.makedirs(os.path.join(self.root, '48'))
+        with open(store.get_legacy_thumbnail_path(file_id, 48), 'wb') as f:
+            f.write(b'png')
+
+        assert views.latest_entry(None, 'repo', 48, '/a.jpg') is not None
+        assert os.path.exists(store.get_thumbnail_path(file_id, 48))
@@ -0,0 +1,43 @@
+import ipaddress
+
+from django.test import SimpleTestCase
+
+from seahub.trusted_ip.utils import parse_trusted_ip, TrustedIPMatcher
+
+
+class ParseTrustedIPTest(SimpleTestCase):
+
+    def test_parse(self):
+        assert parse_trusted_ip('1.2.3.4') == ipaddress.ip_network('1.2.3.4/32')
+        assert parse_trusted_ip('1.2.*.*') == ipaddress.ip_network('1.2.0.0/16')
+        assert parse_trusted_ip('10.1.2.3/8') == ipaddress.ip_network('10.0.0.0/8')
+        assert parse_trusted_ip('fd00::/8') == ipaddress.ip_network('fd00::/8')
+
+    def test_invalid(self):
+        assert parse_trusted_ip('1.*.3.*') is None
+        assert parse_trusted_ip('1.2.*') is None
+        assert parse_trusted_ip('1.2.3.256') is None
+        assert parse_trusted_ip('*.*.*.*') is None
+
+
+class TrustedIPMatcherTest(SimpleTestCase):
+
+    def test_match(self):
+        matcher = TrustedIPMatcher(['127.0.0.1', '163.13.*.*', '10.0.0.0/8',
+                                    '2001:db8::/32', '1.*.3.*'])
+
+        assert matcher.match('127.0.0.1')
+        assert not matcher.match('127.0.0.2')
+        assert matcher.match('163.13.12.233')
+        assert not matcher.match('163.14.12.233')
+        assert matcher.match('10.255.1.1')
+        assert matcher.match('2001:db8::1')
+        assert not matcher.match('2001:db9::1')
+        assert matcher.match('::ffff:10.1.1.1')
+        assert not matcher.match('1.2.3.4')
+        assert not matcher.match('invalid')
+
+    def test_covered_networks(self):
+        matcher = TrustedIPMatcher(['10.1.1.1', '10.0.0.0/8', '10.1.0.0/16'])
+        assert matcher.match('10.1.1.1')
+        assert matcher.match('10.2.1.1')
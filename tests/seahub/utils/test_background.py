@@ -0,0 +1,39 @@
+import threading
+
+from mock import patch
+from django.test import SimpleTestCase
+
+from seahub.utils import background
+from seahub.utils.background import get_executor, run_in_background, \
+    run_later
+
+
+class BackgroundTest(SimpleTestCase):
+
+    def test_get_executor(self):
+        assert get_executor('test-background') is \
+            get_executor('test-background')
+
+    @patch.object(background, 'connection')
+    def test_run_in_background(self, mock_connection):
+        results = []
+        run_in_background('test-background', results.append, 1).result()
+        assert results == [1]
+        assert mock_connection.close.call_count == 1
+
+    @patch.object(background, 'connection')
+    def test_error_is_logged(self, mock_connection):
+        def fail():
+            raise ValueError('failed')
+
+        with patch.object(background, 'logger') as mock_logger:
+            run_in_background('test-background', fail).result()
+        assert mock_logger.error.call_count == 1
+        assert mock_connection.close.call_count == 1
+
+    @patch.object(background, 'connection')
+    def test_run_later(self, mock_connection):
+        done = threading.Event()
+        timer = run_later(0, done.set)
+        assert timer.daemon
+        assert done.wait(5)
@@ -0,0 +1,96 @@
+import os
+import re
+import zipfile
+import threading
+from io import BytesIO
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from django.test import SimpleTestCase
+
+from seahub.utils.ranged_file import open_ranged_url
+
+
+class _Handler(BaseHTTPRequestHandler):
+    content = b''
+    support_range = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        content = self.content
+        m = re.match(r'bytes=(\d+)-$', self.headers.get('Range', ''))
+        if not self.support_range or not m:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+
+        start = int(m.group(1))
+        if start >= len(content):
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */%d' % len(content))
+            self.end_headers()
+            return
+
+        self.send_response(206)
+        self.send_header('Content-Range', 'bytes %d-%d/%d' % (
+            start, len(content) - 1, len(content)))
+        self.send_header('Content-Length', str(len(content) - start))
+        self.end_headers()
+        self.wfile.write(content[start:])
+
+
+class RangedHTTPFileTest(SimpleTestCase):
+
+    def setUp(self):
+        self.content = os.urandom(1024 * 1024)
+        _Handler.content = self.content
+        _Handler.support_range = True
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:%d/file' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_seek_and_read(self):
+        with open_ranged_url(self.url) as f:
+            assert f.read(10) == self.content[:10]
+
+            f.seek(500000)
+            assert f.read(100) == self.content[500000:500100]
+
+            f.seek(1000)
+            assert f.read(100) == self.content[1000:1100]
+
+            f.seek(-10, os.SEEK_END)
+            assert f.read() == self.content[-10:]
+
+            f.seek(len(self.content) + 10)
+            assert f.read() == b''
+
+    def test_sequential_read_uses_one_request(self):
+        with open_ranged_url(self.url) as f:
+            assert f.read() == self.content
+            assert f.raw.requests_count == 1
+
+    def test_server_without_range_support(self):
+        _Handler.support_range = False
+        with open_ranged_url(self.url) as f:
+            f.seek(300000)
+            assert f.read(100) == self.content[300000:300100]
+            assert f.raw.size == len(self.content)
+
+    def test_read_zip_member(self):
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, 'w') as z:
+            z.writestr('padding', os.urandom(512 * 1024))
+            z.writestr('Thumbnails/thumbnail.png', b'png data')
+        _Handler.content = buf.getvalue()
+
+        with open_ranged_url(self.url) as f:
+            zip_file = zipfile.ZipFile(f, 'r')
+            assert zip_file.read('Thumbnails/thumbnail.png') == b'png data'